@@ -14,13 +14,11 @@
 import os
 import sys
 import csv
-import json
 import argparse
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from typing import Dict, List, Optional
 from dataclasses import dataclass
 import random
-import numpy as np
 
 # 设置UTF-8编码 - 更安全的方式
 if sys.platform == 'win32':
@@ -38,10 +36,16 @@ if sys.platform == 'win32':
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from rl.indicators import TechnicalAnalyzer
-from rl.level_finder import BestLevelFinder, LevelFeatureCalculator
-from rl.sl_tp_learner import SLTPLearner
-from rl.entry_learner_v2 import EntryLearnerV2
+from rl.market_analysis.indicators import TechnicalAnalyzer
+from rl.market_analysis.indicator_series import IndicatorSeries
+from rl.market_analysis.level_engine import LevelEngine, candle_columns
+from rl.market_analysis.level_finder import BestLevelFinder
+from rl.market_analysis.levels import LevelDiscovery
+from rl.execution.sl_tp import StopLossTakeProfit
+from rl.learning.decision_learner import DecisionFeatureLearner
+
+# 关键位多周期打分权重（与实盘 TradingAgent._get_tf_weights 的基础权重一致）
+LEVEL_TF_WEIGHTS = {"1m": 0.10, "15m": 0.55, "8h": 0.25, "1w": 0.10}
 
 
 @dataclass
@@ -66,6 +70,8 @@ class BacktestPosition:
     # 特征学习数据
     support_features: Optional[Dict] = None
     resistance_features: Optional[Dict] = None
+    # 入场决策特征（DecisionFeatureLearner）
+    decision_features: Optional[Dict] = None
 
 
 @dataclass 
@@ -91,15 +97,16 @@ class BacktestTrade:
     ai_sl_tp: Optional[Dict] = None
     support_features: Optional[Dict] = None  # 支撑位特征 (用于特征学习)
     resistance_features: Optional[Dict] = None  # 阻力位特征 (用于特征学习)
+    decision_features: Optional[Dict] = None  # 入场决策特征
 
 
 class BacktestTrainer:
     """
     回测训练器 - 专门用于快速积累学习数据
     支持同时训练：
-    1. 特征学习 (LevelFinder)
-    2. 止损止盈 AI (SLTPLearner)
-    3. 入场 AI (EntryLearnerV2)
+    1. 关键位特征学习 (BestLevelFinder)
+    2. 止损止盈 (StopLossTakeProfit，与实盘一致锚定支撑阻力位)
+    3. 入场决策特征学习 (DecisionFeatureLearner)
     """
     
     def __init__(self, data_dir: str = "rl_data", initial_balance: float = 10000.0,
@@ -113,43 +120,33 @@ class BacktestTrainer:
         
         # 技术分析器
         self.analyzer = TechnicalAnalyzer()
+        # 全历史指标序列（回测开始时对整段数据一次算出，按K线下标取值）
+        self.series_1m: Optional[IndicatorSeries] = None
+        self.series_15m: Optional[IndicatorSeries] = None
         
         # 决定数据文件名
         if train_real:
             print("[WARNING] 警告: 正在使用实盘数据文件进行训练！这将改变实盘 AI 的行为。")
             level_file = os.path.join(data_dir, "level_stats.json")
-            # EntryLearnerV2 内部固定了文件名
+            decision_file = os.path.join(data_dir, "decision_weights.json")
         else:
             print("[NOTE] 使用临时测试文件，不影响实盘数据。")
 
             level_file = os.path.join(data_dir, "backtest_level_stats.json")
-            # EntryLearnerV2 需要特殊处理
+            decision_file = os.path.join(data_dir, "backtest_temp", "decision_weights.json")
         
-        # 1. 初始化特征学习
+        # 1. 关键位发现 + 特征学习（打分用 BestLevelFinder 学到的权重）
+        self.level_discovery = LevelDiscovery()
+        self.level_engine = LevelEngine()
         self.level_finder = BestLevelFinder(
             stats_path=level_file
         )
         
-        # 2. 初始化止损止盈 AI
-        if train_real:
-            sl_tp_data_dir = data_dir
-        else:
-            sl_tp_data_dir = os.path.join(data_dir, "backtest_temp")
-            os.makedirs(sl_tp_data_dir, exist_ok=True)
-            
-        self.sl_tp_learner = SLTPLearner(
-            data_dir=sl_tp_data_dir
-        )
+        # 2. 止损止盈（锚定支撑阻力位，兜底固定比例）
+        self.sl_tp = StopLossTakeProfit()
         
-        # 3. 初始化入场 AI 
-        entry_data_dir = data_dir
-        if not train_real:
-            entry_data_dir = os.path.join(data_dir, "backtest_temp")
-            os.makedirs(entry_data_dir, exist_ok=True)
-            
-        self.entry_learner = EntryLearnerV2(
-            data_dir=entry_data_dir
-        )
+        # 3. 入场决策特征学习
+        self.decision_learner = DecisionFeatureLearner(decision_file)
         
         # 当前持仓
         self.position: Optional[BacktestPosition] = None
@@ -220,6 +217,7 @@ class BacktestTrainer:
         if len(all_data) < start_idx + 100:
             print(f"[X] 数据不足: {len(all_data)} 根K线")
             return {"error": "数据不足"}
+        self._prepare_indicators(all_data)
         
         total_bars = len(all_data) - start_idx
         print(f"\n{'='*60}")
@@ -246,7 +244,7 @@ class BacktestTrainer:
                 self._check_exit(current_price, current_time, klines_dict, all_data, i)
             
             if not self.position and self._cooldown == 0:
-                market_state = self._build_market_state(klines_dict)
+                market_state = self._build_market_state(i)
                 market_state["current_price"] = current_price
                 self._try_entry(current_price, current_time, klines_dict, market_state)
             
@@ -284,6 +282,7 @@ class BacktestTrainer:
         all_data = self.load_csv_data(csv_file)
         if len(all_data) < start_idx + 1000:
             return {"error": "数据不足"}
+        self._prepare_indicators(all_data)
             
         print(f"\n{'='*60}")
         print(f"开始随机采样回测 (实盘模式: {self.train_real})")
@@ -313,7 +312,7 @@ class BacktestTrainer:
                         break
                 else:
                     # 寻找入场
-                    market_state = self._build_market_state(klines_dict)
+                    market_state = self._build_market_state(idx)
                     market_state["current_price"] = current_price
                     self._try_entry(current_price, current_time, klines_dict, market_state)
                     
@@ -373,49 +372,37 @@ class BacktestTrainer:
             })
         return resampled
 
-    def _build_market_state(self, klines_dict: Dict) -> Dict:
-        """构建市场状态供 AI 使用"""
-        # 简单计算指标
-        klines_15m = klines_dict["15m"]
-        klines_1m = klines_dict["1m"]
-        
+    def _prepare_indicators(self, all_data: List[Dict]):
+        """对整段数据计算 1m / 15m 指标序列（与实盘 TechnicalAnalyzer 同口径）"""
+        self.series_1m = IndicatorSeries.from_klines(all_data)
+        self.series_15m = IndicatorSeries.from_klines(self._resample_klines(all_data, 15))
+
+    def _build_market_state(self, idx: int) -> Dict:
+        """构建市场状态供 AI 使用（第 idx 根1分钟K线收盘时）"""
+        analysis_1m = self.series_1m.at(idx)
+        # 只用已收盘的15分钟K线，避免用到未来数据
+        idx_15m = (idx + 1) // 15 - 1
+        if idx_15m >= 0:
+            analysis_15m = self.series_15m.at(idx_15m)
+        else:
+            analysis_15m = {"rsi": 50.0, "ema_7": 0.0, "ema_25": 0.0, "trend": "NEUTRAL"}
+
         # 趋势
-        ma7 = sum(k["close"] for k in klines_15m[-7:]) / 7 if len(klines_15m) >= 7 else 0
-        ma25 = sum(k["close"] for k in klines_15m[-25:]) / 25 if len(klines_15m) >= 25 else 0
-        
-        trend_direction = "BULLISH" if ma7 > ma25 else "BEARISH"
-        
-        # RSI (简化计算)
-        rsi_15m = 50 
-        if len(klines_15m) > 14:
-            gains = 0
-            losses = 0
-            for i in range(1, 15):
-                change = klines_15m[-i]["close"] - klines_15m[-i-1]["close"]
-                if change > 0: gains += change
-                else: losses -= change
-            if losses > 0:
-                rs = gains / losses
-                rsi_15m = 100 - (100 / (1 + rs))
-        
+        trend_direction = "BULLISH" if analysis_15m["ema_7"] > analysis_15m["ema_25"] else "BEARISH"
+
         return {
             "macro_trend": {"direction": trend_direction, "strength": 50},
             "micro_trend": {"direction": trend_direction},
-            "analysis_15m": {
-                "rsi": rsi_15m,
-                "trend": trend_direction
-            },
-            "analysis_1m": {
-                "rsi": rsi_15m, 
-                "volume_ratio": 1.0
-            }
+            "analysis_15m": analysis_15m,
+            "analysis_1m": analysis_1m,
         }
 
     def _try_entry(self, price: float, time: int, klines_dict: Dict, market_state: Dict):
         """尝试入场"""
         
         # 1. 找支撑阻力位 (Feature Learning)
-        level_result = self.level_finder.find_from_klines(klines_dict, price)
+        atr = market_state["analysis_15m"].get("atr", 0)
+        level_result = self._find_levels(klines_dict, price, atr)
         best_support = level_result.get("best_support")
         best_resistance = level_result.get("best_resistance")
         
@@ -459,27 +446,17 @@ class BacktestTrainer:
         # 🔥 完全移除随机探索，确保所有交易都基于特征学习
         
         if direction:
-            # 2. 询问 SL/TP AI 获取建议 (使用 predict)
-            sl_tp_suggestion = self.sl_tp_learner.predict(market_state, direction)
-            
-            # 3. 询问 Entry AI 获取评分 (记录这次决策)
-            conditions = {
-                "support_distance": support_dist / 100 if support_dist != 999 else 1,
-                "resistance_distance": resistance_dist / 100 if resistance_dist != 999 else 1,
-                "trend_aligned": True,
-                "rsi": market_state["analysis_15m"]["rsi"]
+            # 2. 止损止盈（锚定支撑阻力位）
+            sltp = self.sl_tp.calculate(price, direction, atr, market=market_state)
+            sl_tp_suggestion = {
+                "stop_loss_pct": sltp["sl_pct"],
+                "take_profit_pct": sltp["tp_pct"],
             }
             
-            trade_id = f"bt_{self._trade_counter+1:05d}"
+            # 3. 记录入场决策特征，平仓后按盈亏更新权重
+            decision_features = self.decision_learner.extract_features(market_state, direction)
             
-            entry_index = self.entry_learner.record_entry(
-                trade_id=trade_id,
-                market_state=market_state,
-                direction=direction,
-                entry_reason=entry_reason,
-                conditions=conditions,
-                base_score=level_score
-            )
+            trade_id = f"bt_{self._trade_counter+1:05d}"
             
             self._open_position(
                 trade_id=trade_id,
@@ -490,12 +467,42 @@ class BacktestTrainer:
                 entry_score=level_score,
                 support=best_support,
                 resistance=best_resistance,
-                sl_tp_suggestion=sl_tp_suggestion
+                sl_tp_suggestion=sl_tp_suggestion,
+                decision_features=decision_features
             )
     
+    def _find_levels(self, klines_dict: Dict, price: float, atr: float) -> Dict:
+        """各周期发现候选位，按学习到的特征权重一次打分，取最强支撑 / 阻力"""
+        candidates = set()
+        for klines in klines_dict.values():
+            levels = self.level_discovery.discover_all(klines, current_price=price, atr=atr)
+            candidates.update(levels["support"])
+            candidates.update(levels["resistance"])
+        
+        best_support = None
+        best_resistance = None
+        if not candidates:
+            return {"best_support": best_support, "best_resistance": best_resistance}
+        
+        candidate_list = sorted(candidates)
+        results = self.level_engine.score_levels(
+            candidate_list,
+            {tf: candle_columns(kl) for tf, kl in klines_dict.items()},
+            LEVEL_TF_WEIGHTS,
+            self.level_finder.stats["weights"],
+        )
+        for level, result in zip(candidate_list, results):
+            level_info = {"price": level, "score": result["score"], "features": result["features"]}
+            if level < price and (not best_support or result["score"] > best_support["score"]):
+                best_support = level_info
+            if level > price and (not best_resistance or result["score"] > best_resistance["score"]):
+                best_resistance = level_info
+        return {"best_support": best_support, "best_resistance": best_resistance}
+    
     def _open_position(self, trade_id: str, direction: str, price: float, time: int,
                        entry_reason: str, entry_score: float,
-                       support: Dict, resistance: Dict, sl_tp_suggestion: Dict):
+                       support: Dict, resistance: Dict, sl_tp_suggestion: Dict,
+                       decision_features: Optional[Dict] = None):
         """开仓"""
         self._trade_counter += 1
         
@@ -529,7 +536,8 @@ class BacktestTrainer:
             resistance_score=resistance["score"] if resistance else 0,
             ai_sl_tp=sl_tp_suggestion,
             support_features=support.get("features", {}) if support else {},
-            resistance_features=resistance.get("features", {}) if resistance else {}
+            resistance_features=resistance.get("features", {}) if resistance else {},
+            decision_features=decision_features
         )
         
         print(f"[>] {trade_id} {direction} @ {price:.2f} | SL:{sl_pct*100:.1f}% TP:{tp_pct*100:.1f}%")
@@ -592,7 +600,8 @@ class BacktestTrainer:
             level_was_effective=level_was_effective,
             ai_sl_tp=pos.ai_sl_tp,
             support_features=getattr(pos, "support_features", None),
-            resistance_features=getattr(pos, "resistance_features", None)
+            resistance_features=getattr(pos, "resistance_features", None),
+            decision_features=pos.decision_features
         )
         self.trades.append(trade)
         
@@ -608,18 +617,8 @@ class BacktestTrainer:
             self.stats["losses"] += 1
             emoji = "[X]"
         
-        # 更新三个 AI 模块
-        # 准备事后分析 (偷看未来 5 分钟数据)
-        peek_idx = min(len(all_data)-1, current_idx + 5)
-        price_after = all_data[peek_idx]["close"]
-        price_change_after = (price_after - price) / price * 100
-        
-        post_analysis = {
-            "price_change_after": price_change_after,
-            "exit_price": price
-        }
-        
-        self._update_learning(trade, post_analysis)
+        # 更新学习模块
+        self._update_learning(trade)
         
         print(f"{emoji} {pos.trade_id} 平仓: {pnl:+.2f} ({pnl_percent:+.2f}%) | {exit_reason}")
         
@@ -631,63 +630,22 @@ class BacktestTrainer:
         if self.position:
             self._close_position(price, time, "FORCE_CLOSE", all_data, current_idx)
     
-    def _update_learning(self, trade: BacktestTrade, post_analysis: Dict):
-        """更新所有学习系统"""
-        
-        # 1. 更新特征学习 (LevelFinder)
-        if trade.entry_reason in ["NEAR_SUPPORT", "NEAR_RESISTANCE"]:
-            if trade.direction == "LONG":
-                # 做多使用支撑位，从 market_state 的 best_support 获取 features
-                level_used = {
-                    "price": trade.support_price, 
-                    "score": trade.support_score, 
-                    "features": getattr(trade, "support_features", {})
-                }
-            else:
-                # 做空使用阻力位，从 market_state 的 best_resistance 获取 features
-                level_used = {
-                    "price": trade.resistance_price, 
-                    "score": trade.resistance_score, 
-                    "features": getattr(trade, "resistance_features", {})
-                }
-            
-            self.level_finder.record_trade_result(
-                level_used=level_used,
-                was_effective=trade.level_was_effective,
-                pnl_percent=trade.pnl_percent,
-                level_type="ENTRY"
-            )
-            
-        # 2. 更新止损止盈 AI (SLTPLearning)
-        if trade.ai_sl_tp and "features" in trade.ai_sl_tp:
-            sl_tp_used = {
-                "sl_pct": trade.ai_sl_tp["stop_loss_pct"],
-                "tp_pct": trade.ai_sl_tp["take_profit_pct"]
-            }
-            
-            trade_result = {
-                "pnl_percent": trade.pnl_percent,
-                "exit_reason": trade.exit_reason,
-                "direction": trade.direction,
-                "sl_pct_used": sl_tp_used["sl_pct"],
-                "tp_pct_used": sl_tp_used["tp_pct"]
-            }
-            
-            self.sl_tp_learner.record_trade(
-                entry_features=np.array(trade.ai_sl_tp["features"]),
-                sl_tp_used=sl_tp_used,
-                trade_result=trade_result,
-                post_analysis=post_analysis,
-                predicted_params=trade.ai_sl_tp
-            )
-
-        # 3. 更新入场 AI (EntryLearnerV2)
-        # 通过 trade_id 匹配之前的入场记录
-        self.entry_learner.update_entry_result(
-            trade_id=trade.trade_id,
-            pnl_percent=trade.pnl_percent,
-            exit_reason=trade.exit_reason
-        )
+    def _update_learning(self, trade: BacktestTrade):
+        """更新所有学习系统（奖励口径与实盘平仓一致：盈亏 2% 对应 ±1）"""
+        reward = max(-1.0, min(1.0, trade.pnl_percent / 2.0))
+        
+        # 1. 更新关键位特征学习：做多用支撑位特征，做空用阻力位特征
+        self.level_finder.update_stats(trade.level_was_effective)
+        if trade.direction == "LONG":
+            level_features = trade.support_features
+        else:
+            level_features = trade.resistance_features
+        if level_features:
+            self.level_finder.update_weights(level_features, reward)
+        
+        # 2. 更新入场决策特征学习
+        if trade.decision_features:
+            self.decision_learner.update(trade.decision_features, trade.pnl_percent)
     
     def _print_results(self):
         """打印回测结果"""
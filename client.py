@@ -1,5 +1,6 @@
 import hashlib
 import hmac
+import json
 import time
 from decimal import Decimal, ROUND_DOWN
 import requests
@@ -165,28 +166,24 @@ class BinanceFuturesClient:
             "tick_size": float(price_filter.get("tickSize", 0) or 0),
             "step_size": float(lot_filter.get("stepSize", 0) or 0),
             "min_qty": float(lot_filter.get("minQty", 0) or 0),
+            "max_qty": float(lot_filter.get("maxQty", 0) or 0),
             "min_notional": float(min_notional.get("notional", min_notional.get("minNotional", 0)) or 0),
         }
         self._symbol_filters[symbol] = data
         return data
 
-    def place_order(self, symbol: str, side: str, order_type: str, quantity: float,
-                    price: float = None, stop_price: float = None, time_in_force: str = None,
-                    reduce_only: bool = False):
-        """下单
-        
-        reduce_only:
-            True  -> 只减仓，不会反向开新仓（用于平仓，避免保证金不足）
-        """
-        def _round_to_step(value: float, step: float) -> float:
-            if not step or step <= 0:
-                return value
-            d_value = Decimal(str(value))
-            d_step = Decimal(str(step))
-            return float((d_value // d_step) * d_step)
-
-        # 获取精度信息
-        symbol_info = self.get_symbol_info(symbol)
+    @staticmethod
+    def _round_to_step(value: float, step: float) -> float:
+        if not step or step <= 0:
+            return value
+        d_value = Decimal(str(value))
+        d_step = Decimal(str(step))
+        return float((d_value // d_step) * d_step)
+
+    def _order_params(self, symbol_info: dict, symbol: str, side: str, order_type: str, quantity: float,
+                      price: float = None, stop_price: float = None, time_in_force: str = None,
+                      reduce_only: bool = False, working_type: str = None) -> dict:
+        """按交易对精度取整并组装下单参数"""
         if symbol_info:
             qty_precision = symbol_info.get("quantityPrecision", 3)
             price_precision = symbol_info.get("pricePrecision", 2)
@@ -195,17 +192,17 @@ class BinanceFuturesClient:
             step_size = float(filters.get("LOT_SIZE", {}).get("stepSize", 0) or 0)
 
             if step_size > 0:
-                quantity = _round_to_step(quantity, step_size)
+                quantity = self._round_to_step(quantity, step_size)
             else:
                 quantity = round(quantity, qty_precision)
             if price is not None:
                 if tick_size > 0:
-                    price = _round_to_step(price, tick_size)
+                    price = self._round_to_step(price, tick_size)
                 else:
                     price = round(price, price_precision)
             if stop_price is not None:
                 if tick_size > 0:
-                    stop_price = _round_to_step(stop_price, tick_size)
+                    stop_price = self._round_to_step(stop_price, tick_size)
                 else:
                     stop_price = round(stop_price, price_precision)
 
@@ -220,7 +217,7 @@ class BinanceFuturesClient:
         params = {
             "symbol": symbol,
             "side": side,  # BUY / SELL
-            "type": order_type,  # LIMIT / MARKET / STOP / TAKE_PROFIT 等
+            "type": order_type,  # LIMIT / MARKET / STOP_MARKET / TAKE_PROFIT_MARKET 等
             "quantity": quantity
         }
         if reduce_only:
@@ -229,13 +226,58 @@ class BinanceFuturesClient:
             params["price"] = price
         if stop_price:
             params["stopPrice"] = stop_price
+        if working_type:
+            params["workingType"] = working_type  # MARK_PRICE / CONTRACT_PRICE
         if time_in_force:
             params["timeInForce"] = time_in_force
         elif order_type == "LIMIT":
             params["timeInForce"] = "GTC"
+        return params
 
+    def place_order(self, symbol: str, side: str, order_type: str, quantity: float,
+                    price: float = None, stop_price: float = None, time_in_force: str = None,
+                    reduce_only: bool = False, working_type: str = None):
+        """下单
+        
+        reduce_only:
+            True  -> 只减仓，不会反向开新仓（用于平仓，避免保证金不足）
+        """
+        # 获取精度信息
+        symbol_info = self.get_symbol_info(symbol)
+        params = self._order_params(
+            symbol_info, symbol, side, order_type, quantity,
+            price=price, stop_price=stop_price, time_in_force=time_in_force,
+            reduce_only=reduce_only, working_type=working_type,
+        )
         return self._request("POST", "/fapi/v1/order", params, signed=True)
 
+    def place_batch_orders(self, orders: list):
+        """批量下单（每次最多5个），orders 为 place_order 的关键字参数列表
+
+        返回与 orders 等长的列表，失败的单子为 {"code", "msg"}；
+        某一批整体失败时只把这一批记为错误项，前面已成功的批次照常返回
+        """
+        results = []
+        symbol_infos = {}
+        for i in range(0, len(orders), 5):
+            batch = orders[i:i + 5]
+            try:
+                chunk = []
+                for order in batch:
+                    symbol = order["symbol"]
+                    if symbol not in symbol_infos:
+                        symbol_infos[symbol] = self.get_symbol_info(symbol)
+                    params = self._order_params(symbol_infos[symbol], **order)
+                    # batchOrders 内的参数按字符串传递
+                    chunk.append({k: (str(v).lower() if isinstance(v, bool) else str(v)) for k, v in params.items()})
+                response = self._request("POST", "/fapi/v1/batchOrders", {"batchOrders": json.dumps(chunk)}, signed=True)
+                if not isinstance(response, list) or len(response) != len(batch):
+                    raise Exception(f"batchOrders 返回异常: {response}")
+            except Exception as e:
+                response = [{"code": -1, "msg": str(e)} for _ in batch]
+            results.extend(response)
+        return results
+
     def cancel_order(self, symbol: str, order_id: int = None, client_order_id: str = None):
         """取消订单"""
         params = {"symbol": symbol}
@@ -245,6 +287,14 @@ class BinanceFuturesClient:
             params["origClientOrderId"] = client_order_id
         return self._request("DELETE", "/fapi/v1/order", params, signed=True)
 
+    def cancel_batch_orders(self, symbol: str, order_ids: list):
+        """批量撤单（每次最多10个）"""
+        results = []
+        for i in range(0, len(order_ids), 10):
+            params = {"symbol": symbol, "orderIdList": json.dumps([int(o) for o in order_ids[i:i + 10]])}
+            results.extend(self._request("DELETE", "/fapi/v1/batchOrders", params, signed=True))
+        return results
+
     def cancel_all_orders(self, symbol: str):
         """取消所有订单"""
         params = {"symbol": symbol}
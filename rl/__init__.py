@@ -1,47 +1,43 @@
 """
 强化学习交易系统 v4.0
 整合的自适应交易系统
+子包在首次访问导出名时才导入（PEP 562），import rl 不再加载全部模块
 """
+from .monitoring.startup import lazy_exports
 
-# 配置
-from .config import (
-    TIMEFRAME_WEIGHTS,
-    FEATURE_LEARNING,
-    DYNAMIC_THRESHOLD,
-    POSITION_MANAGEMENT,
-    RISK_CONTROL,
-    TIME_CONFIG,
-    time_manager,
-    now,
-    timestamp,
-    format_time,
-)
-
-# 核心
-from .core import TradingAgent, TradeLogger, KnowledgeBase
-
-# 市场分析
-from .market_analysis import (
-    TechnicalAnalyzer,
-    BestLevelFinder,
-    LevelDiscovery,
-    LevelScoring,
-)
-
-# 执行
-from .execution import (
-    StopLossTakeProfit,
-    PositionSizer,
-    ExitManager,
-    PositionState,
-    ExitDecision,
-)
-
-# 学习
-from .learning import UnifiedLearningSystem
-
-# 风险控制
-from .risk import RiskController
+_EXPORTS = {
+    # 配置
+    'TIMEFRAME_WEIGHTS': '.config',
+    'FEATURE_LEARNING': '.config',
+    'DYNAMIC_THRESHOLD': '.config',
+    'POSITION_MANAGEMENT': '.config',
+    'RISK_CONTROL': '.config',
+    'TIME_CONFIG': '.config',
+    'time_manager': '.config',
+    'now': '.config',
+    'timestamp': '.config',
+    'format_time': '.config',
+    # 核心
+    'TradingAgent': '.core.agent',
+    'TradeLogger': '.core.knowledge',
+    'KnowledgeBase': '.core.knowledge',
+    # 市场分析
+    'TechnicalAnalyzer': '.market_analysis.indicators',
+    'BestLevelFinder': '.market_analysis.level_finder',
+    'LevelDiscovery': '.market_analysis.levels',
+    'LevelScoring': '.market_analysis.levels',
+    # 执行
+    'StopLossTakeProfit': '.execution.sl_tp',
+    'PositionSizer': '.execution.sl_tp',
+    'ExitManager': '.execution.exit_manager',
+    'PositionState': '.execution.exit_manager',
+    'ExitDecision': '.execution.exit_manager',
+    # 学习
+    'UnifiedLearningSystem': '.learning.unified_learning_system',
+    # 风险控制
+    'RiskController': '.risk.risk_controller',
+}
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 __version__ = "4.0"
 __all__ = [
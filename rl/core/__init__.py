@@ -1,14 +1,43 @@
 """
 核心模块
-包含主Agent和交易日志系统
+包含主Agent、交易日志系统和多币种编排
+子模块在首次访问导出名时才导入（PEP 562）
 """
-from .agent import TradingAgent
-from .knowledge import TradeLogger, KnowledgeBase
+from ..monitoring.startup import lazy_exports
+
+_EXPORTS = {
+    'TradingAgent': '.agent',
+    'TradeLogger': '.knowledge',
+    'KnowledgeBase': '.knowledge',
+    'AgentOrchestrator': '.orchestrator',
+    'MarketDataFeed': '.orchestrator',
+    'CandleScheduler': '.scheduler',
+    'MarketSnapshot': '.market_snapshot',
+    'TickRecorder': '.recorder',
+    'TickRecording': '.recorder',
+    'TickReplayer': '.replay',
+    'diff_decisions': '.replay',
+    'TickBudget': '.tick_budget',
+    'ShadowEvaluator': '.shadow',
+    'ShadowVariant': '.shadow',
+    'WarmStartStore': '.warm_start',
+}
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 __all__ = [
     'TradingAgent',
     'TradeLogger',
     'KnowledgeBase',
+    'AgentOrchestrator',
+    'MarketDataFeed',
+    'CandleScheduler',
+    'MarketSnapshot',
+    'TickRecorder',
+    'TickRecording',
+    'TickReplayer',
+    'diff_decisions',
+    'TickBudget',
+    'ShadowEvaluator',
+    'ShadowVariant',
+    'WarmStartStore',
 ]
-
-
@@ -1,28 +1,36 @@
-import json
 import os
+import threading
 import time
 import uuid
 from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from ..execution.exit_manager import ExitDecision, ExitManager
+from ..execution.order_executor import FILLED, FAILED, OrderExecutor
+from ..execution.protective_orders import ProtectiveOrderManager
 from ..execution.sl_tp import PositionSizer, StopLossTakeProfit
-from ..learning.dynamic_threshold import DynamicThresholdOptimizer
-from ..learning.north_star import NorthStarOptimizer
 from ..learning.strategy_params import StrategyParamLearner
-from ..learning.exit_learner import ExitTimingLearner
 from ..learning.decision_learner import DecisionFeatureLearner
-from ..leverage_optimizer import LeverageOptimizer
+from ..market_analysis.candle_store import CandleStore, CandleWindow, normalize_ts
+from ..market_analysis.feature_cache import LevelFeatureCache
 from ..market_analysis.indicators import TechnicalAnalyzer
+from ..market_analysis.level_engine import candle_columns
 from ..market_analysis.level_finder import BestLevelFinder, FEATURE_NAMES_CN
 from ..market_analysis.levels import LevelDiscovery, LevelScoring
 from ..market_analysis.multi_timeframe_analyzer import MultiTimeframeAnalyzer
 from ..market_analysis.regime import MarketRegimeDetector, BreakoutDetector
 from ..market_analysis.pattern_detector import PatternDetector
-from ..position.batch_position_manager import BatchPositionManager
-from ..risk.risk_controller import RiskController
+from ..monitoring.metrics import registry as metrics_registry
+from ..monitoring.startup import lazy_component, startup_profile
+from ..position.account_model import AccountModel
+from ..position.position_journal import PositionJournal
 from .knowledge import EvolutionManager, KnowledgeBase, TradeLogger
+from .market_snapshot import MarketSnapshot, with_fields
+from .tick_budget import CACHED_HTF, FULL, NO_ORDERBOOK
 
 
 class ThoughtChain:
@@ -38,9 +46,29 @@ class ThoughtChain:
 
 class TradingAgent:
     MAX_POSITIONS = 3
+    # 单次入场名义价值上限（原 0.5 BTC 数量上限按 10 万价位折算，对所有交易对适用）
+    MAX_ENTRY_NOTIONAL = 50000.0
+    # 取不到交易对过滤参数时的数量步进（原 BTC 的 3 位小数）
+    DEFAULT_QTY_STEP = 0.001
 
-    def __init__(self, api_client, data_dir: str = "rl_data", leverage: int = 18):
+    @startup_profile.timed("TradingAgent.__init__")
+    def __init__(
+        self,
+        api_client,
+        data_dir: str = "rl_data",
+        leverage: int = 18,
+        symbol: str = "BTCUSDT",
+        incremental: bool = False,
+        async_orders: bool = False,
+        protective_orders: bool = False,
+        clock: Callable[[], float] = time.time,
+    ):
         self.client = api_client
+        self.symbol = symbol
+        # 墙钟注入：冷却、开平仓时间、持仓时长都从这里取时间，回放时替换为录制时间
+        self.clock = clock
+        # 增量模式：8h/1w 只用已收盘K线分析，按最后收盘K线时间缓存
+        self.incremental = incremental
         self.data_dir = data_dir
         self.leverage = leverage
         self.base_leverage = leverage
@@ -51,41 +79,60 @@ class TradingAgent:
         self.limit_requote_seconds = 2
         self.limit_requote_attempts = 6
         self.limit_maker_attempts = 3
+        # 异步下单：入场/出场提交给 OrderExecutor 后立即返回，成交后由 process_order_events 记账
+        self.async_orders = async_orders
 
         os.makedirs(data_dir, exist_ok=True)
-        self.positions: List[Dict] = []
+        self.metrics = metrics_registry
+        self.metrics.counter("agent_orders_total", "Orders reaching a terminal state", ("state",))
+        self.order_executor = OrderExecutor(
+            api_client,
+            requote_seconds=self.limit_requote_seconds,
+            requote_attempts=self.limit_requote_attempts,
+            maker_attempts=self.limit_maker_attempts,
+            offset_pct=self.limit_offset_pct,
+            cross_offset_pct=self.limit_cross_offset_pct,
+            metrics=self.metrics,
+            clock=clock,
+        )
+        self.pending_entries: Dict[str, Dict] = {}
+        # 交易所端止损/止盈条件单（可选），本地出场逻辑保留作后备
+        self.protective: Optional[ProtectiveOrderManager] = (
+            ProtectiveOrderManager(api_client, symbol, metrics=self.metrics) if protective_orders else None
+        )
+        # 出场判断与出场提交的互斥：agent 线程和出场看门狗线程都会调用
+        self._exit_lock = threading.RLock()
+        # 持仓以事件日志持久化，启动时从日志恢复
+        with startup_profile.section("TradingAgent.journal"):
+            self.journal = PositionJournal.for_dir(data_dir)
+            self.positions: List[Dict] = self.journal.recover()
+        # 本地账户模型：仓位计算读内存中的可用保证金，定期与交易所对账
+        self.account = AccountModel(
+            api_client,
+            positions=lambda: self.positions,
+            pending=lambda: self.pending_entries.values(),
+            clock=clock,
+            metrics=self.metrics,
+        )
         self.position_states: Dict[str, Dict] = {}
         self.current_position = None
 
+        self.candles = CandleStore()
         self.analyzer = TechnicalAnalyzer()
         self.level_discovery = LevelDiscovery()
         self.level_scoring = LevelScoring(f"{data_dir}/levels.json")
-        self.level_finder = BestLevelFinder(f"{data_dir}/level_stats.json")
         self.pattern_detector = PatternDetector()
         self.sl_tp = StopLossTakeProfit(self.level_scoring)
-        self.position_sizer = PositionSizer(max_risk_percent=2.0)
         self.exit_manager = ExitManager(f"{data_dir}/exit_params.json")
+        self.exit_manager.clock = clock
         self.strategy = StrategyParamLearner(f"{data_dir}/strategy_params.json")
         self.exit_manager.update_params(self.strategy.get_exit_params())
         self.sl_tp.update_params(self.strategy.get_sl_tp_params())
-        self.trade_logger = TradeLogger(f"{data_dir}/trades.db")
-        self.knowledge = KnowledgeBase(f"{data_dir}/knowledge.json")
-        self.evolution = EvolutionManager(self.trade_logger, self.knowledge)
-        self.threshold = DynamicThresholdOptimizer()
-        self.north_star = NorthStarOptimizer()
         self.multi_tf = MultiTimeframeAnalyzer()
-        self.batch_manager = BatchPositionManager()
-        self.risk = RiskController()
-        self.thoughts = ThoughtChain()
-        self.leverage_optimizer = LeverageOptimizer()
-        self.decision_learner = DecisionFeatureLearner(
-            os.path.join(data_dir, "decision_weights.json")
-        )
 
         # New modules: Market regime & Breakout detection
         self.regime_detector = MarketRegimeDetector()
         self.breakout_detector = BreakoutDetector()
-        self.exit_learner = ExitTimingLearner(data_dir)
         self.current_regime = None
         self.regime_adjustments = {}
 
@@ -99,54 +146,228 @@ class TradingAgent:
         self.last_signal_state = {}
         self.last_entry_plan = []
         self.last_entry_signal = None
+        self._entry_ctx_cache: Optional[Tuple[Dict, int, Dict]] = None
+        self._decision_generation = 0
+        self._htf_cache: Dict[str, Dict] = {}
+        self.cache_stats: Dict[str, Dict[str, int]] = {
+            "tf_analysis": {"hit": 0, "miss": 0},
+        }
+        self.feature_cache = LevelFeatureCache(self.HTF_FEATURE_CACHE_SIZE, metrics=self.metrics)
+        self.metrics.counter(
+            "agent_analysis_cache_total",
+            "Incremental analysis cache lookups",
+            ("cache", "result"),
+        )
+
+    # ========== 延迟构造的组件（首次使用时从磁盘加载） ==========
+    @lazy_component
+    def level_finder(self) -> BestLevelFinder:
+        return BestLevelFinder(f"{self.data_dir}/level_stats.json")
+
+    @lazy_component
+    def position_sizer(self) -> PositionSizer:
+        return PositionSizer(max_risk_percent=2.0)
+
+    @lazy_component
+    def trade_logger(self) -> TradeLogger:
+        return TradeLogger(f"{self.data_dir}/trades.db")
+
+    @lazy_component
+    def knowledge(self) -> KnowledgeBase:
+        return KnowledgeBase(f"{self.data_dir}/knowledge.json")
+
+    @lazy_component
+    def evolution(self) -> EvolutionManager:
+        return EvolutionManager(self.trade_logger, self.knowledge)
+
+    @lazy_component
+    def threshold(self):
+        from ..learning.dynamic_threshold import DynamicThresholdOptimizer
+        return DynamicThresholdOptimizer()
+
+    @lazy_component
+    def north_star(self):
+        from ..learning.north_star import NorthStarOptimizer
+        return NorthStarOptimizer()
+
+    @lazy_component
+    def batch_manager(self):
+        from ..position.batch_position_manager import BatchPositionManager
+        return BatchPositionManager()
+
+    @lazy_component
+    def risk(self):
+        from ..risk.risk_controller import RiskController
+        return RiskController()
+
+    @lazy_component
+    def thoughts(self) -> ThoughtChain:
+        return ThoughtChain()
+
+    @lazy_component
+    def leverage_optimizer(self):
+        from ..leverage_optimizer import LeverageOptimizer
+        return LeverageOptimizer()
+
+    @lazy_component
+    def decision_learner(self) -> DecisionFeatureLearner:
+        return DecisionFeatureLearner(os.path.join(self.data_dir, "decision_weights.json"))
+
+    @lazy_component
+    def exit_learner(self):
+        from ..learning.exit_learner import ExitTimingLearner
+        return ExitTimingLearner(self.data_dir)
 
     def _get_entry_context(self, market: Dict) -> Dict:
+        """
+        决策上下文（评分、形态、交易统计），按 market 对象缓存：
+        同一轮内 get_current_scores / check_exit_all / should_enter 共用一次计算，
+        平仓记账后（学习器权重变化）失效
+        """
+        cached = self._entry_ctx_cache
+        if cached is not None and cached[0] is market and cached[1] == self._decision_generation:
+            return cached[2]
         scores = self._score_entry(market)
         stats = self.trade_logger.get_stats()
         # 提高阈值到55，确保只抓高质量信号
         effective_threshold = 55
-        return {
+        ctx = {
             "scores": scores,
             "threshold": {"threshold": 55},
             "effective_threshold": effective_threshold,
             "cooldown": self.entry_cooldown,
             "trade_count": stats.get("total_trades", 0),
         }
+        self._entry_ctx_cache = (market, self._decision_generation, ctx)
+        return ctx
 
-        self._load_positions()
+    def _now(self) -> datetime:
+        return datetime.fromtimestamp(self.clock())
 
     def _save_positions(self) -> None:
-        path = os.path.join(self.data_dir, "active_positions.json")
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"positions": self.positions}, f, indent=2)
-
-    def _load_positions(self) -> None:
-        path = os.path.join(self.data_dir, "active_positions.json")
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.positions = data.get("positions", [])
-            except Exception:
-                self.positions = []
+        """整表写入压缩点（外部同步等批量修改后调用）；开平仓走 journal 的单条事件"""
+        self.journal.reset(self.positions)
+        # 持仓被整体替换，账户模型下一轮重新对账
+        self.account.invalidate()
 
-    def _score_level_multi_tf(
+    def _score_levels_multi_tf(
         self,
-        level: float,
+        levels: List[float],
         kl_1m,
         kl_15m,
         kl_8h,
         kl_1w,
         tf_weights: Dict[str, float],
-        extra_features: Dict[str, float] = None,
-    ) -> Dict:
-        result = self.level_scoring.score_multi_tf(
-            level,
-            {"1m": kl_1m, "15m": kl_15m, "8h": kl_8h, "1w": kl_1w},
+        extra_features: List[Dict[str, float]] = None,
+        use_htf_cache: bool = False,
+    ) -> List[Dict]:
+        columns = {
+            "1m": candle_columns(kl_1m),
+            "15m": candle_columns(kl_15m),
+        }
+        precomputed = None
+        if use_htf_cache:
+            for tf in self.HTF_TIMEFRAMES:
+                columns[tf] = self._htf_cache[tf]["columns"]
+            precomputed = self._htf_level_features(levels)
+        else:
+            columns["8h"] = candle_columns(kl_8h)
+            columns["1w"] = candle_columns(kl_1w)
+        return self.level_scoring.score_levels(
+            levels,
+            columns,
             tf_weights,
             extra_features=extra_features,
+            precomputed=precomputed,
         )
-        return result
+
+    # ========== 增量分析缓存 ==========
+    HTF_TIMEFRAMES = ("8h", "1w")
+    HTF_FEATURE_CACHE_SIZE = 4096
+
+    def _count_cache(self, cache: str, hit: bool) -> None:
+        result = "hit" if hit else "miss"
+        self.cache_stats[cache][result] += 1
+        self.metrics.inc("agent_analysis_cache_total", cache=cache, result=result)
+
+    def _htf_analysis(self, tf: str, klines: List[Dict], reuse: bool = False, price: float = None) -> Dict:
+        """
+        高周期分析（指标 + 候选位），只在出现新的收盘K线时重算
+        reuse=True（tick 降级）时缓存不比传入的收盘K线旧就直接用（传入的是上次拉取的旧K线也不重算）；
+        缓存落后于传入的最后收盘K线时（FULL tick 不写缓存、热启动快照较旧）仍重算一次
+        price：当前价，作为成交量分布的分箱参考价
+        """
+        # 缓存要跨多个 tick 持有，从环形缓冲中拷贝出来
+        closed = klines[:-1].copy() if klines else []
+        key = closed[-1].get("time") if closed else None
+        entry = self._htf_cache.get(tf)
+        if entry is not None and (entry["key"] == key or (reuse and self._htf_key_covers(entry["key"], key))):
+            self._count_cache("tf_analysis", True)
+            return entry
+        self._count_cache("tf_analysis", False)
+        entry = {
+            "key": key,
+            "klines": closed,
+            "analysis": self.analyzer.analyze(closed),
+            "candidates": self.level_discovery.discover_candidates(closed, stream=tf, price=price),
+            "columns": candle_columns(closed),
+        }
+        self._htf_cache[tf] = entry
+        return entry
+
+    @staticmethod
+    def _htf_key_covers(cached, key) -> bool:
+        """缓存的最后收盘K线不早于传入的"""
+        if key is None:
+            return True
+        if cached is None:
+            return False
+        return normalize_ts(cached) >= normalize_ts(key)
+
+    def _stream_window(self, tf: str, klines):
+        """
+        增量指标的输入：CandleStore 中该周期的整段缓冲。起点固定（写满后只后移），
+        实时 tick 走 append/revise；拉取窗口每根新K线都会滑动，直接喂会每分钟重建一次。
+        缓冲与本次K线末尾对不上（如外部直接传入窗口）时退回本次K线
+        """
+        if not klines:
+            return klines
+        buf = self.candles.buffer(tf)
+        if isinstance(klines, CandleWindow):
+            last = normalize_ts(klines.column("time")[-1])
+        else:
+            last = normalize_ts(klines[-1].get("time"))
+        if len(buf) >= len(klines) and buf.last_time == last:
+            return buf.window()
+        return klines
+
+    def _htf_level_features(self, levels: List[float]) -> Dict[str, Dict[str, np.ndarray]]:
+        """高周期逐级特征：按 (关键位, 周期, 最后收盘K线, 容差) 查 LRU，未命中的一次向量化补算"""
+        engine = self.level_scoring.engine
+        precomputed = {}
+        for tf in self.HTF_TIMEFRAMES:
+            entry = self._htf_cache[tf]
+            columns = entry["columns"]
+            precomputed[tf] = self.feature_cache.lookup(
+                levels,
+                tf,
+                entry["key"],
+                engine.tolerance_pct,
+                lambda missing, cols=columns: engine.tf_features(missing, cols),
+            )
+        return precomputed
+
+    def get_cache_stats(self) -> Dict:
+        stats = {"incremental": self.incremental}
+        for cache, counts in self.cache_stats.items():
+            total = counts["hit"] + counts["miss"]
+            stats[cache] = {
+                **counts,
+                "hit_rate": round(counts["hit"] / total, 4) if total else 0.0,
+            }
+        stats["level_features"] = self.feature_cache.stats()
+        stats["keys"] = {tf: entry["key"] for tf, entry in self._htf_cache.items()}
+        return stats
 
     def _get_tf_weights(self, current_price: float, atr_15m: float) -> Dict[str, float]:
         # 以15m为主导，降低1m噪音
@@ -177,24 +398,11 @@ class TradingAgent:
         ratio = recent_avg / base_avg
         return min(ratio, 2.0) / 2.0
 
-    def _find_kline_index(self, klines: List[Dict], ts: int) -> Optional[int]:
-        if not klines:
-            return None
-        best_idx = None
-        best_diff = None
-        for i, k in enumerate(klines):
-            diff = abs(int(k.get("time", 0)) - ts)
-            if best_diff is None or diff < best_diff:
-                best_idx = i
-                best_diff = diff
-        return best_idx
-
     def _timing_feedback(
         self, position: Dict, exit_price: float, exit_time: datetime
     ) -> Dict:
-        market = self.last_market or {}
-        klines = market.get("klines_1m") or []
-        if not klines:
+        klines = self.candles.window("1m")
+        if not len(klines):
             return {}
 
         try:
@@ -203,8 +411,8 @@ class TradingAgent:
             return {}
 
         exit_ts = int(exit_time.timestamp())
-        entry_idx = self._find_kline_index(klines, entry_ts)
-        exit_idx = self._find_kline_index(klines, exit_ts)
+        entry_idx = klines.index_of(entry_ts)
+        exit_idx = klines.index_of(exit_ts)
         if entry_idx is None or exit_idx is None:
             return {}
 
@@ -216,12 +424,12 @@ class TradingAgent:
         def _quality(idx: int, price: float, is_entry: bool) -> Optional[float]:
             start = max(0, idx - window)
             end = min(len(klines) - 1, idx + window)
-            highs = [k["high"] for k in klines[start : end + 1]]
-            lows = [k["low"] for k in klines[start : end + 1]]
-            if not highs or not lows:
+            highs = klines.column("high")[start : end + 1]
+            lows = klines.column("low")[start : end + 1]
+            if not len(highs) or not len(lows):
                 return None
-            max_high = max(highs)
-            min_low = min(lows)
+            max_high = float(highs.max())
+            min_low = float(lows.min())
             span = max_high - min_low
             if span <= 0:
                 return None
@@ -251,10 +459,10 @@ class TradingAgent:
         segment = klines[start_idx : end_idx + 1] if end_idx >= start_idx else []
         mfe = 0.0
         mae = 0.0
-        if segment:
+        if len(segment):
             entry_price = float(position.get("entry_price", 0))
-            seg_high = max(k["high"] for k in segment)
-            seg_low = min(k["low"] for k in segment)
+            seg_high = float(segment.column("high").max())
+            seg_low = float(segment.column("low").min())
             if position.get("direction") == "LONG":
                 mfe = (seg_high - entry_price) / max(1e-9, entry_price) * 100
                 mae = (entry_price - seg_low) / max(1e-9, entry_price) * 100
@@ -336,14 +544,7 @@ class TradingAgent:
         return rows
 
     def _get_available_margin(self) -> float:
-        try:
-            balances = self.client.get_balance()
-            usdt = next((b for b in balances if b.get("asset") == "USDT"), None)
-            if usdt:
-                return float(usdt.get("availableBalance", usdt.get("balance", 0)))
-        except Exception:
-            pass
-        return 0.0
+        return self.account.available_margin()
 
     def _smart_leverage(self, signal_strength: float, north_star_score: float, stats: Dict) -> int:
         """
@@ -376,8 +577,10 @@ class TradingAgent:
         signal_strength: float,
         north_star_score: float,
         stats: Dict,
+        available_margin: Optional[float] = None,
     ) -> Tuple[float, int, float]:
-        available_margin = self._get_available_margin()
+        if available_margin is None:
+            available_margin = self._get_available_margin()
         if available_margin <= 0:
             return 0.0, self.leverage, 0.0
         leverage = self._smart_leverage(signal_strength, north_star_score, stats)
@@ -397,15 +600,17 @@ class TradingAgent:
         qty = min(qty_by_margin, qty_by_risk)
         return qty, leverage, margin_budget
 
+    def _sync_executor_params(self) -> None:
+        executor = self.order_executor
+        executor.requote_seconds = self.limit_requote_seconds
+        executor.requote_attempts = self.limit_requote_attempts
+        executor.maker_attempts = self.limit_maker_attempts
+        executor.offset_pct = self.limit_offset_pct
+        executor.cross_offset_pct = self.limit_cross_offset_pct
+
     def _calc_limit_price(self, current_price: float, side: str, attempt: int = 0) -> float:
-        use_cross = attempt >= self.limit_maker_attempts
-        if side == "BUY":
-            if use_cross:
-                return current_price * (1 + self.limit_cross_offset_pct)
-            return current_price * (1 - self.limit_offset_pct)
-        if use_cross:
-            return current_price * (1 - self.limit_cross_offset_pct)
-        return current_price * (1 + self.limit_offset_pct)
+        self._sync_executor_params()
+        return self.order_executor.calc_limit_price(current_price, side, attempt=attempt)
 
     def _place_limit_with_requote(
         self,
@@ -415,74 +620,152 @@ class TradingAgent:
         current_price: float,
         reduce_only: bool = False,
     ) -> Optional[Dict]:
-        price = current_price
-        for attempt in range(max(1, self.limit_requote_attempts)):
-            limit_price = self._calc_limit_price(price, side, attempt=attempt)
-            order = self.client.place_order(
-                symbol=symbol,
-                side=side,
-                order_type="LIMIT",
-                quantity=quantity,
-                price=limit_price,
-                time_in_force="GTC",
-                reduce_only=reduce_only,
-            )
-            order_id = order.get("orderId") if isinstance(order, dict) else None
-            time.sleep(self.limit_requote_seconds)
-            if order_id:
-                status = self.client.get_order(symbol, order_id=order_id)
-                if isinstance(status, dict):
-                    order_status = status.get("status", "")
-                    if order_status == "FILLED":
-                        return status
-                    if order_status == "PARTIALLY_FILLED":
-                        # Partially filled - still return it, record what we got
-                        return status
-                    # Try to cancel unfilled order
-                    try:
-                        self.client.cancel_order(symbol, order_id=order_id)
-                    except Exception:
-                        # Cancel failed - check status again, order may have filled
-                        time.sleep(0.5)
-                        recheck = self.client.get_order(symbol, order_id=order_id)
-                        if isinstance(recheck, dict) and recheck.get("status") in ("FILLED", "PARTIALLY_FILLED"):
-                            return recheck
-            try:
-                ticker = self.client.get_ticker_price(symbol)
-                price = float(ticker.get("price", price))
-            except Exception:
-                pass
-        return None
+        """同步下单（阻塞到成交或重报用尽）"""
+        self._sync_executor_params()
+        return self.order_executor.execute_sync(
+            symbol, side, quantity, current_price, reduce_only=reduce_only
+        )
+
+    def _submit_limit(
+        self,
+        side: str,
+        quantity: float,
+        current_price: float,
+        reduce_only: bool = False,
+        tag: Optional[Dict] = None,
+        urgent: bool = False,
+    ):
+        self._sync_executor_params()
+        return self.order_executor.submit(
+            self.symbol, side, quantity, current_price, reduce_only=reduce_only, tag=tag, urgent=urgent
+        )
+
+    def has_order_events(self) -> bool:
+        return self.order_executor.has_events()
+
+    def process_order_events(self) -> List[Dict]:
+        """
+        在 agent 线程内消费已完成的订单，完成入场/出场记账
+        返回事件列表：entry_filled / entry_failed / exit_filled / exit_unfilled
+        """
+        events = self._reconcile_protective_orders()
+        for ticket in self.order_executor.drain_events():
+            kind = ticket.tag.get("kind")
+            if kind == "entry":
+                position = self.pending_entries.pop(ticket.ticket_id, None)
+                if position is None:
+                    continue
+                if ticket.state == FILLED and ticket.executed_qty > 0:
+                    position["quantity"] = self._floor_qty(
+                        ticket.executed_qty, self._qty_filters()["step_size"]
+                    )
+                    position["order_state"] = ticket.state
+                    self.positions.append(position)
+                    self.account.on_entry_fill(position)
+                    if self.protective is not None:
+                        self.protective.protect([position])
+                    self.journal.open(position)
+                    self.metrics.inc("agent_trades_total", action="entry")
+                    events.append({"type": "entry_filled", "position": position})
+                else:
+                    events.append({
+                        "type": "entry_failed",
+                        "trade_id": position["trade_id"],
+                        "error": ticket.error or "limit_order_unfilled",
+                    })
+            elif kind == "exit":
+                position = next(
+                    (p for p in self.positions if p["trade_id"] == ticket.tag.get("trade_id")),
+                    None,
+                )
+                if position is None:
+                    continue
+                # 下单异常时与同步路径一致：仍清理本地持仓
+                if ticket.state in (FILLED, FAILED):
+                    exit_price = ticket.fill_price if ticket.state == FILLED else ticket.ref_price
+                    with self._exit_lock:
+                        position.pop("exit_pending", None)
+                        trade = self._finalize_exit(
+                            position,
+                            exit_price,
+                            ticket.tag.get("reason", ""),
+                            ticket.tag.get("confirmations", []),
+                        )
+                    events.append({"type": "exit_filled", "trade": trade})
+                else:
+                    position.pop("exit_pending", None)
+                    events.append({
+                        "type": "exit_unfilled",
+                        "trade_id": position["trade_id"],
+                        "error": ticket.error,
+                    })
+        return events
 
     def analyze_market(
-        self, kl_1m, kl_15m, kl_8h, kl_1w, orderbook: Optional[Dict] = None
+        self, kl_1m, kl_15m, kl_8h, kl_1w, orderbook: Optional[Dict] = None, degrade: int = FULL
     ) -> Optional[Dict]:
+        """
+        degrade：tick 降级档位（见 tick_budget）
+        - >= CACHED_HTF：8h/1w 沿用缓存的分析和候选位
+        - >= NO_ORDERBOOK：关键位评分不使用盘口特征
+        """
         if not kl_1m:
             return None
-        analysis_1m = self.analyzer.analyze(kl_1m)
-        analysis_15m = self.analyzer.analyze(kl_15m)
-        analysis_8h = self.analyzer.analyze(kl_8h)
-        analysis_1w = self.analyzer.analyze(kl_1w)
+        use_htf_cache = self.incremental or degrade >= CACHED_HTF
+        if degrade >= NO_ORDERBOOK:
+            orderbook = None
+        with self.metrics.stage("analyze_candles"):
+            kl_1m = self.candles.ingest("1m", kl_1m)
+            kl_15m = self.candles.ingest("15m", kl_15m)
+            kl_8h = self.candles.ingest("8h", kl_8h)
+            kl_1w = self.candles.ingest("1w", kl_1w)
+        htf = None
+        with self.metrics.stage("analyze_indicators"):
+            analysis_1m = self.analyzer.analyze(self._stream_window("1m", kl_1m), stream="1m", anchored=True)
+            analysis_15m = self.analyzer.analyze(self._stream_window("15m", kl_15m), stream="15m", anchored=True)
+            if use_htf_cache:
+                reuse = degrade >= CACHED_HTF
+                htf = {
+                    tf: self._htf_analysis(tf, kl, reuse=reuse, price=kl_1m[-1]["close"])
+                    for tf, kl in (("8h", kl_8h), ("1w", kl_1w))
+                }
+                kl_8h = htf["8h"]["klines"]
+                kl_1w = htf["1w"]["klines"]
+                analysis_8h = htf["8h"]["analysis"]
+                analysis_1w = htf["1w"]["analysis"]
+            else:
+                analysis_8h = self.analyzer.analyze(self._stream_window("8h", kl_8h), stream="8h", anchored=True)
+                analysis_1w = self.analyzer.analyze(self._stream_window("1w", kl_1w), stream="1w", anchored=True)
 
         tf = self.multi_tf.analyze(analysis_1m, analysis_15m, analysis_8h, analysis_1w)
         current_price = kl_1m[-1]["close"]
+        self.account.update_mark(current_price)
         atr_15m = analysis_15m.get("atr", 0)
         tf_weights = self._get_tf_weights(current_price, atr_15m)
         self.last_tf_weights = tf_weights
         recent_volume_ratio = self._recent_volume_ratio(kl_1m)
 
-        levels_1m = self.level_discovery.discover_all(
-            kl_1m, current_price=current_price, atr=atr_15m
-        )
-        levels_15m = self.level_discovery.discover_all(
-            kl_15m, current_price=current_price, atr=atr_15m
-        )
-        levels_8h = self.level_discovery.discover_all(
-            kl_8h, current_price=current_price, atr=atr_15m
-        )
-        levels_1w = self.level_discovery.discover_all(
-            kl_1w, current_price=current_price, atr=atr_15m
-        )
+        with self.metrics.stage("analyze_level_discovery"):
+            levels_1m = self.level_discovery.discover_all(
+                kl_1m, current_price=current_price, atr=atr_15m, stream="1m"
+            )
+            levels_15m = self.level_discovery.discover_all(
+                kl_15m, current_price=current_price, atr=atr_15m, stream="15m"
+            )
+            if htf is not None:
+                levels_8h = self.level_discovery.filter_candidates(
+                    htf["8h"]["candidates"], current_price, atr=atr_15m
+                ) if kl_8h else {"support": [], "resistance": []}
+                levels_1w = self.level_discovery.filter_candidates(
+                    htf["1w"]["candidates"], current_price, atr=atr_15m
+                ) if kl_1w else {"support": [], "resistance": []}
+            else:
+                levels_8h = self.level_discovery.discover_all(
+                    kl_8h, current_price=current_price, atr=atr_15m, stream="8h"
+                )
+                levels_1w = self.level_discovery.discover_all(
+                    kl_1w, current_price=current_price, atr=atr_15m, stream="1w"
+                )
 
         candidates = set()
         for group in (levels_1m, levels_15m, levels_8h, levels_1w):
@@ -512,45 +795,51 @@ class TradingAgent:
         best_resistance = None
 
         level_scores = []
-        for level in candidates:
-            extra_features = self._orderbook_features(level, orderbook)
-            extra_features["recent_volume_ratio"] = recent_volume_ratio
-            result = self._score_level_multi_tf(
-                level,
+        with self.metrics.stage("analyze_level_scoring"):
+            candidate_list = list(candidates)
+            extras = []
+            for level in candidate_list:
+                extra_features = self._orderbook_features(level, orderbook)
+                extra_features["recent_volume_ratio"] = recent_volume_ratio
+                extras.append(extra_features)
+            results = self._score_levels_multi_tf(
+                candidate_list,
                 kl_1m,
                 kl_15m,
                 kl_8h,
                 kl_1w,
                 tf_weights,
-                extra_features=extra_features,
+                extra_features=extras,
+                use_htf_cache=use_htf_cache,
             )
-            score = result["score"]
-            features = result["features"]
-            breakdown = self._feature_breakdown(features)
-            level_scores.append(
-                {
-                    "price": level,
-                    "score": score,
-                    "features": features,
-                    "breakdown": breakdown,
-                }
-            )
-            if level <= current_price:
-                if not best_support or score > best_support["score"]:
-                    best_support = {
-                        "price": level,
-                        "score": score,
-                        "features": features,
-                        "feature_breakdown": breakdown,
-                    }
-            if level >= current_price:
-                if not best_resistance or score > best_resistance["score"]:
-                    best_resistance = {
+            for level, result in zip(candidate_list, results):
+                score = result["score"]
+                features = result["features"]
+                breakdown = self._feature_breakdown(features)
+                level_scores.append(
+                    {
                         "price": level,
                         "score": score,
                         "features": features,
-                        "feature_breakdown": breakdown,
+                        "breakdown": breakdown,
                     }
+                )
+                if level <= current_price:
+                    if not best_support or score > best_support["score"]:
+                        best_support = {
+                            "price": level,
+                            "score": score,
+                            "features": features,
+                            "feature_breakdown": breakdown,
+                        }
+                if level >= current_price:
+                    if not best_resistance or score > best_resistance["score"]:
+                        best_resistance = {
+                            "price": level,
+                            "score": score,
+                            "features": features,
+                            "feature_breakdown": breakdown,
+                        }
 
         # Enforce minimum S/R gap across timeframes (0.3%)
         min_gap_pct = 0.3
@@ -610,56 +899,51 @@ class TradingAgent:
         )[:12]
 
         # Detect market regime (TRENDING / RANGING / VOLATILE)
-        ema_short = analysis_15m.get("ema_short", current_price)
-        ema_long = analysis_15m.get("ema_long", current_price)
-        regime_info = self.regime_detector.detect(
-            kl_15m, atr_15m, ema_short, ema_long
-        )
-        self.current_regime = regime_info.get("regime", "NORMAL")
-        self.regime_adjustments = self.regime_detector.get_strategy_adjustments(
-            self.current_regime
-        )
-
-        # Check for breakouts of best S/R levels
-        breakout_support = None
-        breakout_resistance = None
-        if best_support:
-            breakout_support = self.breakout_detector.check_breakout(
-                best_support["price"], "support", kl_1m
+        with self.metrics.stage("analyze_regime"):
+            ema_short = analysis_15m.get("ema_short", current_price)
+            ema_long = analysis_15m.get("ema_long", current_price)
+            regime_info = self.regime_detector.detect(
+                kl_15m, atr_15m, ema_short, ema_long
             )
-        if best_resistance:
-            breakout_resistance = self.breakout_detector.check_breakout(
-                best_resistance["price"], "resistance", kl_1m
+            self.current_regime = regime_info.get("regime", "NORMAL")
+            self.regime_adjustments = self.regime_detector.get_strategy_adjustments(
+                self.current_regime
             )
 
-        sr_gap_pct = None
-        sr_gap_valid = True
-        if best_support and best_resistance:
-            sr_gap_pct = (best_resistance["price"] - best_support["price"]) / current_price * 100
-            sr_gap_valid = sr_gap_pct >= min_gap_pct
-
-        market = {
-            "current_price": kl_1m[-1]["close"],
-            "analysis_1m": analysis_1m,
-            "analysis_15m": analysis_15m,
-            "analysis_8h": analysis_8h,
-            "analysis_1w": analysis_1w,
-            "macro_trend": tf["macro_trend"],
-            "micro_trend": tf["micro_trend"],
-            "best_support": best_support,
-            "best_resistance": best_resistance,
-            "sr_gap_pct": sr_gap_pct,
-            "sr_gap_valid": sr_gap_valid,
-            "candidates_count": candidates_count,
-            "level_scores": self.last_level_scores,
-            "tf_weights": tf_weights,
-            "klines_1m": kl_1m[-240:] if kl_1m else [],
-            "klines_15m": kl_15m[-240:] if kl_15m else [],
-            # New: regime and breakout info
-            "regime": regime_info,
-            "breakout_support": breakout_support,
-            "breakout_resistance": breakout_resistance,
-        }
+        # Check for breakouts of best S/R levels
+        with self.metrics.stage("analyze_breakout"):
+            breakout_support = None
+            breakout_resistance = None
+            if best_support:
+                breakout_support = self.breakout_detector.check_breakout(
+                    best_support["price"], "support", kl_1m
+                )
+            if best_resistance:
+                breakout_resistance = self.breakout_detector.check_breakout(
+                    best_resistance["price"], "resistance", kl_1m
+                )
+
+        # 不可变快照：klines_1m/15m（环形缓冲上的视图）和 sr_gap 首次访问时才计算
+        market = MarketSnapshot(
+            kl_1m=kl_1m,
+            kl_15m=kl_15m,
+            current_price=current_price,
+            analysis_1m=analysis_1m,
+            analysis_15m=analysis_15m,
+            analysis_8h=analysis_8h,
+            analysis_1w=analysis_1w,
+            macro_trend=tf["macro_trend"],
+            micro_trend=tf["micro_trend"],
+            best_support=best_support,
+            best_resistance=best_resistance,
+            candidates_count=candidates_count,
+            level_scores=self.last_level_scores,
+            tf_weights=tf_weights,
+            regime=regime_info,
+            breakout_support=breakout_support,
+            breakout_resistance=breakout_resistance,
+            degrade=degrade,
+        )
         self.last_market = market
         return market
 
@@ -796,8 +1080,7 @@ class TradingAgent:
         pattern_hits = []
         
         try:
-            pattern_hits = self.pattern_detector.detect(market)
-            market["patterns"] = pattern_hits if pattern_hits else []  # 修复漏洞2：确保不是None
+            pattern_hits = self.pattern_detector.detect(market) or []  # 修复漏洞2：确保不是None
             long_pattern_score = sum(p.get("score", 0) for p in pattern_hits if p.get("direction") == "LONG")
             short_pattern_score = sum(p.get("score", 0) for p in pattern_hits if p.get("direction") == "SHORT")
             long_score += min(12, int(long_pattern_score))
@@ -805,7 +1088,7 @@ class TradingAgent:
             pattern_boost = {"long": min(12, int(long_pattern_score)), "short": min(12, int(short_pattern_score))}
         except Exception as e:
             # 形态检测失败，不影响主流程
-            market["patterns"] = []
+            pattern_hits = []
 
         # Middle-ground penalty
         is_middle_ground = False
@@ -824,8 +1107,10 @@ class TradingAgent:
         short_features = {}
         
         try:
-            long_features = self.decision_learner.extract_features(market, "LONG")
-            short_features = self.decision_learner.extract_features(market, "SHORT")
+            # 形态结果只附加在派生快照上，不修改传入的 market
+            learner_market = with_fields(market, patterns=pattern_hits)
+            long_features = self.decision_learner.extract_features(learner_market, "LONG")
+            short_features = self.decision_learner.extract_features(learner_market, "SHORT")
             long_learning_score = self.decision_learner.score(long_features)
             short_learning_score = self.decision_learner.score(short_features)
             
@@ -856,6 +1141,8 @@ class TradingAgent:
     def should_enter(self, market: Dict) -> Optional[Dict]:
         if len(self.positions) >= self.MAX_POSITIONS:
             return None
+        if self.pending_entries:
+            return None
 
         risk_ok = self.risk.can_trade()
         if not risk_ok.get("allowed"):
@@ -865,10 +1152,15 @@ class TradingAgent:
         threshold = entry_ctx["threshold"]
         effective_threshold = entry_ctx["effective_threshold"]
         cooldown = entry_ctx.get("cooldown", self.entry_cooldown)
-        if time.time() - self._last_entry_time < cooldown:
+        if self.clock() - self._last_entry_time < cooldown:
             return None
         self.last_signal_state = entry_ctx
+        return self.select_entry(market, scores, threshold, effective_threshold)
 
+    def select_entry(
+        self, market: Dict, scores: Dict, threshold: Dict, effective_threshold: float
+    ) -> Optional[Dict]:
+        """评分 -> 入场信号（不检查持仓数、风控和冷却）；影子变体用各自的阈值复用"""
         # Check for breakout signal (priority over normal entry)
         breakout_signal = scores.get("breakout_signal")
         if breakout_signal and breakout_signal.get("strength", 0) > 0.3:
@@ -960,7 +1252,7 @@ class TradingAgent:
         Check if we should close current position and open opposite (breakout reversal)
         Called when breakout signal appears against current position
         """
-        scores = self._score_entry(market)
+        scores = self._get_entry_context(market)["scores"]
         breakout_signal = scores.get("breakout_signal")
 
         if not breakout_signal:
@@ -986,6 +1278,26 @@ class TradingAgent:
             "reason": f"Breakout reversal: {breakout_signal['type']}",
         }
 
+    def _qty_filters(self) -> Dict[str, float]:
+        """交易对数量过滤参数（stepSize / minQty / maxQty / minNotional），取不到时按 3 位小数"""
+        try:
+            filters = self.client.get_symbol_filters(self.symbol) or {}
+        except Exception:
+            filters = {}
+        step = float(filters.get("step_size", 0) or 0) or self.DEFAULT_QTY_STEP
+        return {
+            "step_size": step,
+            "min_qty": float(filters.get("min_qty", 0) or 0) or step,
+            "max_qty": float(filters.get("max_qty", 0) or 0),
+            "min_notional": float(filters.get("min_notional", 0) or 0),
+        }
+
+    @staticmethod
+    def _floor_qty(qty: float, step: float) -> float:
+        """数量向下取整到 stepSize（与 client 下单时的取整一致）"""
+        d_step = Decimal(str(step))
+        return float((Decimal(str(qty)) // d_step) * d_step)
+
     def execute_entry(self, market: Dict, signal: Dict) -> Dict:
         price = market["current_price"]
         atr = market["analysis_15m"].get("atr", 0)
@@ -999,27 +1311,28 @@ class TradingAgent:
         if available_margin <= 0:
             return {"error": "无法获取可用保证金"}
         base_qty, leverage, margin_budget = self._smart_position_size(
-            price, sltp["stop_loss"], signal_strength, float(north_star.get("score", 0)), stats
+            price, sltp["stop_loss"], signal_strength, float(north_star.get("score", 0)), stats,
+            available_margin=available_margin,
         )
         if base_qty <= 0:
             return {"error": "计算仓位为0，保证金可能不足"}
-        base_qty = max(0.001, round(base_qty, 3))
-        base_qty = min(base_qty, 0.5)
-        filters = {}
-        try:
-            filters = self.client.get_symbol_filters("BTCUSDT")
-        except Exception:
-            filters = {}
-        min_qty = float(filters.get("min_qty", 0) or 0)
-        min_notional = float(filters.get("min_notional", 0) or 0)
-        if min_qty > 0 and base_qty < min_qty:
-            return {"error": f"下单数量过小: qty={base_qty}, minQty={min_qty}"}
+        filters = self._qty_filters()
+        step = filters["step_size"]
+        min_qty = filters["min_qty"]
+        min_notional = filters["min_notional"]
+        # 上限：交易所 maxQty 与单次名义价值上限；下限：过小的数量抬到 minQty
+        max_qty = self.MAX_ENTRY_NOTIONAL / price if price > 0 else 0.0
+        if filters["max_qty"] > 0:
+            max_qty = min(max_qty, filters["max_qty"])
+        if min_qty > max_qty:
+            return {"error": f"下单数量过小: minQty={min_qty} 超过数量上限 {max_qty:.8g}"}
+        base_qty = max(min_qty, self._floor_qty(min(base_qty, max_qty), step))
         if min_notional > 0 and price * base_qty < min_notional:
             notional = price * base_qty
             return {"error": f"名义价值过小: notional={notional:.4f}, minNotional={min_notional}"}
         if leverage != self.leverage:
             try:
-                self.client.set_leverage("BTCUSDT", leverage)
+                self.client.set_leverage(self.symbol, leverage)
             except Exception:
                 pass
             self.leverage = leverage
@@ -1028,9 +1341,9 @@ class TradingAgent:
         total_batches = max(1, len(batches))
         created = []
         for idx, batch in enumerate(batches):
-            if len(self.positions) >= self.MAX_POSITIONS:
+            if len(self.positions) + len(self.pending_entries) >= self.MAX_POSITIONS:
                 break
-            qty = round(base_qty * batch["ratio"], 3)
+            qty = self._floor_qty(base_qty * batch["ratio"], step)
             # Ensure batch qty meets minimum requirements
             if qty < min_qty:
                 qty = min_qty
@@ -1050,6 +1363,7 @@ class TradingAgent:
             trade_id = str(uuid.uuid4())
             position = {
                 "trade_id": trade_id,
+                "symbol": self.symbol,
                 "direction": signal["direction"],
                 "entry_price": price,
                 "quantity": qty,
@@ -1057,7 +1371,7 @@ class TradingAgent:
                 "take_profit": take_profit,
                 "leverage": leverage,
                 "margin_used": round(margin_estimate, 4),
-                "timestamp_open": datetime.now().isoformat(),
+                "timestamp_open": self._now().isoformat(),
                 "entry_score": signal.get("strength", 0),
                 "entry_reason": signal.get("reason", ""),
                 "batch_index": idx + 1,
@@ -1070,10 +1384,18 @@ class TradingAgent:
                     else market.get("best_resistance", {}).get("features")
                 ),
             }
+            side = "BUY" if signal["direction"] == "LONG" else "SELL"
+            if self.async_orders:
+                ticket = self._submit_limit(
+                    side, qty, price, tag={"kind": "entry", "trade_id": trade_id}
+                )
+                position["order_state"] = ticket.state
+                self.pending_entries[ticket.ticket_id] = position
+                created.append(position)
+                continue
             try:
-                side = "BUY" if signal["direction"] == "LONG" else "SELL"
                 order = self._place_limit_with_requote(
-                    symbol="BTCUSDT",
+                    symbol=self.symbol,
                     side=side,
                     quantity=position["quantity"],
                     current_price=price,
@@ -1082,15 +1404,21 @@ class TradingAgent:
                     return {"error": "limit_order_unfilled"}
                 executed_qty = float(order.get("executedQty", position["quantity"]))
                 if executed_qty > 0:
-                    position["quantity"] = round(executed_qty, 3)
+                    position["quantity"] = self._floor_qty(executed_qty, step)
             except Exception as exc:
                 return {"error": str(exc)}
 
             self.positions.append(position)
+            self.account.on_entry_fill(position)
             created.append(position)
-
-        self._save_positions()
-        self._last_entry_time = time.time()
+            self.metrics.inc("agent_trades_total", action="entry")
+
+        if not self.async_orders:
+            if self.protective is not None:
+                self.protective.protect(created)
+            for position in created:
+                self.journal.open(position)
+        self._last_entry_time = self.clock()
         self.last_entry_plan = batches
         self.last_entry_signal = signal
         return created[0] if created else {"error": "no_position"}
@@ -1098,18 +1426,112 @@ class TradingAgent:
     def check_exit_all(self, current_price: float, market: Dict) -> List[Tuple[Dict, ExitDecision]]:
         exits = []
         scores = self.get_current_scores(market)
-        market_with_scores = dict(market)
-        market_with_scores["entry_scores"] = {"long": scores["long"], "short": scores["short"]}
-        market_with_scores["entry_threshold"] = scores.get("threshold", {})
-        for pos in list(self.positions):
-            state = self.position_states.get(pos.get("trade_id")) or {}
-            decision = self.exit_manager.evaluate(pos, market_with_scores, current_price, state)
-            if state:
-                self.position_states[pos.get("trade_id")] = state
-            if decision:
-                exits.append((pos, decision))
+        market_with_scores = with_fields(
+            market,
+            entry_scores={"long": scores["long"], "short": scores["short"]},
+            entry_threshold=scores.get("threshold", {}),
+        )
+        with self._exit_lock:
+            for pos in list(self.positions):
+                if pos.get("exit_pending"):
+                    continue
+                state = self.position_states.get(pos.get("trade_id")) or {}
+                decision = self.exit_manager.evaluate(pos, market_with_scores, current_price, state)
+                if state:
+                    self.position_states[pos.get("trade_id")] = state
+                if decision:
+                    exits.append((pos, decision))
+        self.sync_protective_orders()
+        return exits
+
+    def sync_protective_orders(self) -> None:
+        """补挂缺失的保护单，并把利润锁定对应的止损价同步到交易所止损单"""
+        if self.protective is None or not self.positions:
+            return
+        with self._exit_lock:
+            positions = [p for p in self.positions if not p.get("exit_pending")]
+            before = {p["trade_id"]: dict(p.get("protective") or {}) for p in positions}
+            stops = {}
+            for pos in positions:
+                lock_stop = self.exit_manager.profit_lock_stop(
+                    pos, self.position_states.get(pos.get("trade_id"))
+                )
+                if lock_stop is not None:
+                    stops[pos["trade_id"]] = lock_stop
+            placed = self.protective.protect(positions)
+            amended = self.protective.sync(positions, stops)
+            if placed or amended:
+                for pos in positions:
+                    if pos.get("protective") != before[pos["trade_id"]]:
+                        self.journal.update(pos["trade_id"], {"protective": pos["protective"]})
+
+    def _reconcile_protective_orders(self) -> List[Dict]:
+        """交易所保护单成交后完成本地平仓记账"""
+        events = []
+        if self.protective is None or not self.positions:
+            return events
+        with self._exit_lock:
+            for fill in self.protective.reconcile(list(self.positions)):
+                position = fill["position"]
+                position.pop("exit_pending", None)
+                trade = self._finalize_exit(
+                    position,
+                    fill["price"],
+                    fill["reason"],
+                    ["exchange_protective_order", f"order_id={fill['order'].get('orderId')}"],
+                )
+                events.append({"type": "exit_filled", "trade": trade})
+        return events
+
+    def check_exit_price(self, current_price: float) -> List[Tuple[Dict, ExitDecision]]:
+        """只按价格规则检查出场（看门狗调用），支撑阻力位取上一轮分析的缓存"""
+        exits = []
+        market = self.last_market or {}
+        self.account.update_mark(current_price)
+        with self._exit_lock:
+            for pos in list(self.positions):
+                if pos.get("exit_pending"):
+                    continue
+                state = self.position_states.get(pos.get("trade_id")) or {}
+                decision = self.exit_manager.evaluate_price(pos, market, current_price, state)
+                if state:
+                    self.position_states[pos.get("trade_id")] = state
+                if decision:
+                    exits.append((pos, decision))
         return exits
 
+    def request_exit(
+        self,
+        position: Dict,
+        current_price: float,
+        reason: str,
+        confirmations: List[str],
+        urgent: bool = False,
+    ) -> bool:
+        """
+        把出场交给 OrderExecutor（线程安全），成交后由 process_order_events 记账
+        已在出场中或已不在持仓列表的仓位返回 False
+        """
+        with self._exit_lock:
+            if position.get("exit_pending") or not any(p is position for p in self.positions):
+                return False
+            side = "SELL" if position["direction"] == "LONG" else "BUY"
+            self._submit_limit(
+                side,
+                position["quantity"],
+                current_price,
+                reduce_only=True,
+                tag={
+                    "kind": "exit",
+                    "trade_id": position["trade_id"],
+                    "reason": reason,
+                    "confirmations": list(confirmations or []),
+                },
+                urgent=urgent,
+            )
+            position["exit_pending"] = True
+        return True
+
     def execute_exit_position(
         self,
         position: Dict,
@@ -1121,21 +1543,40 @@ class TradingAgent:
     ) -> Optional[Dict]:
         if skip_order:
             skip_api = True
+        if not skip_api and self.async_orders:
+            # 异步出场：挂单后立即返回，成交后在 process_order_events 中记账
+            self.request_exit(position, current_price, reason, confirmations)
+            return None
         if not skip_api:
+            with self._exit_lock:
+                if position.get("exit_pending"):
+                    return None
+                position["exit_pending"] = True
             side = "SELL" if position["direction"] == "LONG" else "BUY"
             try:
                 order = self._place_limit_with_requote(
-                    symbol="BTCUSDT",
+                    symbol=self.symbol,
                     side=side,
                     quantity=position["quantity"],
                     current_price=current_price,
                     reduce_only=True,
                 )
                 if not order:
+                    position.pop("exit_pending", None)
                     return None
             except Exception:
                 pass  # 继续清理本地持仓，即使API失败
+        with self._exit_lock:
+            return self._finalize_exit(position, current_price, reason, confirmations)
 
+    def _finalize_exit(
+        self,
+        position: Dict,
+        current_price: float,
+        reason: str,
+        confirmations: List[str],
+    ) -> Dict:
+        """平仓记账：盈亏、学习器更新、交易记录、移除持仓"""
         entry_price = position["entry_price"]
         qty = position["quantity"]
         
@@ -1159,7 +1600,7 @@ class TradingAgent:
         entry_value = entry_price * qty
         pnl_percent = (pnl / entry_value * 100) if entry_value > 0 else 0.0
 
-        exit_time = datetime.now()
+        exit_time = self._now()
         
         # Calculate hold time
         hold_minutes = 0.0
@@ -1173,13 +1614,12 @@ class TradingAgent:
         exit_timing_quality = 0.0
         klines_before = []
         klines_after = []
-        market = self.last_market or {}
-        klines_1m = market.get("klines_1m", [])
+        klines_1m = self.candles.window("1m")
         
-        if klines_1m and len(klines_1m) >= 10:
+        if len(klines_1m) >= 10:
             try:
                 exit_ts = int(exit_time.timestamp())
-                exit_idx = self._find_kline_index(klines_1m, exit_ts)
+                exit_idx = klines_1m.index_of(exit_ts)
                 if exit_idx is not None:
                     # Get 5 candles before and after
                     klines_before = klines_1m[max(0, exit_idx - 5):exit_idx]
@@ -1234,6 +1674,7 @@ class TradingAgent:
             "patterns": position.get("patterns", []),
         }
         self.trade_logger.log_trade(trade)
+        self.metrics.inc("agent_trades_total", action="exit")
         self.risk.update_trade_result(pnl_percent)
         self.level_finder.update_stats(pnl > 0)
         features = position.get("level_features")
@@ -1274,8 +1715,12 @@ class TradingAgent:
                     # 学习失败不影响交易记录
                     pass
         
+        if self.protective is not None:
+            self.protective.release([position])
+        self.account.on_exit_fill(position, current_price)
         self.positions = [p for p in self.positions if p["trade_id"] != position["trade_id"]]
-        self._save_positions()
+        self.journal.close(position["trade_id"])
+        self._decision_generation += 1
         return trade
 
     def get_current_scores(self, market: Dict) -> Dict:
@@ -1327,6 +1772,11 @@ class TradingAgent:
 
         positions = []
         current_price = self.last_market.get("current_price", 0)
+        market_with_scores = with_fields(
+            self.last_market,
+            entry_scores={"long": scores["long"], "short": scores["short"]},
+            entry_threshold=scores.get("threshold", {}),
+        )
         opportunity_delta = self.exit_manager.params.get("opportunity_delta", 0)
         min_profit = self.exit_manager.params.get("min_profit_pct", 0)
         max_hold = self.exit_manager.params.get("max_hold_minutes", 0)
@@ -1334,7 +1784,7 @@ class TradingAgent:
             hold_minutes = None
             try:
                 opened = datetime.fromisoformat(pos.get("timestamp_open"))
-                hold_minutes = (datetime.now() - opened).total_seconds() / 60
+                hold_minutes = (self._now() - opened).total_seconds() / 60
             except Exception:
                 hold_minutes = None
             pnl_percent = 0.0
@@ -1351,15 +1801,7 @@ class TradingAgent:
                 opp_score = scores.get("long", 0)
                 opp_label = "多头"
             opp_need = scores.get("min_score", 0) + opportunity_delta
-            decision = self.exit_manager.evaluate(
-                pos,
-                {
-                    **self.last_market,
-                    "entry_scores": {"long": scores["long"], "short": scores["short"]},
-                    "entry_threshold": scores.get("threshold", {}),
-                },
-                current_price,
-            )
+            decision = self.exit_manager.evaluate(pos, market_with_scores, current_price)
             positions.append(
                 {
                     "trade_id": pos.get("trade_id"),
@@ -8,6 +8,8 @@ class TradeLogger:
     def __init__(self, db_path: str):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # get_stats 结果缓存，log_trade 后失效
+        self._stats_cache: Dict[int, Dict] = {}
         self._init_db()
 
     def _init_db(self) -> None:
@@ -40,6 +42,7 @@ class TradeLogger:
         conn.close()
 
     def log_trade(self, trade: Dict) -> None:
+        self._stats_cache.clear()
         conn = sqlite3.connect(self.db_path)
         c = conn.cursor()
         try:
@@ -90,6 +93,13 @@ class TradeLogger:
         return [dict(zip(columns, row)) for row in rows]
 
     def get_stats(self, last_n: int = 100) -> Dict:
+        stats = self._stats_cache.get(last_n)
+        if stats is None:
+            stats = self._compute_stats(last_n)
+            self._stats_cache[last_n] = stats
+        return dict(stats)
+
+    def _compute_stats(self, last_n: int) -> Dict:
         trades = self.get_recent(last_n)
         if not trades:
             return {
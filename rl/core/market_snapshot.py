@@ -0,0 +1,178 @@
+"""
+不可变的行情快照
+
+analyze_market 原来每轮构造一个大字典，check_exit_all 再 dict(market) 浅拷贝一次，
+get_ai_logic 用 {**self.last_market} 再展开一次，_score_entry 还会往里写 patterns。
+MarketSnapshot 用 __slots__ 保存分析结果，按 Mapping 接口只读访问（market["x"] / market.get("x")），
+原有读取代码不用改：
+
+- 不可变：没有 __setitem__，属性赋值抛 AttributeError；需要附加字段时用 with_scores()，
+  返回一个只有两个槽位（原快照引用 + 覆盖的几个键）的只读视图，不复制任何字段
+- klines_1m / klines_15m：构造时从K线存储的窗口切出最近 240 根并复制（6 x 240 浮点）。
+  窗口是环形缓冲上的视图，之后的 tick 会原地改写末根、缓冲绕回后整段复用；
+  last_market、看门狗、影子变体等跨 tick 持有的快照必须拿自己的副本
+- 懒计算：sr_gap_pct / sr_gap_valid 首次访问时计算，结果缓存在快照上
+"""
+from typing import Dict, Iterator, Mapping
+
+from ..market_analysis.candle_store import CandleWindow
+
+# 分析阶段直接给出的字段
+FIELDS = (
+    "current_price",
+    "analysis_1m",
+    "analysis_15m",
+    "analysis_8h",
+    "analysis_1w",
+    "macro_trend",
+    "micro_trend",
+    "best_support",
+    "best_resistance",
+    "candidates_count",
+    "level_scores",
+    "tf_weights",
+    "regime",
+    "breakout_support",
+    "breakout_resistance",
+    "degrade",
+)
+# 首次访问时计算
+DERIVED = ("klines_1m", "klines_15m", "sr_gap_pct", "sr_gap_valid")
+
+MIN_SR_GAP_PCT = 0.3
+KLINE_VIEW = 240
+_FIELD_SET = frozenset(FIELDS)
+_DERIVED_SET = frozenset(DERIVED)
+
+
+def _own_klines(klines):
+    """最近 KLINE_VIEW 根的独立副本（CandleWindow 切片仍是缓冲视图，需要 copy；列表切片本身就是新列表）"""
+    if klines is None:
+        return []
+    window = klines[-KLINE_VIEW:]
+    return window.copy() if isinstance(window, CandleWindow) else window
+
+
+class MarketSnapshot(Mapping):
+    __slots__ = FIELDS + ("_kl_1m", "_kl_15m", "_derived")
+
+    def __init__(self, kl_1m=None, kl_15m=None, **fields):
+        unknown = set(fields) - _FIELD_SET
+        if unknown:
+            raise TypeError(f"unknown snapshot fields: {sorted(unknown)}")
+        setter = object.__setattr__
+        for name in FIELDS:
+            setter(self, name, fields.get(name))
+        setter(self, "_kl_1m", _own_klines(kl_1m))
+        setter(self, "_kl_15m", _own_klines(kl_15m))
+        setter(self, "_derived", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MarketSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("MarketSnapshot is immutable")
+
+    # ========== Mapping ==========
+    def __getitem__(self, key: str):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        derived = self._derived
+        if key in derived:
+            return derived[key]
+        value = self._derive(key)
+        derived[key] = value
+        return value
+
+    def get(self, key: str, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if key in _DERIVED_SET:
+            return self[key]
+        return default
+
+    def __contains__(self, key) -> bool:
+        return key in _FIELD_SET or key in _DERIVED_SET
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        yield from DERIVED
+
+    def __len__(self) -> int:
+        return len(FIELDS) + len(DERIVED)
+
+    def __repr__(self) -> str:
+        return f"MarketSnapshot(price={self.current_price})"
+
+    # ========== 派生 ==========
+    def with_scores(self, **fields) -> "ScoredSnapshot":
+        """附加评分等字段的只读视图（不复制快照字段）"""
+        return ScoredSnapshot(self, fields)
+
+    def _derive(self, key: str):
+        if key == "klines_1m":
+            return self._kl_1m
+        if key == "klines_15m":
+            return self._kl_15m
+        if key == "sr_gap_pct":
+            if self.best_support and self.best_resistance and self.current_price:
+                return (self.best_resistance["price"] - self.best_support["price"]) / self.current_price * 100
+            return None
+        if key == "sr_gap_valid":
+            gap = self["sr_gap_pct"]
+            return True if gap is None else gap >= MIN_SR_GAP_PCT
+        raise KeyError(key)
+
+
+class ScoredSnapshot(Mapping):
+    """快照 + 少量附加字段（entry_scores / entry_threshold / patterns 等），同样只读"""
+
+    __slots__ = ("_base", "_extra")
+
+    def __init__(self, base: MarketSnapshot, extra: Dict):
+        object.__setattr__(self, "_base", base)
+        object.__setattr__(self, "_extra", extra)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MarketSnapshot is immutable")
+
+    def __getattr__(self, name):
+        return getattr(self._base, name)
+
+    def __getitem__(self, key: str):
+        extra = self._extra
+        if key in extra:
+            return extra[key]
+        return self._base[key]
+
+    def get(self, key: str, default=None):
+        extra = self._extra
+        if key in extra:
+            return extra[key]
+        return self._base.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._extra or key in self._base
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._base
+        for key in self._extra:
+            if key not in self._base:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._base) + sum(1 for key in self._extra if key not in self._base)
+
+    def with_scores(self, **fields) -> "ScoredSnapshot":
+        extra = dict(self._extra)
+        extra.update(fields)
+        return ScoredSnapshot(self._base, extra)
+
+
+def with_fields(market: Mapping, **fields) -> Mapping:
+    """快照走 with_scores；普通字典（回测等调用方）退化为合并出新字典"""
+    if isinstance(market, (MarketSnapshot, ScoredSnapshot)):
+        return market.with_scores(**fields)
+    merged = dict(market)
+    merged.update(fields)
+    return merged
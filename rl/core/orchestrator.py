@@ -0,0 +1,397 @@
+"""
+多币种编排
+
+- MarketDataFeed：每轮只拉取一次行情（每个 symbol × 周期一次请求），再分发给各 worker；
+  各 symbol 在小线程池里并发拉取，一轮耗时取决于最慢的 symbol 而不是 symbol 数
+- AgentOrchestrator：按 CPU 数启动 worker 进程，每个进程托管若干 symbol 的 TradingAgent，
+  每个 symbol 使用独立的数据目录（交易记录、学习状态互不干扰），并汇总各 symbol 的状态
+- 各 worker 共用同一个 USDT 钱包：入场在跨进程锁内进行，锁内先强制对账再下单，
+  仓位计算看到的是其他 worker 已占用保证金之后的可用余额
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..monitoring.metrics import registry as metrics_registry
+
+DEFAULT_TIMEFRAMES: Tuple[Tuple[str, int], ...] = (
+    ("1m", 150),
+    ("15m", 150),
+    ("8h", 150),
+    ("1w", 50),
+)
+
+
+class MarketDataFeed:
+    """共享行情源：fetch_klines(symbol, interval, limit) 返回已转换的K线列表"""
+
+    def __init__(
+        self,
+        fetch_klines: Callable[[str, str, int], List[Dict]],
+        fetch_order_book: Optional[Callable[[str], Optional[Dict]]] = None,
+        timeframes: Sequence[Tuple[str, int]] = DEFAULT_TIMEFRAMES,
+        max_fetch_workers: int = 8,
+    ):
+        self.fetch_klines = fetch_klines
+        self.fetch_order_book = fetch_order_book
+        self.timeframes = tuple(timeframes)
+        self.max_fetch_workers = max(1, max_fetch_workers)
+        self.metrics = metrics_registry
+        self._latest: Dict[str, Dict] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def poll(self, symbols: Sequence[str]) -> Dict[str, Dict]:
+        """拉取一轮行情（各 symbol 并发），失败的 symbol 不出现在结果中"""
+        symbols = list(symbols)
+        if len(symbols) <= 1 or self.max_fetch_workers == 1:
+            results = [self._fetch_symbol(symbol) for symbol in symbols]
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_fetch_workers, thread_name_prefix="feed"
+                )
+            results = list(self._pool.map(self._fetch_symbol, symbols))
+        return {symbol: data for symbol, data in zip(symbols, results) if data is not None}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _fetch_symbol(self, symbol: str) -> Optional[Dict]:
+        """单个 symbol 的全部周期（同一 symbol 内仍按周期顺序请求）"""
+        try:
+            klines = {}
+            for interval, limit in self.timeframes:
+                with self.metrics.stage(f"feed_{interval}"):
+                    klines[interval] = self.fetch_klines(symbol, interval, limit)
+            order_book = None
+            if self.fetch_order_book is not None:
+                try:
+                    with self.metrics.stage("feed_orderbook"):
+                        order_book = self.fetch_order_book(symbol)
+                except Exception:
+                    order_book = None
+        except Exception as exc:
+            self.metrics.inc("agent_errors_total", stage="feed")
+            with self._lock:
+                self._errors[symbol] = str(exc)
+            return None
+        data = {"klines": klines, "order_book": order_book, "fetched_at": time.time()}
+        with self._lock:
+            self._latest[symbol] = data
+            self._errors.pop(symbol, None)
+        return data
+
+    def latest(self, symbol: str) -> Optional[Dict]:
+        with self._lock:
+            return self._latest.get(symbol)
+
+    def errors(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._errors)
+
+
+def run_symbol_tick(agent, data: Dict, entry_lock=None) -> Dict:
+    """
+    对单个 symbol 跑一轮：对账 -> 分析 -> 出场 -> 入场，返回可序列化的摘要
+    entry_lock：多个 agent 共用钱包时的跨进程锁，入场前在锁内强制对账
+    """
+    # 到期才请求交易所余额（节流），用于资金费、保护单成交等的常规同步
+    with agent.metrics.stage("account_reconcile"):
+        agent.account.maybe_reconcile()
+    klines = data["klines"]
+    market = agent.analyze_market(
+        klines.get("1m", []),
+        klines.get("15m", []),
+        klines.get("8h", []),
+        klines.get("1w", []),
+        data.get("order_book"),
+    )
+    if not market:
+        return {"error": "analyze_failed"}
+
+    price = market.get("current_price", 0)
+    scores = agent.get_current_scores(market)
+    report = {
+        "price": price,
+        "scores": {
+            "long": scores.get("long", 0),
+            "short": scores.get("short", 0),
+            "min_score": scores.get("min_score", 0),
+        },
+        "best_support": (market.get("best_support") or {}).get("price"),
+        "best_resistance": (market.get("best_resistance") or {}).get("price"),
+        "exits": [],
+        "entry": None,
+    }
+
+    for pos, decision in agent.check_exit_all(price, market):
+        trade = agent.execute_exit_position(pos, price, decision.reason, decision.confirmations)
+        if trade:
+            report["exits"].append({
+                "trade_id": trade["trade_id"],
+                "pnl": trade["pnl"],
+                "pnl_percent": trade["pnl_percent"],
+                "exit_reason": trade["exit_reason"],
+            })
+
+    signal = agent.should_enter(market)
+    if signal:
+        if entry_lock is not None:
+            with entry_lock:
+                # 其他 worker 可能刚占用了同一钱包的保证金，本地模型要以交易所可用余额为准
+                with agent.metrics.stage("account_reconcile"):
+                    agent.account.reconcile()
+                pos = agent.execute_entry(market, signal)
+        else:
+            pos = agent.execute_entry(market, signal)
+        if pos and "error" not in pos:
+            report["entry"] = {
+                "trade_id": pos["trade_id"],
+                "direction": pos["direction"],
+                "entry_price": pos["entry_price"],
+                "quantity": pos["quantity"],
+            }
+        elif pos:
+            report["entry"] = {"error": pos["error"]}
+
+    report["positions"] = len(agent.positions)
+    return report
+
+
+def _worker_main(
+    worker_id: int,
+    symbols: List[str],
+    data_dir: str,
+    leverage: int,
+    client_factory: Callable,
+    client_args: tuple,
+    inbox,
+    outbox,
+    entry_lock=None,
+) -> None:
+    """worker 进程入口：为分配到的 symbol 各建一个 TradingAgent"""
+    from .agent import TradingAgent
+
+    try:
+        client = client_factory(*client_args)
+        agents = {}
+        for symbol in symbols:
+            symbol_dir = os.path.join(data_dir, symbol)
+            os.makedirs(symbol_dir, exist_ok=True)
+            agents[symbol] = TradingAgent(client, data_dir=symbol_dir, leverage=leverage, symbol=symbol)
+            outbox.put(("ready", worker_id, symbol, {"positions": len(agents[symbol].positions)}))
+    except Exception as exc:
+        for symbol in symbols:
+            outbox.put(("error", worker_id, symbol, {"error": f"init: {exc}"}))
+        return
+
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        for symbol, data in message.items():
+            agent = agents.get(symbol)
+            if agent is None:
+                continue
+            try:
+                report = run_symbol_tick(agent, data, entry_lock)
+            except Exception as exc:
+                report = {"error": str(exc)}
+            outbox.put(("tick", worker_id, symbol, report))
+    outbox.put(("stopped", worker_id, None, {}))
+
+
+class AgentOrchestrator:
+    """
+    多币种 agent 编排器
+
+    client_factory 必须可被 pickle（模块级函数），在 worker 进程内调用以创建 API 客户端。
+    on_event(symbol, kind, payload) 在主进程的结果线程中回调，用于写日志。
+    """
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        feed: MarketDataFeed,
+        client_factory: Callable,
+        client_args: tuple = (),
+        data_dir: str = "rl_data",
+        leverage: int = 10,
+        interval: float = 10.0,
+        max_workers: Optional[int] = None,
+        on_event: Optional[Callable[[str, str, Dict], None]] = None,
+    ):
+        self.symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        if not self.symbols:
+            raise ValueError("no symbols configured")
+        self.feed = feed
+        self.client_factory = client_factory
+        self.client_args = tuple(client_args)
+        self.data_dir = data_dir
+        self.leverage = leverage
+        self.interval = interval
+        self.max_workers = max(1, min(len(self.symbols), max_workers or os.cpu_count() or 1))
+        self.on_event = on_event
+        self.running = False
+        self.started_at: Optional[str] = None
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[Dict] = []
+        self._outbox = None
+        self._threads: List[threading.Thread] = []
+        self._status: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.ticks = 0
+        self.dropped = 0
+
+    # ========== 生命周期 ==========
+    def start(self) -> None:
+        if self.running:
+            raise RuntimeError("orchestrator already running")
+        self._stop_event.clear()
+        self._outbox = self._ctx.Queue()
+        entry_lock = self._ctx.Lock()
+        assignments = [self.symbols[i::self.max_workers] for i in range(self.max_workers)]
+        self._workers = []
+        for worker_id, symbols in enumerate(assignments):
+            # 只保留最新一帧行情，worker 处理慢时丢弃旧帧而不是排队
+            inbox = self._ctx.Queue(maxsize=1)
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(
+                    worker_id,
+                    symbols,
+                    self.data_dir,
+                    self.leverage,
+                    self.client_factory,
+                    self.client_args,
+                    inbox,
+                    self._outbox,
+                    entry_lock,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._workers.append({"id": worker_id, "symbols": symbols, "inbox": inbox, "process": process})
+            for symbol in symbols:
+                self._status[symbol] = {"worker": worker_id, "state": "starting", "updated_at": None}
+        self.running = True
+        self.started_at = datetime.now().isoformat()
+        self._threads = [
+            threading.Thread(target=self._feed_loop, daemon=True),
+            threading.Thread(target=self._result_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        for worker in self._workers:
+            try:
+                worker["inbox"].put(None, timeout=timeout)
+            except Exception:
+                pass
+        deadline = time.time() + timeout
+        for worker in self._workers:
+            process = worker["process"]
+            process.join(timeout=max(0.1, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self.feed.close()
+        with self._lock:
+            for info in self._status.values():
+                info["state"] = "stopped"
+
+    # ========== 状态 ==========
+    def status(self) -> Dict:
+        with self._lock:
+            symbols = {s: dict(info) for s, info in self._status.items()}
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "workers": [
+                {
+                    "id": w["id"],
+                    "symbols": w["symbols"],
+                    "alive": w["process"].is_alive(),
+                    "pid": w["process"].pid,
+                }
+                for w in self._workers
+            ],
+            "symbols": symbols,
+            "ticks": self.ticks,
+            "dropped_frames": self.dropped,
+            "feed_errors": self.feed.errors(),
+        }
+
+    # ========== 内部 ==========
+    def _feed_loop(self) -> None:
+        while not self._stop_event.is_set():
+            started = time.time()
+            snapshot = self.feed.poll(self.symbols)
+            for worker in self._workers:
+                frame = {s: snapshot[s] for s in worker["symbols"] if s in snapshot}
+                if not frame:
+                    continue
+                inbox = worker["inbox"]
+                try:
+                    inbox.put_nowait(frame)
+                except queue.Full:
+                    try:
+                        inbox.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self.dropped += 1
+                    try:
+                        inbox.put_nowait(frame)
+                    except queue.Full:
+                        pass
+            self.ticks += 1
+            self._stop_event.wait(max(0.0, self.interval - (time.time() - started)))
+
+    def _result_loop(self) -> None:
+        pending = len(self._workers)
+        while pending > 0:
+            try:
+                kind, worker_id, symbol, payload = self._outbox.get(timeout=1.0)
+            except queue.Empty:
+                if not self.running:
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if kind == "stopped":
+                pending -= 1
+                continue
+            with self._lock:
+                info = self._status.setdefault(symbol, {"worker": worker_id})
+                info["updated_at"] = datetime.now().isoformat()
+                if kind == "tick" and "error" not in payload:
+                    info["state"] = "running"
+                    info["last"] = payload
+                    info.pop("error", None)
+                elif kind == "ready":
+                    info["state"] = "ready"
+                    info["positions"] = payload.get("positions", 0)
+                else:
+                    info["state"] = "error" if kind == "error" else info.get("state", "running")
+                    info["error"] = payload.get("error")
+            if self.on_event:
+                try:
+                    self.on_event(symbol, kind, payload)
+                except Exception:
+                    pass
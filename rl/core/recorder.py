@@ -0,0 +1,315 @@
+"""
+tick 输入录制
+
+线上出现异常决策时无法复现：agent 的输入（各周期K线、盘口、账户查询结果、墙钟时间）都没有留下。
+TickRecorder 在每个完整分析的 tick 结束时把这些原始输入追加到会话目录：
+
+    <root>/<session>/meta.json
+    <root>/<session>/chunk_00000.jsonl.gz
+    ...
+
+- 每行一个 tick；K线存为 [time, open, high, low, close, volume] 数组，
+  相对上一 tick 做增量（窗口前移 d 根、保留 m 根、追加 a），账户快照只在变化时写入
+- 每个分块第一行是关键帧（完整数据），分块可独立解码；每 chunk_ticks 个 tick 换新分块
+- 单个会话最多保留 max_chunks 个分块，超出时删除最早的分块（滚动保留最近的 tick）；
+  会话数由 max_sessions 限制
+- 每个 tick 写完即 flush，进程崩溃时最多丢失最后一行，读取时忽略截断的尾部
+
+账户快照来自 RecordingClient：包装真实客户端，记录本 tick 内账户类查询的最近一次返回。
+回放见 replay.py。
+"""
+import gzip
+import json
+import os
+import shutil
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from ..market_analysis.candle_store import FIELDS
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+CHUNK_PATTERN = "chunk_{:05d}.jsonl.gz"
+
+# 账户类查询：录制返回值，回放时原样返回
+RECORDED_METHODS = (
+    "get_balance",
+    "get_account",
+    "get_positions",
+    "get_symbol_filters",
+    "get_open_orders",
+)
+ERROR_KEY = "__error__"
+
+
+def _encode_klines(prev: Optional[List[List]], cur: List[List]) -> Dict:
+    """cur = prev[d:d + m] + a"""
+    if prev and cur:
+        first = cur[0][0]
+        drop = next((i for i, row in enumerate(prev) if row[0] == first), None)
+        if drop is not None:
+            overlap = prev[drop:]
+            keep = 0
+            limit = min(len(overlap), len(cur))
+            while keep < limit and overlap[keep] == cur[keep]:
+                keep += 1
+            return {"d": drop, "m": keep, "a": cur[keep:]}
+    return {"d": 0, "m": 0, "a": cur}
+
+
+def _decode_klines(prev: Optional[List[List]], delta: Dict) -> List[List]:
+    drop, keep = delta.get("d", 0), delta.get("m", 0)
+    base = (prev or [])[drop:drop + keep]
+    return base + delta.get("a", [])
+
+
+def _rows(klines: List[Dict]) -> List[List]:
+    return [[k.get(name, 0) for name in FIELDS] for k in klines or []]
+
+
+def _candles(rows: List[List]) -> List[Dict]:
+    return [dict(zip(FIELDS, row)) for row in rows]
+
+
+class RecordingClient:
+    """透传真实客户端，同时记录账户类查询的最近一次返回（含异常）"""
+
+    def __init__(self, client):
+        self._client = client
+        self.responses: Dict[str, object] = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in RECORDED_METHODS or not callable(attr):
+            return attr
+
+        def _recorded(*args, **kwargs):
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as exc:
+                self.responses[name] = {ERROR_KEY: str(exc)}
+                raise
+            self.responses[name] = result
+            return result
+
+        return _recorded
+
+    def snapshot(self) -> Dict:
+        return dict(self.responses)
+
+
+class TickRecorder:
+    def __init__(
+        self,
+        root: str,
+        symbol: str,
+        chunk_ticks: int = 500,
+        max_sessions: int = 20,
+        compresslevel: int = 6,
+        session: Optional[str] = None,
+        max_chunks: int = 100,
+    ):
+        self.root = root
+        self.symbol = symbol
+        self.chunk_ticks = max(1, chunk_ticks)
+        self.max_chunks = max_chunks
+        self.dropped_chunks = 0
+        self.compresslevel = compresslevel
+        self.session = session or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{symbol}"
+        self.session_dir = os.path.join(root, self.session)
+        os.makedirs(self.session_dir, exist_ok=True)
+        self.proxy: Optional[RecordingClient] = None
+        self.ticks = 0
+        self.bytes_written = 0
+        self._chunk_index = 0
+        self._chunk_ticks = 0
+        self._file = None
+        self._prev_klines: Dict[str, List[List]] = {}
+        self._prev_account: Optional[Dict] = None
+        self._write_meta()
+        self._prune(max_sessions)
+
+    def wrap_client(self, client) -> RecordingClient:
+        """返回包装后的客户端，交给 agent 使用；之后 record() 默认取它的账户快照"""
+        self.proxy = RecordingClient(client)
+        return self.proxy
+
+    def record(
+        self,
+        klines: Dict[str, List[Dict]],
+        order_book: Optional[Dict] = None,
+        account: Optional[Dict] = None,
+        t: Optional[float] = None,
+    ) -> None:
+        """追加一个 tick：klines 为 {tf: List[Dict]}（与传给 analyze_market 的相同）"""
+        if self._file is None or self._chunk_ticks >= self.chunk_ticks:
+            self._open_chunk()
+        if account is None and self.proxy is not None:
+            account = self.proxy.snapshot()
+        keyframe = self._chunk_ticks == 0
+        line: Dict = {"t": time.time() if t is None else t, "k": {}}
+        for tf, candles in klines.items():
+            rows = _rows(candles)
+            line["k"][tf] = _encode_klines(None if keyframe else self._prev_klines.get(tf), rows)
+            self._prev_klines[tf] = rows
+        if order_book is not None:
+            line["ob"] = {
+                "bids": [list(level) for level in order_book.get("bids", [])],
+                "asks": [list(level) for level in order_book.get("asks", [])],
+            }
+        if account is not None and (keyframe or account != self._prev_account):
+            line["acct"] = account
+            self._prev_account = account
+        data = (json.dumps(line, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        self._chunk_ticks += 1
+        self.ticks += 1
+        self.bytes_written += len(data)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._write_meta()
+
+    def status(self) -> Dict:
+        return {
+            "session": self.session,
+            "path": self.session_dir,
+            "ticks": self.ticks,
+            "chunks": self._chunk_index - self.dropped_chunks,
+            "dropped_chunks": self.dropped_chunks,
+            "raw_bytes": self.bytes_written,
+        }
+
+    # ========== 内部 ==========
+    def _open_chunk(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.session_dir, CHUNK_PATTERN.format(self._chunk_index))
+        self._file = gzip.open(path, "ab", compresslevel=self.compresslevel)
+        self._chunk_index += 1
+        self._chunk_ticks = 0
+        self._drop_old_chunks()
+        self._write_meta()
+
+    def _drop_old_chunks(self) -> None:
+        """只保留最近 max_chunks 个分块（每个分块以关键帧开头，删掉前面的不影响解码）"""
+        if not self.max_chunks:
+            return
+        while self._chunk_index - self.dropped_chunks > self.max_chunks:
+            path = os.path.join(self.session_dir, CHUNK_PATTERN.format(self.dropped_chunks))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.dropped_chunks += 1
+
+    def _write_meta(self) -> None:
+        meta = {
+            "version": FORMAT_VERSION,
+            "symbol": self.symbol,
+            "session": self.session,
+            "chunk_ticks": self.chunk_ticks,
+            # 会话内现存的 tick 数（已删除的分块不计）
+            "ticks": self.ticks - self.dropped_chunks * self.chunk_ticks,
+            "dropped_chunks": self.dropped_chunks,
+            "updated_at": datetime.now().isoformat(),
+        }
+        tmp = os.path.join(self.session_dir, META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.session_dir, META_FILE))
+
+    def _prune(self, max_sessions: int) -> None:
+        if not max_sessions:
+            return
+        sessions = [s["session"] for s in list_sessions(self.root)]
+        for name in sessions[max_sessions:]:
+            if name != self.session:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+class TickRecording:
+    """读取一个录制会话，迭代解码后的 tick"""
+
+    def __init__(self, session_dir: str):
+        self.session_dir = session_dir
+        self.meta: Dict = {}
+        meta_path = os.path.join(session_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+
+    @property
+    def symbol(self) -> Optional[str]:
+        return self.meta.get("symbol")
+
+    def chunks(self) -> List[str]:
+        names = sorted(n for n in os.listdir(self.session_dir) if n.startswith("chunk_"))
+        return [os.path.join(self.session_dir, n) for n in names]
+
+    def __iter__(self) -> Iterator[Dict]:
+        """
+        产出 {"t", "klines": {tf: List[Dict]}, "order_book", "account"}
+        账户快照向后沿用，直到下一次变化
+        """
+        account: Dict = {}
+        for path in self.chunks():
+            prev: Dict[str, List[List]] = {}
+            for line in self._lines(path):
+                klines = {}
+                for tf, delta in line.get("k", {}).items():
+                    rows = _decode_klines(prev.get(tf), delta)
+                    prev[tf] = rows
+                    klines[tf] = _candles(rows)
+                if "acct" in line:
+                    account = line["acct"]
+                ob = line.get("ob")
+                yield {
+                    "t": line.get("t"),
+                    "klines": klines,
+                    "order_book": (
+                        {"bids": [tuple(x) for x in ob["bids"]], "asks": [tuple(x) for x in ob["asks"]]}
+                        if ob is not None else None
+                    ),
+                    "account": account,
+                }
+
+    @staticmethod
+    def _lines(path: str) -> Iterator[Dict]:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for raw in f:
+                    if not raw.endswith("\n"):
+                        return  # 写入中断的半行
+                    yield json.loads(raw)
+        except (EOFError, OSError, zlib.error, ValueError):
+            return  # 截断的分块：保留已读出的部分
+
+
+def list_sessions(root: str) -> List[Dict]:
+    """按时间倒序列出录制会话"""
+    if not os.path.isdir(root):
+        return []
+    sessions = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if not os.path.isdir(path):
+            continue
+        recording = TickRecording(path)
+        chunks = recording.chunks()
+        sessions.append({
+            "session": name,
+            "symbol": recording.symbol,
+            "ticks": recording.meta.get("ticks"),
+            "chunks": len(chunks),
+            "bytes": sum(os.path.getsize(c) for c in chunks),
+            "updated_at": recording.meta.get("updated_at"),
+            "mtime": os.path.getmtime(path),
+        })
+    sessions.sort(key=lambda s: s["mtime"], reverse=True)
+    return sessions
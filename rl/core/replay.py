@@ -0,0 +1,236 @@
+"""
+录制会话的确定性回放
+
+把 recorder.py 录下的 tick 依次喂给一个新的 TradingAgent：
+analyze_market -> check_exit_all / execute_exit_position -> should_enter / execute_entry，
+不 sleep、不访问网络，用于性能剖析和版本间的决策回归对比。
+
+- 墙钟：agent 的 clock 替换为当前 tick 的录制时间，冷却和持仓时长与线上一致
+- 客户端：ReplayClient 的账户类查询返回录制值；下单按限价立即成交
+- 状态：agent 使用独立的 data_dir（默认临时目录），可用 seed_dir 复制线上学习状态作为起点
+"""
+import copy
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from .agent import TradingAgent
+from .recorder import ERROR_KEY, TickRecording
+
+
+class ReplayClient:
+    """回放用客户端：账户查询返回当前 tick 的录制值，订单立即成交"""
+
+    def __init__(self):
+        self.account: Dict = {}
+        self.price = 0.0
+        self.orders: Dict[int, Dict] = {}
+        self._next_id = 0
+
+    def load(self, account: Optional[Dict], price: float) -> None:
+        self.account = account or {}
+        self.price = price
+
+    def _recorded(self, method: str, default):
+        value = self.account.get(method, default)
+        if isinstance(value, dict) and ERROR_KEY in value:
+            raise RuntimeError(value[ERROR_KEY])
+        return copy.deepcopy(value)
+
+    # ========== 账户 ==========
+    def get_balance(self):
+        return self._recorded("get_balance", [])
+
+    def get_account(self):
+        return self._recorded("get_account", {})
+
+    def get_positions(self):
+        return self._recorded("get_positions", [])
+
+    def get_symbol_filters(self, symbol: str = None):
+        return self._recorded("get_symbol_filters", {})
+
+    def get_open_orders(self, symbol: str = None):
+        return [o for o in self.orders.values() if o["status"] == "NEW"]
+
+    def get_ticker_price(self, symbol: str = None):
+        return {"symbol": symbol, "price": str(self.price)}
+
+    def set_leverage(self, symbol: str, leverage: int):
+        return {"symbol": symbol, "leverage": leverage}
+
+    # ========== 订单 ==========
+    def place_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None, **kwargs):
+        self._next_id += 1
+        conditional = kwargs.get("stop_price") is not None
+        order = {
+            "orderId": self._next_id,
+            "symbol": symbol,
+            "side": side,
+            "type": order_type,
+            # 条件单挂着不触发；限价/市价单按报价立即成交
+            "status": "NEW" if conditional else "FILLED",
+            "origQty": str(quantity),
+            "executedQty": "0" if conditional else str(quantity),
+            "avgPrice": str(price or self.price),
+        }
+        self.orders[order["orderId"]] = order
+        return dict(order)
+
+    def place_batch_orders(self, orders: List[Dict]):
+        return [self.place_order(**params) for params in orders]
+
+    def get_order(self, symbol: str, order_id: int = None, client_order_id: str = None):
+        return dict(self.orders.get(order_id) or {"orderId": order_id, "status": "EXPIRED"})
+
+    def cancel_order(self, symbol: str, order_id: int = None, client_order_id: str = None):
+        order = self.orders.get(order_id)
+        if order is not None and order["status"] == "NEW":
+            order["status"] = "CANCELED"
+        return dict(order or {})
+
+    def cancel_batch_orders(self, symbol: str, order_ids: List[int]):
+        return [self.cancel_order(symbol, order_id=oid) for oid in order_ids]
+
+
+class TickReplayer:
+    """
+    replayer = TickReplayer("rl_data/recordings/<session>")
+    result = replayer.run()            # {"ticks", "entries", "exits", "decisions", "timing"}
+    diff_decisions(result_a["decisions"], result_b["decisions"])
+    """
+
+    def __init__(
+        self,
+        session_dir: str,
+        data_dir: Optional[str] = None,
+        seed_dir: Optional[str] = None,
+        leverage: int = 10,
+        symbol: Optional[str] = None,
+        agent_factory: Optional[Callable[..., TradingAgent]] = None,
+    ):
+        self.recording = TickRecording(session_dir)
+        self.symbol = symbol or self.recording.symbol or "BTCUSDT"
+        self._owns_dir = data_dir is None
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix="replay_")
+        if seed_dir:
+            shutil.copytree(
+                seed_dir,
+                self.data_dir,
+                ignore=shutil.ignore_patterns("recordings", "*.log"),
+                dirs_exist_ok=True,
+            )
+        self.client = ReplayClient()
+        self.now = 0.0
+        factory = agent_factory or TradingAgent
+        self.agent = factory(
+            self.client,
+            data_dir=self.data_dir,
+            leverage=leverage,
+            symbol=self.symbol,
+            clock=lambda: self.now,
+        )
+        # 同步下单且立即成交，不需要等待重新报价
+        self.agent.order_executor.sleep = lambda _seconds: None
+
+    def run(self, max_ticks: Optional[int] = None, on_tick: Optional[Callable[[Dict], None]] = None) -> Dict:
+        decisions: List[Dict] = []
+        entries = exits = 0
+        timing = {"analyze_market": 0.0, "check_exit_all": 0.0, "should_enter": 0.0}
+        started = time.perf_counter()
+        for tick in self.recording:
+            if max_ticks is not None and len(decisions) >= max_ticks:
+                break
+            decision = self.step(tick, timing)
+            entries += 1 if decision.get("entry") else 0
+            exits += len(decision.get("exits", []))
+            decisions.append(decision)
+            if on_tick is not None:
+                on_tick(decision)
+        elapsed = time.perf_counter() - started
+        return {
+            "session": os.path.basename(self.recording.session_dir),
+            "ticks": len(decisions),
+            "entries": entries,
+            "exits": exits,
+            "elapsed": round(elapsed, 4),
+            "ticks_per_second": round(len(decisions) / elapsed, 2) if elapsed > 0 else None,
+            "timing": {k: round(v, 4) for k, v in timing.items()},
+            "decisions": decisions,
+        }
+
+    def step(self, tick: Dict, timing: Optional[Dict[str, float]] = None) -> Dict:
+        """回放一个 tick，返回该 tick 的决策摘要"""
+        timing = timing if timing is not None else {}
+        klines = tick["klines"]
+        kl_1m = klines.get("1m") or []
+        self.now = float(tick.get("t") or 0)
+        self.client.load(tick.get("account"), kl_1m[-1]["close"] if kl_1m else 0.0)
+        agent = self.agent
+
+        t0 = time.perf_counter()
+        market = agent.analyze_market(
+            kl_1m,
+            klines.get("15m") or [],
+            klines.get("8h") or [],
+            klines.get("1w") or [],
+            tick.get("order_book"),
+        )
+        t1 = time.perf_counter()
+        timing["analyze_market"] = timing.get("analyze_market", 0.0) + t1 - t0
+        decision: Dict = {"t": tick.get("t"), "price": None, "exits": [], "entry": None}
+        if not market:
+            decision["error"] = "analyze_market"
+            return decision
+        price = market.get("current_price", 0)
+        decision["price"] = price
+        decision["best_support"] = (market.get("best_support") or {}).get("price")
+        decision["best_resistance"] = (market.get("best_resistance") or {}).get("price")
+        scores = agent.get_current_scores(market)
+        decision["scores"] = {
+            "long": round(float(scores.get("long", 0) or 0), 4),
+            "short": round(float(scores.get("short", 0) or 0), 4),
+            "min_score": round(float(scores.get("min_score", 0) or 0), 4),
+        }
+
+        for pos, exit_decision in agent.check_exit_all(price, market):
+            trade = agent.execute_exit_position(pos, price, exit_decision.reason, exit_decision.confirmations)
+            decision["exits"].append({
+                "direction": pos.get("direction"),
+                "reason": exit_decision.reason,
+                "pnl": round(trade["pnl"], 6) if trade else None,
+            })
+        t2 = time.perf_counter()
+        timing["check_exit_all"] = timing.get("check_exit_all", 0.0) + t2 - t1
+
+        signal = agent.should_enter(market)
+        if signal:
+            pos = agent.execute_entry(market, signal)
+            decision["entry"] = {
+                "direction": signal.get("direction"),
+                "strength": round(float(signal.get("strength", 0) or 0), 4),
+                "error": pos.get("error") if pos else "no_position",
+            }
+        timing["should_enter"] = timing.get("should_enter", 0.0) + time.perf_counter() - t2
+        decision["positions"] = len(agent.positions)
+        return decision
+
+    def close(self) -> None:
+        self.agent.journal.close_db()
+        if self._owns_dir:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+def diff_decisions(base: List[Dict], other: List[Dict], limit: int = 50) -> List[Dict]:
+    """逐 tick 对比两次回放的决策，返回不一致的 tick（最多 limit 条）"""
+    diffs = []
+    for idx in range(max(len(base), len(other))):
+        a = base[idx] if idx < len(base) else None
+        b = other[idx] if idx < len(other) else None
+        if a != b:
+            diffs.append({"index": idx, "t": (a or b or {}).get("t"), "base": a, "other": b})
+            if len(diffs) >= limit:
+                break
+    return diffs
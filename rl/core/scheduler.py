@@ -0,0 +1,145 @@
+"""
+K线收盘对齐的事件驱动调度
+
+agent 循环不再固定 sleep 10 秒，而是在以下事件时唤醒：
+- candle_close：1m K线收盘（加一个很小的延迟，等交易所把收盘K线落盘）
+- price_move：轮询价格相对上一轮分析的变动超过阈值
+- heartbeat：有持仓时两次收盘之间的兜底唤醒（持仓的时间类出场条件仍需检查），空仓时不启用
+- interrupt：外部事件（如订单成交）需要 agent 线程尽快处理
+
+每次唤醒记录相对目标时刻的抖动；输入指纹只取已收盘K线，未变化时跳过完整分析。
+盘中价格变化由 price_move 覆盖，调用方对 price_move / 持仓心跳用 force= 强制分析。
+"""
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..monitoring.metrics import registry as metrics_registry
+
+JITTER_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class CandleScheduler:
+    def __init__(
+        self,
+        interval_seconds: int = 60,
+        close_delay: float = 1.0,
+        max_wait: float = 30.0,
+        price_move_pct: float = 0.001,
+        price_probe: Optional[Callable[[], float]] = None,
+        poll_interval: float = 2.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.interval_seconds = interval_seconds
+        self.close_delay = close_delay
+        self.max_wait = max_wait
+        self.price_move_pct = price_move_pct
+        self.price_probe = price_probe
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.last_price: Optional[float] = None
+        self.last_fingerprint: Optional[Tuple] = None
+        self.last_event: Optional[Dict] = None
+        self._started = False
+        self.metrics = metrics_registry
+        self.metrics.histogram(
+            "agent_scheduler_jitter_seconds",
+            "Delay between the scheduled wake-up time and the actual one",
+            ("reason",),
+            JITTER_BUCKETS,
+        )
+        self.metrics.counter("agent_scheduler_wakeups_total", "Scheduler wake-ups", ("reason",))
+        self.metrics.counter("agent_ticks_skipped_total", "Ticks skipped because inputs were unchanged")
+
+    def next_close(self, now: float) -> float:
+        """下一根K线收盘时刻（含收盘延迟）"""
+        period = self.interval_seconds
+        return (int(now // period) + 1) * period + self.close_delay
+
+    def wait_next(
+        self,
+        should_stop: Optional[Callable[[], bool]] = None,
+        interrupt: Optional[Callable[[], bool]] = None,
+        heartbeat: bool = False,
+    ) -> Dict:
+        """阻塞直到下一个事件，返回 {"reason", "scheduled", "woke", "jitter"}
+
+        heartbeat=True 时（通常是有持仓）最多等待 max_wait 秒，否则只在收盘/价格变动/中断时唤醒
+        """
+        now = self.clock()
+        if not self._started:
+            self._started = True
+            return self._event("startup", now, now)
+
+        boundary = self.next_close(now)
+        # 收盘延迟可能让上一根的唤醒点还没到，此时 boundary 仍在当前周期内
+        if boundary - self.interval_seconds > now:
+            boundary -= self.interval_seconds
+        target = min(boundary, now + self.max_wait) if heartbeat and self.max_wait else boundary
+        reason = "candle_close" if target == boundary else "heartbeat"
+
+        while True:
+            if should_stop and should_stop():
+                return self._event("stopped", target, self.clock())
+            now = self.clock()
+            if now >= target:
+                break
+            if interrupt and interrupt():
+                return self._event("interrupt", now, self.clock())
+            if self._price_moved():
+                return self._event("price_move", now, self.clock())
+            self.sleep(min(self.poll_interval, max(0.0, target - now)))
+        return self._event(reason, target, self.clock())
+
+    @staticmethod
+    def fingerprint(klines_1m: List[Dict]) -> Tuple:
+        """输入指纹：最新一根已收盘K线的 OHLCV（最后一根未收盘K线不参与，盘中跳动不算变化）"""
+        tail = klines_1m[-2:-1] if klines_1m else []
+        return tuple(
+            (c.get("time"), c.get("open"), c.get("high"), c.get("low"), c.get("close"), c.get("volume"))
+            for c in tail
+        )
+
+    def has_changed(self, fingerprint: Tuple, force: bool = False) -> bool:
+        if force or fingerprint != self.last_fingerprint:
+            return True
+        self.metrics.inc("agent_ticks_skipped_total")
+        return False
+
+    def mark_processed(self, fingerprint: Tuple, price: Optional[float] = None) -> None:
+        """完整分析完成后调用，更新指纹和价格基准"""
+        self.last_fingerprint = fingerprint
+        if price:
+            self.last_price = float(price)
+
+    def status(self) -> Dict:
+        jitter = self.metrics.get("agent_scheduler_jitter_seconds")
+        return {
+            "last_event": self.last_event,
+            "last_price": self.last_price,
+            "jitter": {
+                reason: jitter.summary(reason=reason)
+                for reason in ("candle_close", "heartbeat", "price_move")
+            } if jitter else {},
+        }
+
+    def _price_moved(self) -> bool:
+        if self.price_probe is None or self.price_move_pct <= 0 or not self.last_price:
+            return False
+        try:
+            price = float(self.price_probe())
+        except Exception:
+            return False
+        if price <= 0:
+            return False
+        return abs(price - self.last_price) / self.last_price >= self.price_move_pct
+
+    def _event(self, reason: str, scheduled: float, woke: float) -> Dict:
+        jitter = max(0.0, woke - scheduled)
+        self.metrics.inc("agent_scheduler_wakeups_total", reason=reason)
+        if reason in ("candle_close", "heartbeat"):
+            self.metrics.observe("agent_scheduler_jitter_seconds", jitter, reason=reason)
+        event = {"reason": reason, "scheduled": scheduled, "woke": woke, "jitter": jitter}
+        self.last_event = event
+        return event
@@ -0,0 +1,262 @@
+"""
+影子多变体评估
+
+在实盘数据上比较候选阈值、StrategyParamLearner 参数、ExitManager 参数，而不动用资金。
+每个 tick 只做一次拉取和 analyze_market，同一个 market 分发给 N 个纸面变体：
+
+- 共享：market、入场评分（agent 按 market 缓存的决策上下文）、SL/TP 计算（按方向每 tick 一次）
+- 变体独立：入场阈值、策略参数（entry_threshold_bias / 利润锁定参数）、出场参数、
+  冷却、纸面持仓和出场状态、P&L 统计
+
+变体每 tick 的工作只是阈值比较和持仓的出场规则，额外成本远小于一次完整 tick。
+StopLossTakeProfit 目前不接受动态参数，default_sl_pct 等覆盖项只记录不生效。
+
+变体配置示例（rl_data/shadow_variants.json）：
+    [{"name": "th60", "threshold": 60},
+     {"name": "tight_lock", "strategy": {"profit_lock_base_drop": 0.3}, "exit": {"max_hold_minutes": 30}}]
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..execution.exit_manager import ExitManager
+from ..monitoring.metrics import registry as metrics_registry
+from .market_snapshot import with_fields
+
+COMMISSION_RATE = 0.0002  # 与 agent 平仓记账一致：每边 0.02%
+
+
+class ShadowVariant:
+    def __init__(
+        self,
+        name: str,
+        threshold: Optional[float] = None,
+        strategy: Optional[Dict] = None,
+        exit: Optional[Dict] = None,
+        notional: float = 1000.0,
+        cooldown: Optional[float] = None,
+        max_positions: int = 3,
+    ):
+        self.name = name
+        self.threshold = threshold
+        self.strategy = dict(strategy or {})
+        self.exit_overrides = dict(exit or {})
+        self.notional = notional
+        self.cooldown = cooldown
+        self.max_positions = max_positions
+        self.entry_bias = float(self.strategy.get("entry_threshold_bias", 0.0))
+        self.exit_manager = ExitManager()
+        self.positions: List[Dict] = []
+        self.states: Dict[str, Dict] = {}
+        self.trades = deque(maxlen=200)
+        self.stats = {"trades": 0, "wins": 0, "losses": 0, "pnl": 0.0, "fees": 0.0, "signals": 0}
+        self.last_entry_time = 0.0
+        self._seq = 0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "ShadowVariant":
+        return cls(
+            name=str(config["name"]),
+            threshold=config.get("threshold"),
+            strategy=config.get("strategy"),
+            exit=config.get("exit"),
+            notional=float(config.get("notional", 1000.0)),
+            cooldown=config.get("cooldown"),
+            max_positions=int(config.get("max_positions", 3)),
+        )
+
+    def config(self) -> Dict:
+        return {
+            "name": self.name,
+            "threshold": self.threshold,
+            "strategy": self.strategy,
+            "exit": self.exit_overrides,
+            "notional": self.notional,
+            "cooldown": self.cooldown,
+            "max_positions": self.max_positions,
+        }
+
+    def bind(self, agent) -> None:
+        """以 agent 当前参数为基础叠加本变体的覆盖项"""
+        self.exit_manager.clock = agent.clock
+        self.exit_manager.update_params(dict(agent.exit_manager.params))
+        strategy = dict(agent.strategy.params)
+        strategy.update(self.strategy)
+        for key in ("profit_lock_start", "profit_lock_base_drop", "profit_lock_slope"):
+            self.exit_manager.params[key] = float(strategy.get(key, self.exit_manager.params[key]))
+        self.exit_manager.update_params(self.exit_overrides)
+
+    def summary(self) -> Dict:
+        trades = self.stats["trades"]
+        return {
+            "name": self.name,
+            "open_positions": len(self.positions),
+            "trades": trades,
+            "win_rate": round(self.stats["wins"] / trades * 100, 2) if trades else 0.0,
+            "pnl": round(self.stats["pnl"], 4),
+            "fees": round(self.stats["fees"], 4),
+            "signals": self.stats["signals"],
+            "config": self.config(),
+        }
+
+
+class ShadowEvaluator:
+    """
+    shadow = ShadowEvaluator(agent, [{"name": "th60", "threshold": 60}])
+    shadow.on_market(market)   # 每个完整分析的 tick 调用一次
+    """
+
+    def __init__(self, agent, variants: Optional[List] = None, metrics=None):
+        self.agent = agent
+        self.metrics = metrics or metrics_registry
+        self.metrics.counter("agent_shadow_trades_total", "Paper trades closed by shadow variants", ("variant",))
+        self.variants: List[ShadowVariant] = []
+        self.ticks = 0
+        self.last_cost = 0.0
+        self._lock = threading.Lock()
+        self.set_variants(variants or [])
+
+    @classmethod
+    def from_file(cls, agent, path: str, **kwargs) -> "ShadowEvaluator":
+        variants = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                variants = json.load(f)
+        return cls(agent, variants, **kwargs)
+
+    def set_variants(self, variants: List) -> None:
+        built = []
+        for item in variants:
+            variant = item if isinstance(item, ShadowVariant) else ShadowVariant.from_config(item)
+            variant.bind(self.agent)
+            built.append(variant)
+        names = [v.name for v in built]
+        if len(names) != len(set(names)):
+            raise ValueError("duplicate shadow variant name")
+        with self._lock:
+            self.variants = built
+
+    # ========== 每 tick ==========
+    def on_market(self, market: Dict) -> None:
+        if not self.variants or not market:
+            return
+        start = time.perf_counter()
+        ctx = self.agent._get_entry_context(market)
+        scores = ctx["scores"]
+        price = market["current_price"]
+        now = self.agent.clock()
+        sltp_cache: Dict[str, Dict] = {}
+        with self._lock:
+            for variant in self.variants:
+                threshold = (
+                    variant.threshold if variant.threshold is not None else ctx["effective_threshold"]
+                ) + variant.entry_bias
+                self._check_exits(variant, market, scores, threshold, price, now)
+                self._check_entry(variant, market, ctx, threshold, price, now, sltp_cache)
+        self.ticks += 1
+        self.last_cost = time.perf_counter() - start
+
+    def _check_exits(
+        self, variant: ShadowVariant, market: Dict, scores: Dict, threshold: float, price: float, now: float
+    ) -> None:
+        if not variant.positions:
+            return
+        market_v = with_fields(
+            market,
+            entry_scores={"long": scores["long"], "short": scores["short"]},
+            entry_threshold={"threshold": threshold},
+        )
+        for pos in list(variant.positions):
+            state = variant.states.setdefault(pos["trade_id"], {})
+            decision = variant.exit_manager.evaluate(pos, market_v, price, state)
+            if decision:
+                self._close(variant, pos, price, decision.reason, now)
+
+    def _check_entry(
+        self,
+        variant: ShadowVariant,
+        market: Dict,
+        ctx: Dict,
+        threshold: float,
+        price: float,
+        now: float,
+        sltp_cache: Dict[str, Dict],
+    ) -> None:
+        if len(variant.positions) >= variant.max_positions:
+            return
+        cooldown = variant.cooldown if variant.cooldown is not None else ctx.get("cooldown", 0)
+        if now - variant.last_entry_time < cooldown:
+            return
+        signal = self.agent.select_entry(market, ctx["scores"], {"threshold": threshold}, threshold)
+        if not signal:
+            return
+        variant.stats["signals"] += 1
+        direction = signal["direction"]
+        if direction not in sltp_cache:
+            atr = market["analysis_15m"].get("atr", 0)
+            sltp_cache[direction] = self.agent.sl_tp.calculate(price, direction, atr, market=market)
+        sltp = sltp_cache[direction]
+        variant._seq += 1
+        variant.positions.append({
+            "trade_id": f"{variant.name}-{variant._seq}",
+            "direction": direction,
+            "entry_price": price,
+            "quantity": variant.notional / price if price > 0 else 0.0,
+            "stop_loss": sltp["stop_loss"],
+            "take_profit": sltp["take_profit"],
+            "leverage": 1,
+            "timestamp_open": datetime.fromtimestamp(now).isoformat(),
+            "entry_reason": signal.get("reason"),
+            "strength": signal.get("strength"),
+        })
+        variant.last_entry_time = now
+
+    def _close(self, variant: ShadowVariant, pos: Dict, price: float, reason: str, now: float) -> None:
+        qty = pos["quantity"]
+        entry = pos["entry_price"]
+        raw = (price - entry) * qty if pos["direction"] == "LONG" else (entry - price) * qty
+        fees = (entry + price) * qty * COMMISSION_RATE
+        pnl = raw - fees
+        variant.positions.remove(pos)
+        variant.states.pop(pos["trade_id"], None)
+        variant.stats["trades"] += 1
+        variant.stats["wins" if pnl >= 0 else "losses"] += 1
+        variant.stats["pnl"] += pnl
+        variant.stats["fees"] += fees
+        variant.trades.append({
+            "trade_id": pos["trade_id"],
+            "direction": pos["direction"],
+            "entry_price": entry,
+            "exit_price": price,
+            "pnl": round(pnl, 4),
+            "reason": reason,
+            "opened": pos["timestamp_open"],
+            "closed": datetime.fromtimestamp(now).isoformat(),
+        })
+        self.metrics.inc("agent_shadow_trades_total", variant=variant.name)
+
+    # ========== 查询 ==========
+    def summary(self) -> Dict:
+        with self._lock:
+            variants = [v.summary() for v in self.variants]
+        return {
+            "ticks": self.ticks,
+            "last_cost_ms": round(self.last_cost * 1000, 3),
+            "cost_ms_per_variant": round(self.last_cost * 1000 / len(variants), 3) if variants else 0.0,
+            "variants": sorted(variants, key=lambda v: v["pnl"], reverse=True),
+        }
+
+    def variant_detail(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            variant = next((v for v in self.variants if v.name == name), None)
+            if variant is None:
+                return None
+            data = variant.summary()
+            data["positions"] = [dict(p) for p in variant.positions]
+            data["trades"] = list(variant.trades)
+            data["exit_params"] = dict(variant.exit_manager.params)
+        return data
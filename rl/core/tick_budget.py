@@ -0,0 +1,176 @@
+"""
+tick 时间预算与逐级降级
+
+交易所变慢或机器负载高时，一个 tick 可能超过调度间隔，之后的 tick 越拖越晚。
+TickBudget 给每个 tick 一个截止时间和各阶段预算，在检查点按剩余时间选择降级档位：
+
+    0 full          完整流程
+    1 cached_htf    8h/1w 不再拉取，沿用上一次的高周期分析和候选位
+    2 no_orderbook  不拉盘口，关键位评分不带盘口特征
+    3 exits_only    不做完整分析，只按最新价检查出场
+
+- 选档：从当前档位起，取第一个"剩余阶段的预计耗时 <= 剩余时间"的档位；
+  预计耗时为各阶段实际耗时的指数平均（初始为阶段预算）
+- 拉取阶段超出预算：直接降到 cached_htf（交易所慢，少拉数据）
+- 跨 tick：超过截止时间的 tick 让下一个 tick 从更低一档起步（最多 no_orderbook），
+  连续 recover_ticks 个按时完成的 tick 后恢复一档
+每次降级都计数并回调 on_degrade（Web 循环写日志）。
+"""
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..monitoring.metrics import registry as metrics_registry
+
+FULL = 0
+CACHED_HTF = 1
+NO_ORDERBOOK = 2
+EXITS_ONLY = 3
+LEVEL_NAMES = ("full", "cached_htf", "no_orderbook", "exits_only")
+
+# 各档位在检查点之后还要跑的阶段
+LEVEL_STAGES = {
+    FULL: ("fetch_15m", "fetch_htf", "fetch_orderbook", "analyze_market", "decide"),
+    CACHED_HTF: ("fetch_15m", "fetch_orderbook", "analyze_market", "decide"),
+    NO_ORDERBOOK: ("fetch_15m", "analyze_market", "decide"),
+    EXITS_ONLY: (),
+}
+FETCH_STAGES = ("fetch_1m", "fetch_15m", "fetch_htf", "fetch_orderbook")
+
+DEFAULT_BUDGETS = {
+    "fetch_1m": 3.0,
+    "fetch_15m": 2.0,
+    "fetch_htf": 4.0,
+    "fetch_orderbook": 2.0,
+    "analyze_market": 8.0,
+    "decide": 3.0,
+}
+
+
+class TickBudget:
+    def __init__(
+        self,
+        deadline: float = 20.0,
+        budgets: Optional[Dict[str, float]] = None,
+        recover_ticks: int = 3,
+        smoothing: float = 0.3,
+        on_degrade: Optional[Callable[[Dict], None]] = None,
+        clock: Callable[[], float] = time.perf_counter,
+        metrics=None,
+    ):
+        self.deadline = deadline
+        self.budgets = dict(DEFAULT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+        self.recover_ticks = recover_ticks
+        self.smoothing = smoothing
+        self.on_degrade = on_degrade
+        self.clock = clock
+        self.metrics = metrics or metrics_registry
+        self.metrics.counter("agent_tick_degradations_total", "Tick degradations by level", ("level",))
+        self.metrics.counter("agent_tick_stage_overruns_total", "Tick stages exceeding their budget", ("stage",))
+        self.metrics.counter("agent_tick_deadline_missed_total", "Ticks finishing after their deadline")
+        self.level = FULL
+        self.durations: Dict[str, float] = {}
+        self.overruns: List[str] = []
+        self.events = deque(maxlen=50)
+        self._expected: Dict[str, float] = dict(self.budgets)
+        self._carry = FULL
+        self._on_time = 0
+        self._start: Optional[float] = None
+
+    # ========== tick 生命周期 ==========
+    def begin(self) -> int:
+        self._start = self.clock()
+        self.durations = {}
+        self.overruns = []
+        self.level = FULL
+        if self._carry > FULL:
+            self.degrade(self._carry, "previous_tick_overrun")
+        return self.level
+
+    def end(self) -> Dict:
+        elapsed = self.elapsed()
+        missed = elapsed > self.deadline
+        if missed:
+            self.metrics.inc("agent_tick_deadline_missed_total")
+            self._carry = min(self._carry + 1, NO_ORDERBOOK)
+            self._on_time = 0
+        else:
+            self._on_time += 1
+            if self._carry > FULL and self._on_time >= self.recover_ticks:
+                self._carry -= 1
+                self._on_time = 0
+        return {"elapsed": elapsed, "level": LEVEL_NAMES[self.level], "missed": missed}
+
+    def elapsed(self) -> float:
+        return 0.0 if self._start is None else self.clock() - self._start
+
+    def remaining(self) -> float:
+        return self.deadline - self.elapsed()
+
+    @contextmanager
+    def stage(self, name: str):
+        """计时一个阶段（同时记入阶段耗时指标），超出预算时计数"""
+        start = self.clock()
+        try:
+            with self.metrics.stage(name):
+                yield
+        finally:
+            duration = self.clock() - start
+            self.durations[name] = self.durations.get(name, 0.0) + duration
+            prev = self._expected.get(name, duration)
+            self._expected[name] = prev + self.smoothing * (duration - prev)
+            budget = self.budgets.get(name)
+            if budget is not None and duration > budget:
+                self.overruns.append(name)
+                self.metrics.inc("agent_tick_stage_overruns_total", stage=name)
+
+    # ========== 降级 ==========
+    def expected(self, stages: Iterable[str]) -> float:
+        return sum(self._expected.get(name, 0.0) for name in stages if name not in self.durations)
+
+    def plan(self) -> int:
+        """检查点：按阶段超时和剩余时间决定本 tick 的档位（只降不升）"""
+        if any(name in FETCH_STAGES for name in self.overruns) and self.level < CACHED_HTF:
+            over = next(name for name in self.overruns if name in FETCH_STAGES)
+            self.degrade(CACHED_HTF, f"{over}_overrun")
+        remaining = self.remaining()
+        level = self.level
+        while level < EXITS_ONLY and self.expected(LEVEL_STAGES[level]) > remaining:
+            level += 1
+        if level > self.level:
+            self.degrade(level, f"remaining={remaining:.2f}s")
+        return self.level
+
+    def degrade(self, level: int, reason: str) -> bool:
+        if level <= self.level:
+            return False
+        self.level = level
+        event = {
+            "level": LEVEL_NAMES[level],
+            "reason": reason,
+            "elapsed": round(self.elapsed(), 3),
+            "at": time.time(),
+        }
+        self.events.append(event)
+        self.metrics.inc("agent_tick_degradations_total", level=LEVEL_NAMES[level])
+        if self.on_degrade is not None:
+            self.on_degrade(event)
+        return True
+
+    def allows(self, level: int) -> bool:
+        """当前档位是否仍在 level 之前（例如 allows(NO_ORDERBOOK) 表示还可以拉盘口）"""
+        return self.level < level
+
+    def status(self) -> Dict:
+        return {
+            "deadline": self.deadline,
+            "level": LEVEL_NAMES[self.level],
+            "carry": LEVEL_NAMES[self._carry],
+            "budgets": dict(self.budgets),
+            "expected": {k: round(v, 4) for k, v in self._expected.items()},
+            "last_durations": {k: round(v, 4) for k, v in self.durations.items()},
+            "recent_degradations": list(self.events)[-10:],
+        }
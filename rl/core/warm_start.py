@@ -0,0 +1,271 @@
+"""
+运行时状态热启动快照
+
+重启后 TradingAgent 会丢掉只在内存里的状态：行情状态平滑历史（MarketRegimeDetector.history）、
+每个持仓的出场状态（position_states：最高/最低价、是否触及关键位、最大浮盈，利润锁定依赖它）、
+上一轮关键位、K线缓冲、高周期分析缓存、入场冷却计时。WarmStartStore 定期把这些状态写成一个
+压缩快照，启动时恢复：
+
+- 采集在 agent 线程内完成（只做浅拷贝和K线数组复制），序列化和写盘交给后台线程；
+  后台线程还在写上一份时只保留最新一份，不排队
+- 写入：gzip JSON 写到临时文件、fsync 后 os.replace，进程崩溃时要么是旧快照要么是新快照
+- 恢复：持仓出场状态只恢复仍在持仓列表中的 trade_id；行情类状态（K线、高周期缓存、关键位、
+  行情状态历史）只在快照不超过 market_max_age 秒且交易对一致时恢复，避免用过期行情
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from ..market_analysis.candle_store import CandleWindow
+from ..market_analysis.level_engine import candle_columns
+from ..monitoring.metrics import registry as metrics_registry
+
+FORMAT_VERSION = 1
+SNAPSHOT_FILE = "warm_start.json.gz"
+
+
+def _float(value):
+    """numpy 标量等转成 JSON 可写的值"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def capture_state(agent) -> Dict:
+    """在 agent 线程内调用：采集运行时状态（不做序列化）"""
+    trade_ids = {p.get("trade_id") for p in agent.positions}
+    htf = {}
+    for tf, entry in agent._htf_cache.items():
+        klines = entry["klines"]
+        htf[tf] = {
+            "key": entry["key"],
+            "klines": klines.columns_array().copy() if isinstance(klines, CandleWindow) else list(klines),
+            "analysis": dict(entry["analysis"]),
+            "candidates": entry["candidates"],
+        }
+    return {
+        "version": FORMAT_VERSION,
+        "symbol": agent.symbol,
+        "saved_at": agent.clock(),
+        "position_states": {
+            tid: dict(state) for tid, state in agent.position_states.items() if tid in trade_ids
+        },
+        "last_entry_time": agent._last_entry_time,
+        "last_signal_state": dict(agent.last_signal_state or {}),
+        "market": {
+            "regime_history": list(agent.regime_detector.history),
+            "current_regime": agent.current_regime,
+            "regime_adjustments": dict(agent.regime_adjustments or {}),
+            "best_support": agent.best_support,
+            "best_resistance": agent.best_resistance,
+            "last_level_scores": list(agent.last_level_scores),
+            "last_tf_weights": dict(agent.last_tf_weights),
+            "candles": agent.candles.dump(),
+            "htf": htf,
+        },
+    }
+
+
+def _encode(state: Dict) -> bytes:
+    market = state["market"]
+    market["candles"] = {tf: cols.tolist() for tf, cols in market["candles"].items()}
+    for entry in market["htf"].values():
+        if hasattr(entry["klines"], "tolist"):
+            entry["klines"] = entry["klines"].tolist()
+    return json.dumps(state, separators=(",", ":"), default=_float).encode("utf-8")
+
+
+def restore_state(agent, state: Dict, market_max_age: float = 7200.0) -> Dict:
+    """把快照恢复到新构造的 agent，返回恢复摘要"""
+    trade_ids = {p.get("trade_id") for p in agent.positions}
+    position_states = {
+        tid: s for tid, s in (state.get("position_states") or {}).items() if tid in trade_ids
+    }
+    agent.position_states.update(position_states)
+    agent._last_entry_time = float(state.get("last_entry_time") or 0)
+    agent.last_signal_state = state.get("last_signal_state") or {}
+    summary = {"position_states": len(position_states), "market": False, "candles": {}}
+
+    age = agent.clock() - float(state.get("saved_at") or 0)
+    summary["age"] = round(age, 1)
+    market = state.get("market") or {}
+    if state.get("symbol") != agent.symbol or age > market_max_age or not market:
+        return summary
+    detector = agent.regime_detector
+    detector.history = list(market.get("regime_history") or [])[-detector.max_history:]
+    agent.current_regime = market.get("current_regime")
+    agent.regime_adjustments = market.get("regime_adjustments") or {}
+    agent.best_support = market.get("best_support")
+    agent.best_resistance = market.get("best_resistance")
+    agent.last_level_scores = market.get("last_level_scores") or []
+    agent.last_tf_weights = market.get("last_tf_weights") or {}
+    for tf, cols in (market.get("candles") or {}).items():
+        summary["candles"][tf] = agent.candles.load(tf, cols)
+    for tf, entry in (market.get("htf") or {}).items():
+        klines = CandleWindow(_columns(entry["klines"]))
+        agent._htf_cache[tf] = {
+            "key": entry["key"],
+            "klines": klines,
+            "analysis": entry["analysis"],
+            "candidates": entry["candidates"],
+            "columns": candle_columns(klines),
+        }
+    summary["market"] = True
+    summary["htf"] = sorted(market.get("htf") or {})
+    return summary
+
+
+def _columns(data):
+    import numpy as np
+
+    return np.asarray(data, dtype=np.float64).reshape(6, -1)
+
+
+class WarmStartStore:
+    """
+    store = WarmStartStore(data_dir)
+    store.restore(agent)          # 启动时
+    store.maybe_save(agent)       # 每个 tick 末尾，按 interval 节流
+    store.close(agent)            # 退出时同步写最后一份
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        interval: float = 30.0,
+        market_max_age: float = 7200.0,
+        compresslevel: int = 5,
+        clock: Callable[[], float] = time.time,
+        metrics=None,
+    ):
+        self.path = os.path.join(data_dir, SNAPSHOT_FILE)
+        self.interval = interval
+        self.market_max_age = market_max_age
+        self.compresslevel = compresslevel
+        self.clock = clock
+        self.metrics = metrics or metrics_registry
+        self.metrics.counter("agent_warm_start_total", "Warm-start snapshot operations", ("action",))
+        self.last_save: Optional[float] = None
+        self.last_bytes = 0
+        self.last_write_ms = 0.0
+        self.last_error: Optional[str] = None
+        self.last_restore: Optional[Dict] = None
+        self._pending: Optional[Dict] = None
+        self._cond = threading.Condition()
+        self._writing = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    # ========== 保存 ==========
+    def due(self) -> bool:
+        return self.last_save is None or self.clock() - self.last_save >= self.interval
+
+    def maybe_save(self, agent) -> bool:
+        if not self.due():
+            return False
+        self.save_async(agent)
+        return True
+
+    def save_async(self, agent) -> None:
+        state = capture_state(agent)
+        self.last_save = self.clock()
+        with self._cond:
+            self._pending = state
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="warm-start", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def save(self, agent) -> bool:
+        """同步写入（退出时）"""
+        self.last_save = self.clock()
+        return self._write(capture_state(agent))
+
+    def close(self, agent=None) -> None:
+        """等后台线程写完已提交的快照后停止；传入 agent 时再同步写最后一份"""
+        with self._cond:
+            while self._thread is not None and (self._writing or self._pending is not None):
+                self._cond.wait(1.0)
+            self._stopped = True
+            self._cond.notify_all()
+        if agent is not None:
+            self.save(agent)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                state, self._pending = self._pending, None
+                self._writing = True
+            try:
+                self._write(state)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write(self, state: Dict) -> bool:
+        start = time.perf_counter()
+        tmp = self.path + ".tmp"
+        try:
+            data = gzip.compress(_encode(state), compresslevel=self.compresslevel)
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception as exc:
+            self.last_error = str(exc)
+            self.metrics.inc("agent_warm_start_total", action="error")
+            return False
+        self.last_bytes = len(data)
+        self.last_write_ms = round((time.perf_counter() - start) * 1000, 3)
+        self.last_error = None
+        self.metrics.inc("agent_warm_start_total", action="save")
+        return True
+
+    # ========== 恢复 ==========
+    def load(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with gzip.open(self.path, "rb") as f:
+                state = json.loads(f.read().decode("utf-8"))
+        except (OSError, EOFError, ValueError) as exc:
+            self.last_error = f"load: {exc}"
+            self.metrics.inc("agent_warm_start_total", action="error")
+            return None
+        if state.get("version") != FORMAT_VERSION:
+            return None
+        return state
+
+    def restore(self, agent) -> Optional[Dict]:
+        state = self.load()
+        if state is None:
+            return None
+        try:
+            summary = restore_state(agent, state, self.market_max_age)
+        except Exception as exc:
+            self.last_error = f"restore: {exc}"
+            self.metrics.inc("agent_warm_start_total", action="error")
+            return None
+        self.last_restore = summary
+        self.metrics.inc("agent_warm_start_total", action="restore")
+        return summary
+
+    def status(self) -> Dict:
+        return {
+            "path": self.path,
+            "interval": self.interval,
+            "last_save_age": round(self.clock() - self.last_save, 1) if self.last_save else None,
+            "last_bytes": self.last_bytes,
+            "last_write_ms": self.last_write_ms,
+            "last_restore": self.last_restore,
+            "last_error": self.last_error,
+        }
@@ -1,9 +1,23 @@
 """
 执行模块
-包含止损止盈计算和出场管理
+包含止损止盈计算、出场管理和限价单执行
+子模块在首次访问导出名时才导入（PEP 562）
 """
-from .sl_tp import StopLossTakeProfit, PositionSizer
-from .exit_manager import ExitManager, PositionState, ExitDecision
+from ..monitoring.startup import lazy_exports
+
+_EXPORTS = {
+    'StopLossTakeProfit': '.sl_tp',
+    'PositionSizer': '.sl_tp',
+    'ExitManager': '.exit_manager',
+    'PositionState': '.exit_manager',
+    'ExitDecision': '.exit_manager',
+    'OrderExecutor': '.order_executor',
+    'OrderTicket': '.order_executor',
+    'ExitWatchdog': '.exit_watchdog',
+    'PriceStream': '.exit_watchdog',
+    'ProtectiveOrderManager': '.protective_orders',
+}
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 __all__ = [
     'StopLossTakeProfit',
@@ -11,6 +25,9 @@ __all__ = [
     'ExitManager',
     'PositionState',
     'ExitDecision',
+    'OrderExecutor',
+    'OrderTicket',
+    'ExitWatchdog',
+    'PriceStream',
+    'ProtectiveOrderManager',
 ]
-
-
@@ -1,3 +1,4 @@
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Optional, Tuple
@@ -26,6 +27,7 @@ class ExitManager:
             "profit_lock_base_drop": 0.5,
             "profit_lock_slope": 0.05,
         }
+        self.clock = time.time
 
     def update_params(self, params: dict) -> None:
         if not params:
@@ -42,7 +44,7 @@ class ExitManager:
             opened = datetime.fromisoformat(ts)
         except Exception:
             return None
-        return (datetime.now() - opened).total_seconds() / 60
+        return (datetime.fromtimestamp(self.clock()) - opened).total_seconds() / 60
 
     def _get_signal_scores(self, market: dict) -> Tuple[float, float, float]:
         scores = market.get("entry_scores") or {}
@@ -157,24 +159,35 @@ class ExitManager:
         
         return None
 
-    def evaluate(
+    @staticmethod
+    def _pnl_pct(position: dict, current_price: float) -> Optional[float]:
+        entry = position.get("entry_price", 0)
+        if entry <= 0:
+            return None
+        if position.get("direction") == "LONG":
+            return (current_price - entry) / entry * 100
+        return (entry - current_price) / entry * 100
+
+    def evaluate_price(
         self, position: dict, market: dict, current_price: float, state: Optional[dict] = None
     ) -> Optional[ExitDecision]:
+        """
+        只看价格的出场规则：止损止盈、最大亏损、支撑阻力位出场、利润锁定
+        不依赖新的行情分析，可由出场看门狗按逐笔价格调用（market 为上一轮缓存）
+        """
         direction = position.get("direction")
-        entry = position.get("entry_price", 0)
         stop_loss = position.get("stop_loss")
         take_profit = position.get("take_profit")
-        if entry <= 0:
+        pnl_pct = self._pnl_pct(position, current_price)
+        if pnl_pct is None:
             return None
 
         if direction == "LONG":
-            pnl_pct = (current_price - entry) / entry * 100
             if stop_loss and current_price <= stop_loss:
                 return ExitDecision("STOP_LOSS", ["stop_loss_hit"])
             if take_profit and current_price >= take_profit:
                 return ExitDecision("TAKE_PROFIT", ["take_profit_hit"])
         else:
-            pnl_pct = (entry - current_price) / entry * 100
             if stop_loss and current_price >= stop_loss:
                 return ExitDecision("STOP_LOSS", ["stop_loss_hit"])
             if take_profit and current_price <= take_profit:
@@ -202,6 +215,33 @@ class ExitManager:
                         "PROFIT_LOCK",
                         [f"max_pnl={max_pnl:.2f}", f"drop={drop:.2f}"],
                     )
+        return None
+
+    def profit_lock_stop(self, position: dict, state: Optional[dict]) -> Optional[float]:
+        """利润锁定当前对应的止损价（未启动锁定时返回 None），用于同步交易所止损单"""
+        entry = position.get("entry_price", 0)
+        if entry <= 0 or not state or "max_pnl_pct" not in state:
+            return None
+        max_pnl = state["max_pnl_pct"]
+        if max_pnl < self.params.get("profit_lock_start", 0.6):
+            return None
+        base_drop = self.params.get("profit_lock_base_drop", 0.5)
+        slope = self.params.get("profit_lock_slope", 0.05)
+        lock_pct = max_pnl - max(0.15, base_drop - max_pnl * slope)
+        if position.get("direction") == "LONG":
+            return entry * (1 + lock_pct / 100)
+        return entry * (1 - lock_pct / 100)
+
+    def evaluate(
+        self, position: dict, market: dict, current_price: float, state: Optional[dict] = None
+    ) -> Optional[ExitDecision]:
+        decision = self.evaluate_price(position, market, current_price, state)
+        if decision:
+            return decision
+        direction = position.get("direction")
+        pnl_pct = self._pnl_pct(position, current_price)
+        if pnl_pct is None:
+            return None
 
         hold_minutes = self._get_hold_minutes(position)
         long_score, short_score, min_score = self._get_signal_scores(market)
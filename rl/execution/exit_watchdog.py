@@ -0,0 +1,246 @@
+"""
+出场看门狗
+
+完整分析每根K线/每次唤醒才跑一次，高杠杆下插针可能在两次分析之间直接击穿止损。
+看门狗在独立线程里跟随逐笔成交/标记价格：
+- PriceStream：优先 websocket（aggTrade / markPrice），不可用或断线时退回 REST 轮询
+- ExitWatchdog：每次价格更新只跑价格类出场规则（ExitManager.evaluate_price），
+  支撑阻力位使用上一轮分析的缓存；触发后通过 agent.request_exit 交给 OrderExecutor，
+  成交记账仍在 agent 线程的 process_order_events 中完成
+
+止损/最大亏损按紧急单提交（首单即穿价），其余规则保持 maker 报价。
+"""
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from ..monitoring.metrics import registry as metrics_registry
+
+MAINNET_WS_URL = "wss://fstream.binance.com/ws"
+URGENT_REASONS = ("STOP_LOSS", "MAX_LOSS")
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0)
+
+
+class PriceStream:
+    """
+    单个 symbol 的价格流，on_price(price, event_ts) 在流线程中回调
+    stream: aggTrade（逐笔成交）或 markPrice@1s（标记价格）
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        on_price: Callable[[float, float], None],
+        price_probe: Optional[Callable[[], float]] = None,
+        stream: str = "aggTrade",
+        ws_url: str = MAINNET_WS_URL,
+        use_websocket: bool = True,
+        poll_interval: float = 0.5,
+        reconnect_delay: float = 5.0,
+        should_poll: Optional[Callable[[], bool]] = None,
+    ):
+        self.symbol = symbol
+        self.on_price = on_price
+        self.price_probe = price_probe
+        self.stream = stream
+        self.ws_url = ws_url
+        self.use_websocket = use_websocket
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.should_poll = should_poll
+        self.mode = "idle"
+        self.updates = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_price: Optional[float] = None
+        self.last_update: Optional[float] = None
+        self._ws = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"price-stream-{self.symbol}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop_event.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.mode = "idle"
+
+    def status(self) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "mode": self.mode,
+            "stream": self.stream,
+            "updates": self.updates,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_price": self.last_price,
+            "last_update": self.last_update,
+        }
+
+    # ========== 内部 ==========
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            if self.use_websocket and self._run_websocket():
+                continue
+            # websocket 不可用/断线：轮询一段时间后再尝试重连
+            self._poll_until(time.time() + self.reconnect_delay if self.use_websocket else None)
+
+    def _run_websocket(self) -> bool:
+        try:
+            import websocket  # websocket-client
+        except ImportError:
+            self.use_websocket = False
+            self.last_error = "websocket-client not installed"
+            return False
+        url = f"{self.ws_url}/{self.symbol.lower()}@{self.stream}"
+        self._ws = websocket.WebSocketApp(
+            url,
+            on_message=lambda _ws, message: self._on_message(message),
+            on_error=lambda _ws, error: self._on_error(error),
+        )
+        self.mode = "websocket"
+        try:
+            self._ws.run_forever(ping_interval=20, ping_timeout=10)
+        except Exception as exc:
+            self._on_error(exc)
+        finally:
+            self._ws = None
+        # run_forever 返回即连接已断开；被 stop() 关闭时视为正常退出
+        return self._stop_event.is_set()
+
+    def _on_message(self, message: str) -> None:
+        try:
+            data = json.loads(message)
+            price = float(data["p"])
+            event_ts = float(data.get("E", 0)) / 1000 or time.time()
+        except (ValueError, KeyError, TypeError):
+            return
+        self._emit(price, event_ts)
+
+    def _on_error(self, error) -> None:
+        self.errors += 1
+        self.last_error = str(error)
+
+    def _poll_until(self, deadline: Optional[float]) -> None:
+        self.mode = "polling"
+        while not self._stop_event.is_set():
+            if deadline is not None and time.time() >= deadline:
+                return
+            if self.price_probe is not None and (self.should_poll is None or self.should_poll()):
+                try:
+                    price = float(self.price_probe())
+                    if price > 0:
+                        self._emit(price, time.time())
+                except Exception as exc:
+                    self._on_error(exc)
+            self._stop_event.wait(self.poll_interval)
+
+    def _emit(self, price: float, event_ts: float) -> None:
+        self.updates += 1
+        self.last_price = price
+        self.last_update = time.time()
+        try:
+            self.on_price(price, event_ts)
+        except Exception as exc:
+            self._on_error(exc)
+
+
+class ExitWatchdog:
+    """
+    价格驱动的出场检查
+
+    agent 需提供 check_exit_price(price) 和 request_exit(...)；
+    出场成交事件由 agent 循环的 process_order_events 消费。
+    """
+
+    def __init__(
+        self,
+        agent,
+        price_probe: Optional[Callable[[], float]] = None,
+        min_interval: float = 0.1,
+        metrics=None,
+        **stream_kwargs,
+    ):
+        self.agent = agent
+        self.min_interval = min_interval
+        self.metrics = metrics or metrics_registry
+        self.metrics.counter("agent_exit_watchdog_updates_total", "Price updates seen by the exit watchdog", ("mode",))
+        self.metrics.counter("agent_exit_watchdog_exits_total", "Exits handed to the executor by the watchdog", ("reason",))
+        self.metrics.histogram(
+            "agent_exit_watchdog_latency_seconds",
+            "Delay from price event to exit submission",
+            buckets=LATENCY_BUCKETS,
+        )
+        self.stream = PriceStream(
+            agent.symbol,
+            self.on_price,
+            price_probe=price_probe,
+            should_poll=lambda: bool(agent.positions),
+            **stream_kwargs,
+        )
+        self.exits = 0
+        self.last_exit: Optional[Dict] = None
+        self._last_check = 0.0
+
+    def start(self) -> None:
+        self.stream.start()
+
+    def stop(self) -> None:
+        self.stream.stop()
+
+    def on_price(self, price: float, event_ts: Optional[float] = None) -> int:
+        """处理一次价格更新，返回本次提交的出场数"""
+        self.metrics.inc("agent_exit_watchdog_updates_total", mode=self.stream.mode)
+        if not self.agent.positions:
+            return 0
+        now = time.time()
+        if now - self._last_check < self.min_interval:
+            return 0
+        self._last_check = now
+        submitted = 0
+        for position, decision in self.agent.check_exit_price(price):
+            urgent = decision.reason in URGENT_REASONS
+            if not self.agent.request_exit(
+                position,
+                price,
+                decision.reason,
+                list(decision.confirmations) + ["watchdog"],
+                urgent=urgent,
+            ):
+                continue
+            submitted += 1
+            self.exits += 1
+            latency = max(0.0, time.time() - (event_ts or now))
+            self.metrics.inc("agent_exit_watchdog_exits_total", reason=decision.reason)
+            self.metrics.observe("agent_exit_watchdog_latency_seconds", latency)
+            self.last_exit = {
+                "trade_id": position.get("trade_id"),
+                "reason": decision.reason,
+                "price": price,
+                "urgent": urgent,
+                "latency": round(latency, 4),
+                "at": now,
+            }
+        return submitted
+
+    def status(self) -> Dict:
+        latency = self.metrics.get("agent_exit_watchdog_latency_seconds")
+        return {
+            "stream": self.stream.status(),
+            "exits": self.exits,
+            "last_exit": self.last_exit,
+            "latency": latency.summary() if latency else None,
+        }
@@ -0,0 +1,300 @@
+"""
+非阻塞限价单执行状态机
+
+每张订单是一个 OrderTicket，按事件/定时器推进：
+    PLACED -> WORKING -> (超时) REQUOTING -> PLACED ... -> FILLED / CANCELLED / FAILED
+
+- PLACED：已提交到交易所，等待首次状态检查
+- WORKING：交易所确认挂单中
+- REQUOTING：未成交已撤单，按最新价重新报价（前几次 maker 偏移，之后穿价）
+- FILLED：全部或部分成交
+- CANCELLED：重报次数用尽仍未成交
+- FAILED：下单异常
+
+后台线程只推进状态机；完成的订单放入事件队列，由 agent 在自己的线程里消费，
+持仓/交易记录不会被两个线程同时修改。execute_sync() 在调用线程内推进，保留原有的阻塞语义。
+"""
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+PLACED = "PLACED"
+WORKING = "WORKING"
+REQUOTING = "REQUOTING"
+FILLED = "FILLED"
+CANCELLED = "CANCELLED"
+FAILED = "FAILED"
+
+TERMINAL_STATES = (FILLED, CANCELLED, FAILED)
+
+
+@dataclass
+class OrderTicket:
+    symbol: str
+    side: str
+    quantity: float
+    ref_price: float
+    reduce_only: bool = False
+    tag: Dict = field(default_factory=dict)
+    urgent: bool = False  # 紧急单（如止损）跳过 maker 报价，首单即穿价
+    ticket_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    state: str = REQUOTING  # 新单从报价开始
+    attempt: int = 0
+    order_id: Optional[int] = None
+    limit_price: Optional[float] = None
+    deadline: float = 0.0
+    fill: Optional[Dict] = None
+    error: Optional[str] = None
+    history: List[str] = field(default_factory=list)
+
+    @property
+    def done(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+    @property
+    def executed_qty(self) -> float:
+        if not self.fill:
+            return 0.0
+        try:
+            return float(self.fill.get("executedQty", self.quantity))
+        except (TypeError, ValueError):
+            return self.quantity
+
+    @property
+    def fill_price(self) -> float:
+        """成交均价，交易所未返回时退回参考价"""
+        try:
+            price = float((self.fill or {}).get("avgPrice") or 0)
+        except (TypeError, ValueError):
+            price = 0.0
+        return price if price > 0 else self.ref_price
+
+    def to_dict(self) -> Dict:
+        return {
+            "ticket_id": self.ticket_id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "quantity": self.quantity,
+            "reduce_only": self.reduce_only,
+            "urgent": self.urgent,
+            "state": self.state,
+            "attempt": self.attempt,
+            "order_id": self.order_id,
+            "limit_price": self.limit_price,
+            "error": self.error,
+            "kind": self.tag.get("kind"),
+        }
+
+
+class OrderExecutor:
+    def __init__(
+        self,
+        client,
+        requote_seconds: float = 2,
+        requote_attempts: int = 6,
+        maker_attempts: int = 3,
+        offset_pct: float = 0.0003,
+        cross_offset_pct: float = 0.0002,
+        metrics=None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        tick_interval: float = 0.1,
+    ):
+        self.client = client
+        self.requote_seconds = requote_seconds
+        self.requote_attempts = requote_attempts
+        self.maker_attempts = maker_attempts
+        self.offset_pct = offset_pct
+        self.cross_offset_pct = cross_offset_pct
+        self.metrics = metrics
+        self.clock = clock
+        self.sleep = sleep
+        self.tick_interval = tick_interval
+        self.events: "queue.Queue[OrderTicket]" = queue.Queue()
+        self._tickets: Dict[str, OrderTicket] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+
+    # ========== 报价 ==========
+    def calc_limit_price(self, current_price: float, side: str, attempt: int = 0) -> float:
+        use_cross = attempt >= self.maker_attempts
+        if side == "BUY":
+            if use_cross:
+                return current_price * (1 + self.cross_offset_pct)
+            return current_price * (1 - self.offset_pct)
+        if use_cross:
+            return current_price * (1 - self.cross_offset_pct)
+        return current_price * (1 + self.offset_pct)
+
+    # ========== 提交 ==========
+    def submit(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        current_price: float,
+        reduce_only: bool = False,
+        tag: Optional[Dict] = None,
+        urgent: bool = False,
+    ) -> OrderTicket:
+        """异步提交，由后台线程推进；完成后进入 events 队列"""
+        ticket = OrderTicket(symbol, side, quantity, current_price, reduce_only, dict(tag or {}), urgent)
+        with self._lock:
+            self._tickets[ticket.ticket_id] = ticket
+        self.start()
+        self._wake.set()
+        return ticket
+
+    def execute_sync(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        current_price: float,
+        reduce_only: bool = False,
+    ) -> Optional[Dict]:
+        """同步执行（阻塞到终态），返回成交状态，未成交返回 None"""
+        ticket = OrderTicket(symbol, side, quantity, current_price, reduce_only)
+        while True:
+            self._advance(ticket, self.clock())
+            if ticket.done:
+                break
+            self.sleep(max(0.0, ticket.deadline - self.clock()))
+        if ticket.state == FAILED:
+            raise RuntimeError(ticket.error)
+        return ticket.fill if ticket.state == FILLED else None
+
+    # ========== 查询 ==========
+    def active(self) -> List[OrderTicket]:
+        with self._lock:
+            return [t for t in self._tickets.values() if not t.done]
+
+    def has_events(self) -> bool:
+        return not self.events.empty()
+
+    def drain_events(self) -> List[OrderTicket]:
+        tickets = []
+        while True:
+            try:
+                tickets.append(self.events.get_nowait())
+            except queue.Empty:
+                return tickets
+
+    # ========== 后台线程 ==========
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="order-executor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def step(self, now: Optional[float] = None) -> None:
+        """推进所有到期的订单（后台线程调用，也可在测试中手动调用）"""
+        now = self.clock() if now is None else now
+        for ticket in self.active():
+            if ticket.deadline <= now:
+                try:
+                    self._advance(ticket, now)
+                except Exception as exc:
+                    self._finish(ticket, FAILED, error=str(exc))
+            if ticket.done:
+                with self._lock:
+                    self._tickets.pop(ticket.ticket_id, None)
+                self.events.put(ticket)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self.step()
+            active = self.active()
+            if active:
+                wait = min(t.deadline for t in active) - self.clock()
+                wait = min(max(wait, 0.0), self.tick_interval * 10)
+            else:
+                wait = None
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    # ========== 状态机 ==========
+    def _advance(self, ticket: OrderTicket, now: float) -> None:
+        if ticket.state == REQUOTING:
+            self._place(ticket, now)
+        elif ticket.state in (PLACED, WORKING):
+            self._check(ticket, now)
+
+    def _place(self, ticket: OrderTicket, now: float) -> None:
+        if ticket.attempt >= max(1, self.requote_attempts):
+            self._finish(ticket, CANCELLED, error="limit_order_unfilled")
+            return
+        if ticket.attempt > 0:
+            self._inc("agent_requotes_total", side=ticket.side)
+        attempt = ticket.attempt + (self.maker_attempts if ticket.urgent else 0)
+        ticket.limit_price = self.calc_limit_price(ticket.ref_price, ticket.side, attempt=attempt)
+        try:
+            order = self.client.place_order(
+                symbol=ticket.symbol,
+                side=ticket.side,
+                order_type="LIMIT",
+                quantity=ticket.quantity,
+                price=ticket.limit_price,
+                time_in_force="GTC",
+                reduce_only=ticket.reduce_only,
+            )
+        except Exception as exc:
+            self._finish(ticket, FAILED, error=str(exc))
+            return
+        ticket.order_id = order.get("orderId") if isinstance(order, dict) else None
+        ticket.attempt += 1
+        ticket.deadline = now + self.requote_seconds
+        self._transition(ticket, PLACED)
+
+    def _check(self, ticket: OrderTicket, now: float) -> None:
+        if ticket.order_id:
+            status = self.client.get_order(ticket.symbol, order_id=ticket.order_id)
+            if isinstance(status, dict):
+                order_status = status.get("status", "")
+                if order_status in ("FILLED", "PARTIALLY_FILLED"):
+                    self._finish(ticket, FILLED, fill=status)
+                    return
+                if ticket.state == PLACED and order_status in ("NEW", ""):
+                    self._transition(ticket, WORKING)
+                # 未成交：撤单后重新报价
+                try:
+                    self.client.cancel_order(ticket.symbol, order_id=ticket.order_id)
+                except Exception:
+                    # 撤单失败，订单可能刚好成交
+                    recheck = self.client.get_order(ticket.symbol, order_id=ticket.order_id)
+                    if isinstance(recheck, dict) and recheck.get("status") in ("FILLED", "PARTIALLY_FILLED"):
+                        self._finish(ticket, FILLED, fill=recheck)
+                        return
+        try:
+            ticker = self.client.get_ticker_price(ticket.symbol)
+            ticket.ref_price = float(ticker.get("price", ticket.ref_price))
+        except Exception:
+            pass
+        ticket.deadline = now
+        self._transition(ticket, REQUOTING)
+
+    def _transition(self, ticket: OrderTicket, state: str) -> None:
+        ticket.state = state
+        ticket.history.append(state)
+
+    def _finish(self, ticket: OrderTicket, state: str, fill: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        ticket.fill = fill
+        ticket.error = error
+        self._transition(ticket, state)
+        self._inc("agent_orders_total", state=state)
+
+    def _inc(self, name: str, **labels) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
@@ -0,0 +1,202 @@
+"""
+交易所端保护单（止损 / 止盈）
+
+止损止盈原本只存在于 active_positions.json，由轮询循环执行；tick 卡住或进程崩溃时仓位无保护。
+开启后每个持仓在交易所挂两张只减仓的条件单：
+- stop：STOP_MARKET，触发价 = 持仓止损价，利润锁定上移后同步上移
+- target：TAKE_PROFIT_MARKET，触发价 = 持仓止盈价
+
+挂单信息记录在持仓的 "protective" 字段中，随持仓一起落盘，重启后继续跟踪。
+移动止损时先批量挂新单、再批量撤旧单，中间始终有一张有效止损。
+本地出场逻辑保留作后备；保护单都是 reduce-only，与本地平仓单同时触发也不会反向开仓。
+"""
+from typing import Dict, List, Optional, Tuple
+
+STOP = "stop"
+TARGET = "target"
+ORDER_TYPES = {STOP: "STOP_MARKET", TARGET: "TAKE_PROFIT_MARKET"}
+EXIT_REASONS = {STOP: "STOP_LOSS", TARGET: "TAKE_PROFIT"}
+CLOSED_STATUSES = ("CANCELED", "EXPIRED", "REJECTED")
+
+
+class ProtectiveOrderManager:
+    def __init__(
+        self,
+        client,
+        symbol: str,
+        working_type: str = "MARK_PRICE",
+        min_move_pct: float = 0.0005,
+        metrics=None,
+    ):
+        self.client = client
+        self.symbol = symbol
+        self.working_type = working_type
+        self.min_move_pct = min_move_pct
+        self.metrics = metrics
+        self.last_error: Optional[str] = None
+        if metrics is not None:
+            metrics.counter("agent_protective_orders_total", "Exchange protective order operations", ("action",))
+
+    # ========== 挂单 ==========
+    def protect(self, positions: List[Dict]) -> int:
+        """为缺少保护单的持仓补挂止损/止盈（一次批量请求），返回挂出的数量"""
+        requests = []
+        for pos in positions:
+            if pos.get("exit_pending"):
+                continue
+            protective = pos.setdefault("protective", {})
+            for kind, key in ((STOP, "stop_loss"), (TARGET, "take_profit")):
+                price = pos.get(key)
+                if price and kind not in protective:
+                    requests.append((pos, kind, float(price)))
+        return self._place(requests)
+
+    def sync(self, positions: List[Dict], stops: Dict[str, float]) -> int:
+        """
+        止损价收紧后同步交易所止损单（stops: trade_id -> 新止损价）
+        只在新价比现有止损更紧且移动超过 min_move_pct 时改单，返回改单数量
+        """
+        requests = []
+        previous = []
+        for pos in positions:
+            new_stop = stops.get(pos.get("trade_id"))
+            current = (pos.get("protective") or {}).get(STOP)
+            if new_stop is None or current is None or pos.get("exit_pending"):
+                continue
+            if self._tighter(pos, new_stop, current["price"]):
+                requests.append((pos, STOP, float(new_stop)))
+                previous.append((pos, current))
+        if not requests:
+            return 0
+        self._place(requests)
+        # 新单挂成功（字段已被替换）的才撤旧单；失败时保留旧止损
+        stale = [info for pos, info in previous if pos["protective"].get(STOP) is not info]
+        self._cancel([info["order_id"] for info in stale])
+        self._inc("amended", len(stale))
+        return len(stale)
+
+    def release(self, positions: List[Dict]) -> int:
+        """撤掉这些持仓剩余的保护单（平仓后调用）"""
+        order_ids = []
+        for pos in positions:
+            protective = pos.pop("protective", None) or {}
+            order_ids.extend(info["order_id"] for info in protective.values())
+        return self._cancel(order_ids)
+
+    # ========== 对账 ==========
+    def reconcile(self, positions: List[Dict]) -> List[Dict]:
+        """
+        对照交易所挂单：不在挂单列表中的保护单查询最终状态
+        - 已成交：返回 {"position", "kind", "reason", "price", "order"}，由调用方完成本地记账
+        - 已撤销/过期：从持仓中移除记录，下一轮 protect() 会补挂
+        """
+        tracked: List[Tuple[Dict, str, Dict]] = [
+            (pos, kind, info)
+            for pos in positions
+            for kind, info in list((pos.get("protective") or {}).items())
+        ]
+        if not tracked:
+            return []
+        try:
+            open_ids = {o.get("orderId") for o in self.client.get_open_orders(self.symbol) or []}
+        except Exception as exc:
+            self.last_error = str(exc)
+            return []
+        fills = []
+        filled_ids = set()
+        for pos, kind, info in tracked:
+            if info["order_id"] in open_ids or pos.get("trade_id") in filled_ids:
+                continue
+            try:
+                status = self.client.get_order(self.symbol, order_id=info["order_id"]) or {}
+            except Exception as exc:
+                self.last_error = str(exc)
+                continue
+            order_status = status.get("status", "")
+            if order_status == "FILLED":
+                pos["protective"].pop(kind, None)
+                filled_ids.add(pos.get("trade_id"))
+                try:
+                    price = float(status.get("avgPrice") or 0)
+                except (TypeError, ValueError):
+                    price = 0.0
+                reason = EXIT_REASONS[kind]
+                if kind == STOP and info["price"] != pos.get("stop_loss"):
+                    reason = "PROFIT_LOCK"  # 止损单已被利润锁定上移
+                fills.append({
+                    "position": pos,
+                    "kind": kind,
+                    "reason": reason,
+                    "price": price if price > 0 else info["price"],
+                    "order": status,
+                })
+                self._inc("filled")
+            elif order_status in CLOSED_STATUSES:
+                pos["protective"].pop(kind, None)
+                self._inc("lost")
+        return fills
+
+    def status(self, positions: List[Dict]) -> Dict:
+        return {
+            "working_type": self.working_type,
+            "orders": {
+                pos.get("trade_id"): {kind: dict(info) for kind, info in pos.get("protective", {}).items()}
+                for pos in positions
+                if pos.get("protective")
+            },
+            "last_error": self.last_error,
+        }
+
+    # ========== 内部 ==========
+    def _order(self, position: Dict, kind: str, price: float) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "side": "SELL" if position["direction"] == "LONG" else "BUY",
+            "order_type": ORDER_TYPES[kind],
+            "quantity": position["quantity"],
+            "stop_price": price,
+            "reduce_only": True,
+            "working_type": self.working_type,
+        }
+
+    def _place(self, requests: List[Tuple[Dict, str, float]]) -> int:
+        if not requests:
+            return 0
+        try:
+            results = self.client.place_batch_orders([self._order(*req) for req in requests])
+        except Exception as exc:
+            self.last_error = str(exc)
+            self._inc("failed", len(requests))
+            return 0
+        placed = 0
+        for (pos, kind, price), result in zip(requests, results or []):
+            if isinstance(result, dict) and result.get("orderId"):
+                pos.setdefault("protective", {})[kind] = {"order_id": result["orderId"], "price": price}
+                placed += 1
+            else:
+                self.last_error = (result or {}).get("msg") if isinstance(result, dict) else str(result)
+                self._inc("failed")
+        self._inc("placed", placed)
+        return placed
+
+    def _cancel(self, order_ids: List[int]) -> int:
+        if not order_ids:
+            return 0
+        try:
+            results = self.client.cancel_batch_orders(self.symbol, order_ids)
+        except Exception as exc:
+            self.last_error = str(exc)
+            return 0
+        # 已成交/已撤的单子会返回错误项，这里只统计成功撤销的
+        cancelled = sum(1 for r in results or [] if isinstance(r, dict) and r.get("orderId"))
+        self._inc("cancelled", cancelled)
+        return cancelled
+
+    def _tighter(self, position: Dict, new_stop: float, current: float) -> bool:
+        if position.get("direction") == "LONG":
+            return new_stop > current * (1 + self.min_move_pct)
+        return new_stop < current * (1 - self.min_move_pct)
+
+    def _inc(self, action: str, amount: int = 1) -> None:
+        if self.metrics is not None and amount:
+            self.metrics.inc("agent_protective_orders_total", amount, action=action)
@@ -1,12 +1,18 @@
 """
 学习模块
 包含统一的特征学习系统
+子模块在首次访问导出名时才导入（PEP 562）
 """
-from .unified_learning_system import UnifiedLearningSystem
-from .dynamic_threshold import DynamicThresholdOptimizer
-from .north_star import NorthStarOptimizer
-from .exit_learner import ExitTimingLearner
-from .strategy_params import StrategyParamLearner
+from ..monitoring.startup import lazy_exports
+
+_EXPORTS = {
+    'UnifiedLearningSystem': '.unified_learning_system',
+    'DynamicThresholdOptimizer': '.dynamic_threshold',
+    'NorthStarOptimizer': '.north_star',
+    'ExitTimingLearner': '.exit_learner',
+    'StrategyParamLearner': '.strategy_params',
+}
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 __all__ = [
     'UnifiedLearningSystem',
@@ -15,4 +21,3 @@ __all__ = [
     'ExitTimingLearner',
     'StrategyParamLearner',
 ]
-
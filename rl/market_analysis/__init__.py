@@ -1,21 +1,47 @@
 """
 市场分析模块
 包含技术指标计算和支撑阻力位发现
+子模块在首次访问导出名时才导入（PEP 562）
 """
-from .indicators import TechnicalAnalyzer
-from .level_finder import BestLevelFinder
-from .levels import LevelDiscovery, LevelScoring
-from .regime import MarketRegimeDetector, BreakoutDetector
-from .pattern_detector import PatternDetector
+from ..monitoring.startup import lazy_exports
+
+_EXPORTS = {
+    'CandleStore': '.candle_store',
+    'CandleWindow': '.candle_store',
+    'TechnicalAnalyzer': '.indicators',
+    'BestLevelFinder': '.level_finder',
+    'LevelDiscovery': '.levels',
+    'LevelScoring': '.levels',
+    'LevelEngine': '.level_engine',
+    'LevelFeatureCache': '.feature_cache',
+    'MarketRegimeDetector': '.regime',
+    'BreakoutDetector': '.regime',
+    'PatternDetector': '.pattern_detector',
+    'StreamingAnalyzer': '.streaming',
+    'IndicatorSeries': '.indicator_series',
+    'ExtremaTracker': '.extrema',
+    'ExtremaStream': '.extrema',
+    'VolumeProfile': '.volume_profile',
+    'VolumeProfileStream': '.volume_profile',
+}
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 __all__ = [
+    'CandleStore',
+    'CandleWindow',
     'TechnicalAnalyzer',
     'BestLevelFinder',
     'LevelDiscovery',
     'LevelScoring',
+    'LevelEngine',
+    'LevelFeatureCache',
     'MarketRegimeDetector',
     'BreakoutDetector',
     'PatternDetector',
+    'StreamingAnalyzer',
+    'IndicatorSeries',
+    'ExtremaTracker',
+    'ExtremaStream',
+    'VolumeProfile',
+    'VolumeProfileStream',
 ]
-
-
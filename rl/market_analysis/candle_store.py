@@ -0,0 +1,238 @@
+"""
+列式K线存储（按周期的定长环形缓冲）
+
+- 每个周期一块 (6, 2 * capacity) 的 float64 数组，每根K线同时写入 p 和 p + capacity 两处，
+  因此任意不超过 capacity 的最近窗口都是一段连续内存，window() 返回零拷贝视图
+- 时间戳统一为秒（毫秒时间戳自动换算），按时间二分查找，O(log n)
+- 未收盘K线原地更新（upsert）；收到更早的K线时按时间定位覆盖
+
+视图的有效期：窗口长度为 n 时，缓冲再推进 capacity - n 根K线之前视图内容不变；
+最新一根（未收盘）K线会被 upsert 原地修改。需要长期持有时调用 CandleWindow.copy()。
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+FIELDS = ("time", "open", "high", "low", "close", "volume")
+_ROW = {name: i for i, name in enumerate(FIELDS)}
+
+DEFAULT_CAPACITY = {"1m": 1440, "15m": 672, "8h": 500, "1w": 200}
+
+# 小于该值视为秒，否则视为毫秒（1e11 秒在 5138 年，1e11 毫秒在 1973 年）
+_MS_THRESHOLD = 1e11
+
+
+def normalize_ts(ts: Union[int, float]) -> int:
+    """时间戳统一为秒"""
+    ts = int(ts or 0)
+    return ts // 1000 if ts >= _MS_THRESHOLD else ts
+
+
+class CandleWindow(Sequence):
+    """
+    K线窗口：底层为列式数组视图，同时兼容 List[Dict] 的用法
+    （len / 下标 / 切片 / 迭代）。逐根字典只在首次按行访问时生成一次。
+    """
+
+    __slots__ = ("_data", "_rows")
+
+    def __init__(self, data: np.ndarray, rows: Optional[List[Dict]] = None):
+        self._data = data
+        self._rows = rows
+
+    # ========== 列式访问 ==========
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {name: self._data[i] for i, name in enumerate(FIELDS)}
+
+    def column(self, name: str) -> np.ndarray:
+        return self._data[_ROW[name]]
+
+    def copy(self) -> "CandleWindow":
+        return CandleWindow(self._data.copy(), self._rows)
+
+    def columns_array(self) -> np.ndarray:
+        """(6, n) 列式数组（FIELDS 顺序）"""
+        return self._data
+
+    def index_of(self, ts: Union[int, float]) -> Optional[int]:
+        """时间最接近 ts 的K线下标（相同距离取较早的一根）"""
+        n = len(self)
+        if n == 0:
+            return None
+        times = self._data[_ROW["time"]]
+        ts = normalize_ts(ts)
+        pos = int(np.searchsorted(times, ts, side="left"))
+        if pos <= 0:
+            return 0
+        if pos >= n:
+            return n - 1
+        return pos - 1 if ts - times[pos - 1] <= times[pos] - ts else pos
+
+    # ========== List[Dict] 兼容 ==========
+    def to_list(self) -> List[Dict]:
+        if self._rows is None:
+            cols = self._data.tolist()
+            times = [int(t) for t in cols[0]]
+            self._rows = [
+                {"time": t, "open": o, "high": h, "low": l, "close": c, "volume": v}
+                for t, o, h, l, c, v in zip(times, *cols[1:])
+            ]
+        return self._rows
+
+    def __len__(self) -> int:
+        return self._data.shape[1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self.to_list()[index]
+            rows = self._rows[start:stop] if self._rows is not None else None
+            return CandleWindow(self._data[:, start:stop], rows)
+        return self.to_list()[index]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_list())
+
+    def __repr__(self) -> str:
+        return f"CandleWindow(len={len(self)})"
+
+
+class CandleBuffer:
+    """单个周期的定长环形缓冲"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._data = np.zeros((len(FIELDS), 2 * capacity), dtype=np.float64)
+        self._head = 0  # 下一根K线的物理位置
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if not self._count:
+            return None
+        return int(self._data[0, (self._head - 1) % self.capacity])
+
+    def clear(self) -> None:
+        self._head = 0
+        self._count = 0
+
+    def window(self, n: Optional[int] = None) -> CandleWindow:
+        """最近 n 根（默认全部）的零拷贝视图"""
+        n = self._count if n is None else max(0, min(n, self._count))
+        end = self._head + self.capacity
+        return CandleWindow(self._data[:, end - n:end])
+
+    def upsert(self, candle: Dict) -> bool:
+        """追加新K线或覆盖同一时间的K线，返回是否写入"""
+        ts = normalize_ts(candle.get("time"))
+        last = self.last_time
+        if last is None or ts > last:
+            self._write(self._head, ts, candle)
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            return True
+        if ts == last:
+            self._write((self._head - 1) % self.capacity, ts, candle)
+            return True
+        # 更早的K线：只覆盖已存在的时间点，不插入
+        times = self.window().column("time")
+        pos = int(np.searchsorted(times, ts))
+        if pos < len(times) and times[pos] == ts:
+            offset = len(times) - pos
+            self._write((self._head - offset) % self.capacity, ts, candle)
+            return True
+        return False
+
+    def update(self, klines: Sequence[Dict]) -> int:
+        """批量写入一次拉取的K线；只处理不早于当前最后一根的部分，返回写入根数"""
+        if not klines:
+            return 0
+        last = self.last_time
+        if last is not None and normalize_ts(klines[-1].get("time")) < last:
+            # 时间回退（回放重启等），旧数据作废
+            self.clear()
+            last = None
+        start = len(klines)
+        if last is None:
+            start = max(0, len(klines) - self.capacity)
+        else:
+            while start > 0 and normalize_ts(klines[start - 1].get("time")) >= last:
+                start -= 1
+        written = 0
+        for candle in klines[start:]:
+            written += self.upsert(candle)
+        return written
+
+    def _write(self, pos: int, ts: int, candle: Dict) -> None:
+        values = (
+            ts,
+            candle.get("open", 0),
+            candle.get("high", 0),
+            candle.get("low", 0),
+            candle.get("close", 0),
+            candle.get("volume", 0),
+        )
+        self._data[:, pos] = values
+        self._data[:, pos + self.capacity] = values
+
+
+class CandleStore:
+    """多周期K线存储：store.ingest("1m", klines) 写入并返回同长度的窗口视图"""
+
+    def __init__(self, capacities: Optional[Dict[str, int]] = None):
+        self.capacities = dict(DEFAULT_CAPACITY)
+        if capacities:
+            self.capacities.update(capacities)
+        self._buffers: Dict[str, CandleBuffer] = {}
+
+    def buffer(self, tf: str) -> CandleBuffer:
+        buf = self._buffers.get(tf)
+        if buf is None:
+            buf = CandleBuffer(self.capacities.get(tf, 500))
+            self._buffers[tf] = buf
+        return buf
+
+    def update(self, tf: str, klines: Sequence[Dict]) -> int:
+        return self.buffer(tf).update(klines)
+
+    def upsert(self, tf: str, candle: Dict) -> bool:
+        return self.buffer(tf).upsert(candle)
+
+    def ingest(self, tf: str, klines: Sequence[Dict]) -> CandleWindow:
+        """写入本次拉取的K线，返回与输入等长的最近窗口"""
+        if isinstance(klines, CandleWindow):
+            return klines
+        buf = self.buffer(tf)
+        buf.update(klines or [])
+        return buf.window(len(klines or []))
+
+    def window(self, tf: str, n: Optional[int] = None) -> CandleWindow:
+        return self.buffer(tf).window(n)
+
+    def index_of(self, tf: str, ts: Union[int, float]) -> Optional[int]:
+        return self.window(tf).index_of(ts)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            tf: {"count": len(buf), "capacity": buf.capacity, "last_time": buf.last_time}
+            for tf, buf in self._buffers.items()
+        }
+
+    def dump(self) -> Dict[str, np.ndarray]:
+        """各周期全部K线的 (6, n) 副本（按时间升序），用于热启动快照"""
+        return {tf: buf.window().copy().columns_array() for tf, buf in self._buffers.items() if len(buf)}
+
+    def load(self, tf: str, data: Sequence[Sequence[float]]) -> int:
+        """从 dump() 的列式数据恢复一个周期（与现有数据按时间合并），返回写入根数"""
+        cols = np.asarray(data, dtype=np.float64)
+        if cols.ndim != 2 or cols.shape[0] != len(FIELDS) or not cols.shape[1]:
+            return 0
+        rows = CandleWindow(cols).to_list()
+        return self.buffer(tf).update(rows)
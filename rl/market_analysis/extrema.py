@@ -0,0 +1,215 @@
+"""
+局部极值（摆动点 / 分形点）引擎
+
+LevelDiscovery 原来对每根K线切左右窗口、在字典上 all() 比较，每个周期每个 tick O(n·w) 的 Python 循环。
+这里统一成两种实现，结果与原逻辑一致：
+
+- 批量：find_extrema 用 NumPy 滑动窗口（sliding_window_view）一次求出整段数组的左右窗口最值
+- 增量：ExtremaTracker 用单调队列维护最近 w 根的最值，逐根追加已收盘K线，摊还 O(1)；
+  ExtremaStream 把它和按时间同步的窗口（末根可能未收盘）对接，只有末根参与的那个中心点单独 O(w) 检查
+
+定义（w 为单侧窗口）：第 i 根（w <= i < n - w）
+- 摆动高点：high[i] >= 左右各 w 根的 high（strict=False）；低点同理取 <=
+- 分形高点：high[i] > 左右各 w 根的 high（strict=True）；低点同理取 <
+"""
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .candle_store import CandleWindow
+
+
+# ========== 批量 ==========
+def find_extrema(
+    high: Sequence[float], low: Sequence[float], window: int, strict: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """返回 (高点下标, 低点下标)，均为升序"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    w = window
+    if w <= 0 or n < 2 * w + 1:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    # win_max[j] = max(high[j:j + w])；第 i 根的左窗口为 win_max[i - w]，右窗口为 win_max[i + 1]
+    win_max = sliding_window_view(high, w).max(axis=1)
+    win_min = sliding_window_view(low, w).min(axis=1)
+    center = slice(w, n - w)
+    h, l = high[center], low[center]
+    left_max, right_max = win_max[: n - 2 * w], win_max[w + 1:]
+    left_min, right_min = win_min[: n - 2 * w], win_min[w + 1:]
+    if strict:
+        is_high = (h > left_max) & (h > right_max)
+        is_low = (l < left_min) & (l < right_min)
+    else:
+        is_high = (h >= left_max) & (h >= right_max)
+        is_low = (l <= left_min) & (l <= right_min)
+    return np.flatnonzero(is_high) + w, np.flatnonzero(is_low) + w
+
+
+def _columns(klines: Sequence[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(klines, CandleWindow):
+        return klines.column("high"), klines.column("low")
+    return (
+        np.fromiter((k["high"] for k in klines), dtype=np.float64, count=len(klines)),
+        np.fromiter((k["low"] for k in klines), dtype=np.float64, count=len(klines)),
+    )
+
+
+def extrema_levels(klines: Sequence[Dict], window: int, strict: bool = False) -> List[float]:
+    """整段K线的极值价格（去重）"""
+    high, low = _columns(klines)
+    hi, lo = find_extrema(high, low, window, strict)
+    return list(set(high[hi].tolist()) | set(low[lo].tolist()))
+
+
+def _is_extreme(high: Sequence[float], low: Sequence[float], i: int, w: int, strict: bool) -> Tuple[bool, bool]:
+    """单个中心点的直接检查（O(w)）"""
+    h, l = high[i], low[i]
+    others_high = [high[j] for j in range(i - w, i + w + 1) if j != i]
+    others_low = [low[j] for j in range(i - w, i + w + 1) if j != i]
+    if strict:
+        return h > max(others_high), l < min(others_low)
+    return h >= max(others_high), l <= min(others_low)
+
+
+# ========== 增量 ==========
+class ExtremaTracker:
+    """
+    逐根追加已收盘K线；第 t 根追加后确认中心点 c = t - w（右窗口已齐）
+    points 中为已确认的 (绝对下标, 价格)，按下标升序
+    """
+
+    def __init__(self, window: int, strict: bool = False):
+        self.window = window
+        self.strict = strict
+        self.reset()
+
+    def reset(self) -> None:
+        w = self.window
+        self.count = 0
+        self._max: deque = deque()  # (下标, high)，high 单调递减
+        self._min: deque = deque()  # (下标, low)，low 单调递增
+        self._win_max: deque = deque(maxlen=w + 2)  # 以每根结尾的 w 根最大值
+        self._win_min: deque = deque(maxlen=w + 2)
+        self._high: deque = deque(maxlen=w + 1)
+        self._low: deque = deque(maxlen=w + 1)
+        self.points: deque = deque()
+        self.pruned_before = 0
+
+    def append(self, high: float, low: float) -> None:
+        w = self.window
+        t = self.count
+        q = self._max
+        while q and q[-1][1] <= high:
+            q.pop()
+        q.append((t, high))
+        if q[0][0] <= t - w:
+            q.popleft()
+        q = self._min
+        while q and q[-1][1] >= low:
+            q.pop()
+        q.append((t, low))
+        if q[0][0] <= t - w:
+            q.popleft()
+        self._win_max.append(self._max[0][1])
+        self._win_min.append(self._min[0][1])
+        self._high.append(high)
+        self._low.append(low)
+        self.count = t + 1
+
+        c = t - w
+        if c < w:
+            return
+        h, l = self._high[0], self._low[0]
+        left_max, right_max = self._win_max[0], self._win_max[-1]
+        left_min, right_min = self._win_min[0], self._win_min[-1]
+        if self.strict:
+            if h > left_max and h > right_max:
+                self.points.append((c, h))
+            if l < left_min and l < right_min:
+                self.points.append((c, l))
+        else:
+            if h >= left_max and h >= right_max:
+                self.points.append((c, h))
+            if l <= left_min and l <= right_min:
+                self.points.append((c, l))
+
+    def extend(self, highs: Sequence[float], lows: Sequence[float]) -> None:
+        for high, low in zip(highs, lows):
+            self.append(high, low)
+
+    def prune(self, before: int) -> None:
+        """丢弃下标 < before 的已确认点（窗口只会向前移动）"""
+        points = self.points
+        while points and points[0][0] < before:
+            points.popleft()
+        self.pruned_before = max(self.pruned_before, before)
+
+    def prices_between(self, lo: int, hi: int) -> List[float]:
+        return [price for index, price in self.points if lo <= index <= hi]
+
+
+class ExtremaStream:
+    """
+    同一序列（某个周期）连续多次传入的K线窗口 -> 极值价格，与 extrema_levels(window) 结果一致
+    窗口末根可能未收盘，只把前 n - 1 根追加进 tracker；按时间戳对齐，对不上时整体重建
+    """
+
+    def __init__(self, window: int, strict: bool = False):
+        self.tracker = ExtremaTracker(window, strict)
+        self.last_time = None
+        self.rebuilds = 0
+
+    def levels(self, klines: Sequence[Dict]) -> List[float]:
+        w = self.tracker.window
+        n = len(klines)
+        if n < 2 * w + 1:
+            return extrema_levels(klines, w, self.tracker.strict)
+        if isinstance(klines, CandleWindow):
+            times = klines.column("time")
+        else:
+            times = [k.get("time") for k in klines]
+        high, low = _columns(klines)
+        if times[0] is None:
+            return extrema_levels(klines, w, self.tracker.strict)
+
+        stable = n - 1
+        self._sync(times, high, low, stable)
+        tracker = self.tracker
+        start = tracker.count - stable  # 窗口第 0 根的绝对下标
+        if start < tracker.pruned_before:
+            self._rebuild(times, high, low, stable)
+            start = 0
+        tracker.prune(start)
+        prices = set(tracker.prices_between(start + w, start + stable - 1 - w))
+        # 末根（可能未收盘）作为右窗口参与的中心点
+        is_high, is_low = _is_extreme(high, low, n - 1 - w, w, tracker.strict)
+        if is_high:
+            prices.add(float(high[n - 1 - w]))
+        if is_low:
+            prices.add(float(low[n - 1 - w]))
+        return list(prices)
+
+    def _sync(self, times, high: np.ndarray, low: np.ndarray, stable: int) -> None:
+        if self.last_time is None:
+            self._rebuild(times, high, low, stable)
+            return
+        # 已追加的最后一根在本窗口中的位置（新K线通常只有 0 或 1 根）
+        pos = stable - 1
+        while pos >= 0 and times[pos] > self.last_time:
+            pos -= 1
+        if pos < 0 or times[pos] != self.last_time:
+            self._rebuild(times, high, low, stable)
+            return
+        if pos + 1 < stable:
+            self.tracker.extend(high[pos + 1:stable].tolist(), low[pos + 1:stable].tolist())
+            self.last_time = times[stable - 1]
+
+    def _rebuild(self, times, high: np.ndarray, low: np.ndarray, stable: int) -> None:
+        self.tracker.reset()
+        self.tracker.extend(high[:stable].tolist(), low[:stable].tolist())
+        self.last_time = times[stable - 1]
+        self.rebuilds += 1
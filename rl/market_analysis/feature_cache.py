@@ -0,0 +1,144 @@
+"""
+逐级特征 LRU 缓存
+
+8h / 1w 上发现的关键位几个小时都不变，但每 10 秒都要对整段K线重算一次触及、反弹、成交量特征。
+特征只取决于 (关键位, 周期, 最后一根收盘K线, 容差)，以此为键缓存：
+
+- 键：(round(level, digits), tf, 最后收盘K线时间戳, tolerance)；出现新的收盘K线后键自然变化，旧条目随 LRU 淘汰
+- 容量有上限（max_size 条），超出时淘汰最久未用的条目，不再整表清空
+- 按周期统计命中 / 未命中，另计淘汰条数，stats() 给出命中率，用于调整容量
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..monitoring.metrics import registry as metrics_registry
+
+FeatureRow = Dict[str, float]
+
+
+class LevelFeatureCache:
+    """
+    cache = LevelFeatureCache(max_size=4096)
+    feats = cache.lookup(levels, "8h", closed_ts, 0.005, lambda missing: engine.tf_features(missing, cols))
+    """
+
+    def __init__(self, max_size: int = 4096, digits: int = 6, metrics=None):
+        self.max_size = max(1, int(max_size))
+        self.digits = digits
+        self.metrics = metrics or metrics_registry
+        self.metrics.counter(
+            "level_feature_cache_total",
+            "Per-level feature cache lookups",
+            ("tf", "result"),
+        )
+        self._entries: "OrderedDict[Tuple, FeatureRow]" = OrderedDict()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.evicted = 0
+
+    def key(self, level: float, tf: str, closed_ts: Hashable, tolerance: float) -> Tuple:
+        return (round(float(level), self.digits), tf, closed_ts, tolerance)
+
+    # ========== 单条 ==========
+    def get(self, level: float, tf: str, closed_ts: Hashable, tolerance: float) -> Optional[FeatureRow]:
+        key = self.key(level, tf, closed_ts, tolerance)
+        row = self._entries.get(key)
+        if row is None:
+            self._count(tf, "miss")
+            return None
+        self._entries.move_to_end(key)
+        self._count(tf, "hit")
+        return row
+
+    def put(self, level: float, tf: str, closed_ts: Hashable, tolerance: float, row: FeatureRow) -> None:
+        key = self.key(level, tf, closed_ts, tolerance)
+        self._entries[key] = row
+        self._entries.move_to_end(key)
+        self._evict()
+
+    # ========== 批量 ==========
+    def lookup(
+        self,
+        levels: Sequence[float],
+        tf: str,
+        closed_ts: Hashable,
+        tolerance: float,
+        compute: Callable[[np.ndarray], Dict[str, np.ndarray]],
+    ) -> Dict[str, np.ndarray]:
+        """
+        返回 {特征名: shape (L,)}，顺序与 levels 一致
+        命中的直接取；未命中的（去重后）一次调用 compute 向量化补算并写入缓存
+        """
+        entries = self._entries
+        keys = [self.key(level, tf, closed_ts, tolerance) for level in levels]
+        rows: List[Optional[FeatureRow]] = []
+        missing: Dict[Tuple, float] = {}
+        for key, level in zip(keys, levels):
+            row = entries.get(key)
+            if row is not None:
+                entries.move_to_end(key)
+            elif key not in missing:
+                missing[key] = level
+            rows.append(row)
+        hits = len(keys) - sum(1 for row in rows if row is None)
+        self._count(tf, "hit", hits)
+        self._count(tf, "miss", len(keys) - hits)
+
+        if missing:
+            feats = compute(np.array(list(missing.values()), dtype=np.float64))
+            computed = {}
+            for i, key in enumerate(missing):
+                row = {name: values[i] for name, values in feats.items()}
+                computed[key] = row
+                entries[key] = row
+            rows = [row if row is not None else computed[key] for key, row in zip(keys, rows)]
+            self._evict()
+
+        if not rows:
+            return {}
+        return {name: np.array([row[name] for row in rows]) for name in rows[0]}
+
+    # ========== 统计 ==========
+    def stats(self) -> Dict:
+        by_tf = {}
+        hits = misses = 0
+        for tf, counts in self._counts.items():
+            total = counts["hit"] + counts["miss"]
+            by_tf[tf] = {**counts, "hit_rate": round(counts["hit"] / total, 4) if total else 0.0}
+            hits += counts["hit"]
+            misses += counts["miss"]
+        total = hits + misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit": hits,
+            "miss": misses,
+            "evicted": self.evicted,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "by_tf": by_tf,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ========== 内部 ==========
+    def _count(self, tf: str, result: str, amount: int = 1) -> None:
+        if amount <= 0:
+            return
+        counts = self._counts.get(tf)
+        if counts is None:
+            counts = self._counts[tf] = {"hit": 0, "miss": 0}
+        counts[result] += amount
+        self.metrics.inc("level_feature_cache_total", amount, tf=tf, result=result)
+
+    def _evict(self) -> None:
+        overflow = len(self._entries) - self.max_size
+        if overflow <= 0:
+            return
+        for _ in range(overflow):
+            self._entries.popitem(last=False)
+        self.evicted += overflow
@@ -1,4 +1,6 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from .streaming import StreamingAnalyzer
 
 
 def ema(values: List[float], period: int) -> List[float]:
@@ -55,9 +57,22 @@ def atr(klines: List[Dict], period: int = 14) -> float:
 
 
 class TechnicalAnalyzer:
-    def analyze(self, klines: List[Dict]) -> Dict:
+    def __init__(self):
+        self.streams: Dict[str, StreamingAnalyzer] = {}
+
+    def analyze(self, klines: List[Dict], stream: Optional[str] = None, anchored: bool = False) -> Dict:
+        """
+        stream：同一序列（如某个周期）的名字。给出时用该序列的增量指标状态，
+        只有最后一根K线变化时 O(1) 更新，结果与批量计算一致
+        anchored：klines 为该周期的累积缓冲（起点只会后移），见 StreamingAnalyzer
+        """
         if not klines:
             return {}
+        if stream is not None:
+            analyzer = self.streams.get(stream)
+            if analyzer is None:
+                analyzer = self.streams[stream] = StreamingAnalyzer(stream, anchored=anchored)
+            return analyzer.analyze(klines)
         closes = [k["close"] for k in klines]
         volumes = [k.get("volume", 0) for k in klines]
 
@@ -0,0 +1,153 @@
+"""
+向量化支撑阻力特征引擎（NumPy）
+
+一次广播计算所有候选位 × 所有K线的特征，语义与 LevelFeatureCalculator.calculate /
+multi_tf_confirm 一致（逐根循环版本保留作参考实现）：
+- 触及：|close - level| / level <= tolerance（从第 2 根K线开始计数）
+- 假突破：触及时收盘价相对上一根收盘价穿越 level
+- 反弹：触及后下一根收盘价距 level 的幅度，超过 tolerance 记一次反弹
+- 持续时间：首次与最后一次触及的时间差
+- 多周期确认：任一K线（含第 1 根）触及即计入该周期权重
+
+求和顺序与逐根循环不同，结果只在浮点误差范围内一致。
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .candle_store import CandleWindow
+from .level_finder import DEFAULT_WEIGHTS
+
+KLINE_FEATURES = (
+    "volume_density",
+    "touch_bounce_count",
+    "bounce_magnitude",
+    "failed_breakout_count",
+    "duration_days",
+)
+
+
+def candle_columns(klines: List[Dict]) -> Dict[str, np.ndarray]:
+    """K线列表 -> 列式数组（close / volume / time）；CandleWindow 直接返回视图"""
+    if isinstance(klines, CandleWindow):
+        return {name: klines.column(name) for name in ("close", "volume", "time")}
+    n = len(klines)
+    close = np.fromiter((k["close"] for k in klines), dtype=np.float64, count=n)
+    volume = np.fromiter((k.get("volume", 0) for k in klines), dtype=np.float64, count=n)
+    times = np.fromiter((k.get("time") or 0 for k in klines), dtype=np.float64, count=n)
+    return {"close": close, "volume": volume, "time": times}
+
+
+class LevelEngine:
+    def __init__(self, tolerance_pct: float = 0.005):
+        self.tolerance_pct = tolerance_pct
+
+    def tf_features(self, levels: np.ndarray, cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """单个周期：返回 {特征名: shape (L,)}，另含 touched（多周期确认用）"""
+        levels = np.asarray(levels, dtype=np.float64)
+        count = len(levels)
+        close = cols["close"]
+        n = len(close)
+        out = {name: np.zeros(count) for name in KLINE_FEATURES}
+        out["touched"] = np.zeros(count, dtype=bool)
+        if n == 0 or count == 0:
+            return out
+
+        tol = self.tolerance_pct
+        lv = levels[:, None]
+        near = np.abs(close[None, :] - lv) / lv <= tol  # (L, n)
+        out["touched"] = near.any(axis=1)
+        if n < 2:
+            return out
+
+        near_i = near[:, 1:]
+        touches = near_i.sum(axis=1)
+        has_touch = touches > 0
+
+        # 成交量密度：触及K线平均成交量 / 全部K线最大成交量
+        max_volume = cols["volume"].max()
+        vol_sum = near_i @ cols["volume"][1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            density = np.where(
+                has_touch & (max_volume > 0),
+                vol_sum / np.maximum(touches, 1) / (max_volume if max_volume > 0 else 1.0),
+                0.0,
+            )
+
+        # 假突破：当前收盘与上一根收盘分居 level 两侧
+        cur = close[None, 1:]
+        prev = close[None, :-1]
+        crossed = ((cur > lv) & (prev < lv)) | ((cur < lv) & (prev > lv))
+        failed = (near_i & crossed).sum(axis=1)
+
+        # 反弹：第 i 根触及（i+1 < n）时看第 i+1 根收盘
+        if n >= 3:
+            mask = near[:, 1:n - 1]
+            bounce = np.abs(close[None, 2:] - lv) / lv
+            bounce_sum = np.where(mask, bounce, 0.0).sum(axis=1)
+            bounces = (mask & (bounce > tol)).sum(axis=1)
+        else:
+            bounce_sum = np.zeros(count)
+            bounces = np.zeros(count, dtype=np.int64)
+
+        # 持续时间：首次/最后一次触及（时间为 0 视为缺失）
+        times = cols["time"][1:]
+        first_idx = near_i.argmax(axis=1)
+        last_idx = near_i.shape[1] - 1 - near_i[:, ::-1].argmax(axis=1)
+        first_ts = times[first_idx]
+        last_ts = times[last_idx]
+        valid = has_touch & (first_ts != 0) & (last_ts != 0) & (last_ts > first_ts)
+        duration = np.where(valid, (last_ts - first_ts) / 86400.0, 0.0)
+
+        out["volume_density"] = np.minimum(density, 1.0)
+        out["touch_bounce_count"] = np.minimum((touches + bounces) / 10, 1.0)
+        out["bounce_magnitude"] = np.minimum(bounce_sum / np.maximum(1, bounces), 1.0)
+        out["failed_breakout_count"] = np.minimum(failed / 5, 1.0)
+        out["duration_days"] = np.minimum(duration / 7, 1.0)
+        return out
+
+    def score_levels(
+        self,
+        levels: Sequence[float],
+        columns_by_tf: Dict[str, Dict[str, np.ndarray]],
+        tf_weights: Dict[str, float],
+        weights: Dict[str, float],
+        extra_features: Optional[List[Dict[str, float]]] = None,
+        precomputed: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+    ) -> List[Dict]:
+        """
+        所有候选位一次打分，返回与 LevelScoring.score_multi_tf 相同结构的列表
+        precomputed: {tf: tf_features 的结果}，用于复用高周期缓存
+        """
+        levels = np.asarray(levels, dtype=np.float64)
+        count = len(levels)
+        if count == 0:
+            return []
+
+        combined = {name: np.zeros(count) for name in DEFAULT_WEIGHTS}
+        confirm = np.zeros(count)
+        for tf, cols in columns_by_tf.items():
+            if precomputed and tf in precomputed:
+                feats = precomputed[tf]
+            else:
+                feats = self.tf_features(levels, cols)
+            w = tf_weights.get(tf, 0)
+            for name in KLINE_FEATURES:
+                combined[name] = combined[name] + feats[name] * w
+            if len(cols["close"]):
+                confirm = confirm + np.where(feats["touched"], w, 0.0)
+        total_w = sum(tf_weights.values()) or 1.0
+        combined["multi_tf_confirm"] = np.minimum(confirm / total_w, 1.0)
+
+        names = list(combined)
+        matrix = np.column_stack([combined[name] for name in names])
+        results = []
+        for i in range(count):
+            features = {name: float(matrix[i, j]) for j, name in enumerate(names)}
+            if extra_features and extra_features[i]:
+                features.update(extra_features[i])
+            score = 0.0
+            for k, w in weights.items():
+                score += float(features.get(k, 0)) * w
+            results.append({"score": score * 100, "features": features})
+        return results
@@ -39,13 +39,25 @@ class LevelFeatureCalculator:
     def _near(self, price: float, level: float) -> bool:
         return abs(price - level) / level <= self.tolerance_pct
 
-    def multi_tf_confirm(self, level: float, klines_by_tf: Dict[str, List[Dict]], tf_weights: Dict[str, float]) -> float:
+    def touched(self, level: float, klines: List[Dict]) -> bool:
+        return any(self._near(k["close"], level) for k in klines)
+
+    def multi_tf_confirm(
+        self,
+        level: float,
+        klines_by_tf: Dict[str, List[Dict]],
+        tf_weights: Dict[str, float],
+        touched_by_tf: Dict[str, bool] = None,
+    ) -> float:
         total_w = sum(tf_weights.values()) or 1.0
         score = 0.0
         for tf, klines in klines_by_tf.items():
             if not klines:
                 continue
-            touched = any(self._near(k["close"], level) for k in klines)
+            if touched_by_tf and tf in touched_by_tf:
+                touched = touched_by_tf[tf]
+            else:
+                touched = self.touched(level, klines)
             if touched:
                 score += tf_weights.get(tf, 0)
         return min(score / total_w, 1.0)
@@ -1,13 +1,27 @@
 import json
 import os
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
+from .extrema import ExtremaStream, extrema_levels
+from .level_engine import LevelEngine, candle_columns
 from .level_finder import LevelFeatureCalculator, DEFAULT_WEIGHTS
+from .volume_profile import DEFAULT_BIN_PCT, VolumeProfile, VolumeProfileStream, bin_size_for
 
 
 class LevelDiscovery:
-    def __init__(self, buckets: List[int] = None):
+    def __init__(
+        self,
+        buckets: List[int] = None,
+        profile_bin_pct: float = DEFAULT_BIN_PCT,
+        profile_atr_mult: float = None,
+    ):
         self.buckets = buckets or [50, 100, 250, 500, 1000]
+        # 按序列名（周期）保存的增量极值状态：{stream: {"swing": ExtremaStream, "fractal": ExtremaStream}}
+        self.extrema_streams: Dict[str, Dict[str, ExtremaStream]] = {}
+        # 成交量分布分箱：价格的 profile_bin_pct，或给出 profile_atr_mult 时按 ATR 倍数
+        self.profile_bin_pct = profile_bin_pct
+        self.profile_atr_mult = profile_atr_mult
+        self.profile_streams: Dict[str, VolumeProfileStream] = {}
 
     def _round_level(self, price: float, bucket: int) -> float:
         return round(price / bucket) * bucket
@@ -19,64 +33,60 @@ class LevelDiscovery:
                 levels.add(self._round_level(price, bucket))
         return list(levels)
 
-    def _swing_levels(self, klines: List[Dict], window: int = 5) -> List[float]:
-        # 增大窗口到5根K线，更准确识别局部高低点
-        levels = set()
-        for i in range(window, len(klines) - window):
-            high = klines[i]["high"]
-            low = klines[i]["low"]
-            left = klines[i - window:i]
-            right = klines[i + 1:i + 1 + window]
-            if all(high >= k["high"] for k in left) and all(
-                high >= k["high"] for k in right
-            ):
-                levels.add(high)
-            if all(low <= k["low"] for k in left) and all(
-                low <= k["low"] for k in right
-            ):
-                levels.add(low)
-        return list(levels)
+    def _extrema_stream(self, stream: str, kind: str, window: int, strict: bool) -> ExtremaStream:
+        streams = self.extrema_streams.setdefault(stream, {})
+        extrema = streams.get(kind)
+        if extrema is None or extrema.tracker.window != window:
+            extrema = streams[kind] = ExtremaStream(window, strict)
+        return extrema
 
-    def _fractal_levels(self, klines: List[Dict], window: int = 3) -> List[float]:
-        # 分形高低点识别（更严格的高低点）
-        levels = set()
-        for i in range(window, len(klines) - window):
-            high = klines[i]["high"]
-            low = klines[i]["low"]
-            left = klines[i - window:i]
-            right = klines[i + 1:i + 1 + window]
-            # 分形高点：中间K线的high严格高于左右所有K线的high
-            if all(high > k["high"] for k in left) and all(high > k["high"] for k in right):
-                levels.add(high)
-            # 分形低点
-            if all(low < k["low"] for k in left) and all(low < k["low"] for k in right):
-                levels.add(low)
-        return list(levels)
+    def _swing_levels(self, klines: List[Dict], window: int = 5, stream: str = None) -> List[float]:
+        # 增大窗口到5根K线，更准确识别局部高低点（高点 >= 左右各 window 根）
+        if stream is not None:
+            return self._extrema_stream(stream, "swing", window, False).levels(klines)
+        return extrema_levels(klines, window, strict=False)
+
+    def _fractal_levels(self, klines: List[Dict], window: int = 3, stream: str = None) -> List[float]:
+        # 分形高低点识别（更严格的高低点：中间K线的high严格高于左右所有K线的high）
+        if stream is not None:
+            return self._extrema_stream(stream, "fractal", window, True).levels(klines)
+        return extrema_levels(klines, window, strict=True)
 
-    def _consolidation_levels(self, klines: List[Dict], min_touches: int = 3) -> List[float]:
-        # 识别价格盘整区域（多次触及的价格）
-        # 使用$100精度，过滤微小波动噪音
+    def _volume_profile(
+        self, klines: List[Dict], stream: str = None, atr: float = None, price: float = None
+    ) -> VolumeProfile:
+        """
+        盘整区和成交量密集区共用的价格分箱直方图；给出 stream 时逐 tick 增量维护
+        price：分箱参考价（各周期传同一个当前价，分箱网格一致），默认最后收盘价
+        """
+        if stream is not None:
+            profile_stream = self.profile_streams.get(stream)
+            if profile_stream is None:
+                profile_stream = self.profile_streams[stream] = VolumeProfileStream(
+                    self.profile_bin_pct, self.profile_atr_mult
+                )
+            return profile_stream.update(klines, atr, price)
+        bin_size = bin_size_for(price or klines[-1]["close"], atr, self.profile_bin_pct, self.profile_atr_mult)
+        return VolumeProfile.from_klines(klines, bin_size)
+
+    def _consolidation_levels(
+        self, klines: List[Dict], min_touches: int = 3, profile: VolumeProfile = None
+    ) -> List[float]:
+        # 识别价格盘整区域（最高 / 最低 / 收盘多次落入同一分箱）
+        # 分箱宽度相对价格（BTC 约 $100），过滤微小波动噪音
         if len(klines) < 20:
             return []
-        levels = set()
-        price_touches = {}
-        for k in klines:
-            for p in [k["high"], k["low"], k["close"]]:
-                rounded = round(p / 100) * 100  # $100 precision - 过滤噪音
-                price_touches[rounded] = price_touches.get(rounded, 0) + 1
-        for price, count in price_touches.items():
-            if count >= min_touches:
-                levels.add(price)
-        return list(levels)
+        profile = profile or self._volume_profile(klines)
+        return profile.touched(min_touches)
 
-    def _volume_profile_levels(self, klines: List[Dict], bucket: int = 100) -> List[float]:
-        # 成交量密集区（$100 精度）
-        buckets = {}
-        for k in klines:
-            price = self._round_level(k["close"], bucket)
-            buckets[price] = buckets.get(price, 0) + k.get("volume", 0)
-        top = sorted(buckets.items(), key=lambda x: x[1], reverse=True)[:8]
-        return [p for p, _ in top]
+    def _volume_profile_levels(
+        self, klines: List[Dict], top: int = 8, profile: VolumeProfile = None
+    ) -> List[float]:
+        # 成交量密集区（按收盘价分箱累计成交量，取前 top 个）
+        if not klines:
+            return []
+        profile = profile or self._volume_profile(klines)
+        return profile.top_nodes(top)
 
     def _recent_high_low(self, klines: List[Dict], lookback: int = 20) -> List[float]:
         # 最近N根K线的最高最低点
@@ -93,20 +103,35 @@ class LevelDiscovery:
         current_price: float = None,
         atr: float = None,
         max_distance_pct: float = None,
+        stream: str = None,
     ) -> Dict:
         if not klines:
             return {"support": [], "resistance": []}
+        current_price = current_price or klines[-1]["close"]
+        candidates = self.discover_candidates(klines, stream=stream, atr=atr, price=current_price)
+        return self.filter_candidates(candidates, current_price, atr, max_distance_pct)
+
+    def discover_candidates(
+        self, klines: List[Dict], stream: str = None, atr: float = None, price: float = None
+    ) -> List[float]:
+        """
+        候选位发现 + 合并（只依赖K线，可按周期缓存）
+        stream：序列名（周期），给出时摆动 / 分形点和成交量分布走增量引擎
+        atr：仅在按 ATR 分箱（profile_atr_mult）时使用；price：成交量分布的分箱参考价
+        """
+        if not klines:
+            return []
 
         prices = [k["close"] for k in klines]
-        current_price = current_price or prices[-1]
 
         candidates = set()
         # 多种方法发现候选位
         candidates.update(self._integer_levels(prices))
-        candidates.update(self._swing_levels(klines, window=5))
-        candidates.update(self._fractal_levels(klines, window=3))
-        candidates.update(self._consolidation_levels(klines, min_touches=3))
-        candidates.update(self._volume_profile_levels(klines))
+        candidates.update(self._swing_levels(klines, window=5, stream=stream))
+        candidates.update(self._fractal_levels(klines, window=3, stream=stream))
+        profile = self._volume_profile(klines, stream=stream, atr=atr, price=price)
+        candidates.update(self._consolidation_levels(klines, min_touches=3, profile=profile))
+        candidates.update(self._volume_profile_levels(klines, profile=profile))
         candidates.update(self._recent_high_low(klines, lookback=30))
 
         # ========== Level Merging: 合并相近能级 ==========
@@ -130,8 +155,16 @@ class LevelDiscovery:
             merged.append(sum(current_group) / len(current_group))
             return merged
         
-        candidates = merge_nearby(list(candidates), tolerance_pct=0.2)
+        return merge_nearby(list(candidates), tolerance_pct=0.2)
 
+    def filter_candidates(
+        self,
+        candidates: List[float],
+        current_price: float,
+        atr: float = None,
+        max_distance_pct: float = None,
+    ) -> Dict:
+        """按当前价格的动态距离带筛选候选位，并保证最小 S/R 间距"""
         # Dynamic band（扩大搜索范围，匹配止盈需求）
         if max_distance_pct is None:
             if atr and current_price > 0:
@@ -176,6 +209,7 @@ class LevelScoring:
         os.makedirs(os.path.dirname(path), exist_ok=True)
         self.weights = self._load_weights()
         self.feature_calc = LevelFeatureCalculator()
+        self.engine = LevelEngine(self.feature_calc.tolerance_pct)
 
     def _load_weights(self) -> Dict:
         if os.path.exists(self.path):
@@ -208,16 +242,22 @@ class LevelScoring:
         klines_by_tf: Dict[str, List[Dict]],
         tf_weights: Dict[str, float],
         extra_features: Dict[str, float] = None,
+        precomputed: Dict[str, Tuple[Dict, bool]] = None,
     ) -> Dict:
+        """precomputed: {tf: (features, touched)}，用于复用高周期的逐级特征"""
         combined = {}
+        touched_by_tf = {}
         for tf, kl in klines_by_tf.items():
-            features = self.feature_calc.calculate(level, kl)
+            if precomputed and tf in precomputed:
+                features, touched_by_tf[tf] = precomputed[tf]
+            else:
+                features = self.feature_calc.calculate(level, kl)
             w = tf_weights.get(tf, 0)
             for k, v in features.items():
                 combined[k] = combined.get(k, 0) + v * w
 
         combined["multi_tf_confirm"] = self.feature_calc.multi_tf_confirm(
-            level, klines_by_tf, tf_weights
+            level, klines_by_tf, tf_weights, touched_by_tf
         )
         if extra_features:
             for k, v in extra_features.items():
@@ -228,6 +268,28 @@ class LevelScoring:
             score += float(combined.get(k, 0)) * w
         return {"score": score * 100, "features": combined}
 
+    def score_levels(
+        self,
+        levels: List[float],
+        klines_by_tf: Dict[str, object],
+        tf_weights: Dict[str, float],
+        extra_features: List[Dict[str, float]] = None,
+        precomputed: Dict[str, Dict] = None,
+    ) -> List[Dict]:
+        """批量打分（向量化），klines_by_tf 可传K线列表或 candle_columns 结果"""
+        columns_by_tf = {
+            tf: kl if isinstance(kl, dict) else candle_columns(kl)
+            for tf, kl in klines_by_tf.items()
+        }
+        return self.engine.score_levels(
+            levels,
+            columns_by_tf,
+            tf_weights,
+            self.weights,
+            extra_features=extra_features,
+            precomputed=precomputed,
+        )
+
     def get_features(self, level: float, klines: List[Dict]) -> Dict:
         return self.feature_calc.calculate(level, klines)
 
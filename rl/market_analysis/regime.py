@@ -1,7 +1,22 @@
 """
 Market Regime Detection - Trend vs Ranging
 """
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .candle_store import CandleWindow
+
+
+def _tail_columns(klines: Sequence[Dict], n: int) -> Dict[str, np.ndarray]:
+    """最近 n 根K线的列；CandleWindow 直接取视图，列表才逐根转换"""
+    recent = klines[-n:]
+    if isinstance(recent, CandleWindow):
+        return recent.columns
+    return {
+        name: np.array([k[name] for k in recent], dtype=np.float64)
+        for name in ("open", "high", "low", "close")
+    }
 
 
 class MarketRegimeDetector:
@@ -198,22 +213,22 @@ class BreakoutDetector:
         if not klines or len(klines) < 5:
             return {"is_breakout": False, "is_confirmed": False}
 
-        current_price = klines[-1]["close"]
         tolerance = level * tolerance_pct
 
         # Check recent candles
-        recent = klines[-5:]
+        recent = _tail_columns(klines, 5)
+        close = recent["close"]
+        open_ = recent["open"]
         
         if level_type == "support":
             # Bearish breakout: price below support
-            below_count = sum(1 for k in recent if k["close"] < level - tolerance)
-            body_below = sum(1 for k in recent if k["open"] < level and k["close"] < level)
+            below_count = int((close < level - tolerance).sum())
+            body_below = int(((open_ < level) & (close < level)).sum())
             
             if below_count >= 2:
                 # Calculate strength
-                avg_distance = sum(
-                    (level - k["close"]) / level * 100
-                    for k in recent if k["close"] < level
+                avg_distance = float(
+                    ((level - close[close < level]) / level * 100).sum()
                 ) / max(1, below_count)
                 
                 return {
@@ -226,13 +241,12 @@ class BreakoutDetector:
                 }
         else:
             # Bullish breakout: price above resistance
-            above_count = sum(1 for k in recent if k["close"] > level + tolerance)
-            body_above = sum(1 for k in recent if k["open"] > level and k["close"] > level)
+            above_count = int((close > level + tolerance).sum())
+            body_above = int(((open_ > level) & (close > level)).sum())
             
             if above_count >= 2:
-                avg_distance = sum(
-                    (k["close"] - level) / level * 100
-                    for k in recent if k["close"] > level
+                avg_distance = float(
+                    ((close[close > level] - level) / level * 100).sum()
                 ) / max(1, above_count)
                 
                 return {
@@ -260,13 +274,13 @@ class BreakoutDetector:
         if not klines or len(klines) < lookback:
             return {"is_false_breakout": False}
 
-        recent = klines[-lookback:]
-        current_price = klines[-1]["close"]
+        recent = _tail_columns(klines, lookback)
+        current_price = float(recent["close"][-1])
         tolerance = level * 0.003
 
         if level_type == "support":
             # Check if price went below then came back above
-            went_below = any(k["low"] < level - tolerance for k in recent[:-3])
+            went_below = bool((recent["low"][:-3] < level - tolerance).any())
             now_above = current_price > level + tolerance
             
             if went_below and now_above:
@@ -278,7 +292,7 @@ class BreakoutDetector:
                 }
         else:
             # Check if price went above then came back below
-            went_above = any(k["high"] > level + tolerance for k in recent[:-3])
+            went_above = bool((recent["high"][:-3] > level + tolerance).any())
             now_below = current_price < level - tolerance
             
             if went_above and now_below:
@@ -0,0 +1,312 @@
+"""
+增量（流式）技术指标
+
+TechnicalAnalyzer.analyze 每次都从整段收盘价重算 EMA-7/25/99、MACD（三条 EMA）、RSI、ATR，
+而两次调用之间通常只有最后一根（未收盘）K线变了。这里的指标对象保存状态：
+
+- append(...)：新K线开始，上一根视为收盘，O(1)
+- revise(...)：更新未收盘K线，O(1)（EMA 保存上一根收盘时的值，RSI / ATR / 量比只保留定长窗口）
+- 结果与 indicators.py 中的批量函数逐位一致（相同的浮点运算顺序）
+
+EMA 的种子是序列第一个值，批量函数对传入的窗口从头算起。StreamingAnalyzer 按窗口首根K线的时间
+判断种子是否变化：窗口起点不变时（同一根K线内的多次 tick）增量更新；起点后移（定长拉取窗口滑动）
+时整体重建一次，保证与批量结果一致。
+
+anchored=True 用于喂 CandleStore 的整段缓冲：缓冲写满后起点随之后移，但只要末尾与已有状态衔接
+就继续增量更新（EMA 相当于从首次见到的K线起连续累积），不再重建。
+"""
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from ..monitoring.metrics import registry as metrics_registry
+from .candle_store import CandleWindow
+
+
+class StreamingEMA:
+    """与 ema(values, period)[-1] 一致"""
+
+    __slots__ = ("period", "k", "value", "_prev", "count")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.k = 2 / (period + 1)
+        self.value: Optional[float] = None
+        self._prev: Optional[float] = None  # 上一根收盘时的 EMA
+        self.count = 0
+
+    def _step(self, v: float) -> float:
+        if self._prev is None:
+            return v
+        k = self.k
+        return v * k + self._prev * (1 - k)
+
+    def append(self, v: float) -> float:
+        self._prev = self.value
+        self.value = self._step(v)
+        self.count += 1
+        return self.value
+
+    def revise(self, v: float) -> float:
+        if not self.count:
+            return self.append(v)
+        self.value = self._step(v)
+        return self.value
+
+
+class StreamingMACD:
+    """与 macd(values) 一致：快慢线 EMA-12/26，信号线为 MACD 线的 EMA-9"""
+
+    __slots__ = ("fast", "slow", "signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+
+    def append(self, v: float) -> None:
+        self.signal.append(self.fast.append(v) - self.slow.append(v))
+
+    def revise(self, v: float) -> None:
+        self.signal.revise(self.fast.revise(v) - self.slow.revise(v))
+
+    def result(self) -> Dict:
+        macd_val = self.fast.value - self.slow.value
+        signal = self.signal.value
+        return {"macd": macd_val, "signal": signal, "histogram": macd_val - signal}
+
+
+class StreamingRSI:
+    """与 rsi(values, period) 一致（最近 period 个涨跌幅的简单平均）"""
+
+    __slots__ = ("period", "_closes")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._closes: deque = deque(maxlen=period + 1)
+
+    def append(self, close: float) -> None:
+        self._closes.append(close)
+
+    def revise(self, close: float) -> None:
+        if self._closes:
+            self._closes[-1] = close
+        else:
+            self._closes.append(close)
+
+    @property
+    def value(self) -> float:
+        period = self.period
+        closes = self._closes
+        if len(closes) < period + 1:
+            return 50.0
+        gains = []
+        losses = []
+        for i in range(1, period + 1):
+            diff = closes[i] - closes[i - 1]
+            if diff >= 0:
+                gains.append(diff)
+            else:
+                losses.append(abs(diff))
+        avg_gain = sum(gains) / period if gains else 0
+        avg_loss = sum(losses) / period if losses else 0
+        if avg_loss == 0:
+            return 100.0
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+class StreamingATR:
+    """与 atr(klines, period) 一致（最近 period 个真实波幅的简单平均）"""
+
+    __slots__ = ("period", "_bars")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._bars: deque = deque(maxlen=period + 1)  # (high, low, close)
+
+    def append(self, high: float, low: float, close: float) -> None:
+        self._bars.append((high, low, close))
+
+    def revise(self, high: float, low: float, close: float) -> None:
+        if self._bars:
+            self._bars[-1] = (high, low, close)
+        else:
+            self._bars.append((high, low, close))
+
+    @property
+    def value(self) -> float:
+        period = self.period
+        bars = self._bars
+        if len(bars) < period + 1:
+            return 0.0
+        trs = []
+        for i in range(1, period + 1):
+            high, low, _ = bars[i]
+            prev_close = bars[i - 1][2]
+            trs.append(max(high - low, abs(high - prev_close), abs(low - prev_close)))
+        return sum(trs) / period if trs else 0.0
+
+
+class StreamingVolumeRatio:
+    """最新成交量 / 最近 window 根均量（不足 window 根时为 0）"""
+
+    __slots__ = ("window", "_volumes")
+
+    def __init__(self, window: int = 20):
+        self.window = window
+        self._volumes: deque = deque(maxlen=window)
+
+    def append(self, volume: float) -> None:
+        self._volumes.append(volume)
+
+    def revise(self, volume: float) -> None:
+        if self._volumes:
+            self._volumes[-1] = volume
+        else:
+            self._volumes.append(volume)
+
+    @property
+    def value(self) -> float:
+        volumes = self._volumes
+        if len(volumes) < self.window:
+            return 0.0
+        return volumes[-1] / (sum(volumes) / self.window)
+
+
+def _bar(klines: Sequence[Dict], i: int):
+    """(time, high, low, close, volume)；CandleWindow 按列读取，避免生成整段逐根字典"""
+    if isinstance(klines, CandleWindow):
+        cols = klines.columns
+        return (
+            cols["time"][i].item(),
+            cols["high"][i].item(),
+            cols["low"][i].item(),
+            cols["close"][i].item(),
+            cols["volume"][i].item(),
+        )
+    k = klines[i]
+    return k.get("time"), k["high"], k["low"], k["close"], k.get("volume", 0)
+
+
+def _bars(klines: Sequence[Dict]) -> List[tuple]:
+    if isinstance(klines, CandleWindow):
+        cols = klines.columns
+        return list(zip(*(cols[name].tolist() for name in ("time", "high", "low", "close", "volume"))))
+    return [(k.get("time"), k["high"], k["low"], k["close"], k.get("volume", 0)) for k in klines]
+
+
+class StreamingAnalyzer:
+    """
+    单个周期的增量 TechnicalAnalyzer：
+    stream = StreamingAnalyzer("1m")
+    analysis = stream.analyze(klines)   # 与 TechnicalAnalyzer().analyze(klines) 结果一致
+    """
+
+    def __init__(self, tf: str = "", metrics=None, anchored: bool = False):
+        self.tf = tf
+        self.anchored = anchored
+        self.metrics = metrics or metrics_registry
+        self.metrics.counter(
+            "indicator_stream_updates_total",
+            "Streaming indicator updates",
+            ("tf", "result"),
+        )
+        self.reset()
+
+    def reset(self) -> None:
+        self.ema_7 = StreamingEMA(7)
+        self.ema_25 = StreamingEMA(25)
+        self.ema_99 = StreamingEMA(99)
+        self.macd = StreamingMACD()
+        self.rsi = StreamingRSI(14)
+        self.atr = StreamingATR(14)
+        self.volume_ratio = StreamingVolumeRatio(20)
+        self.count = 0
+        self.first_time = None
+        self.last_time = None
+
+    # ========== 逐根更新 ==========
+    def append(self, time, high: float, low: float, close: float, volume: float) -> None:
+        """新K线开始（上一根视为收盘）"""
+        if not self.count:
+            self.first_time = time
+        for ema in (self.ema_7, self.ema_25, self.ema_99):
+            ema.append(close)
+        self.macd.append(close)
+        self.rsi.append(close)
+        self.atr.append(high, low, close)
+        self.volume_ratio.append(volume)
+        self.count += 1
+        self.last_time = time
+
+    def revise(self, time, high: float, low: float, close: float, volume: float) -> None:
+        """更新最后一根（未收盘）K线"""
+        if not self.count:
+            self.append(time, high, low, close, volume)
+            return
+        for ema in (self.ema_7, self.ema_25, self.ema_99):
+            ema.revise(close)
+        self.macd.revise(close)
+        self.rsi.revise(close)
+        self.atr.revise(high, low, close)
+        self.volume_ratio.revise(volume)
+        self.last_time = time
+
+    def rebuild(self, klines: Sequence[Dict]) -> None:
+        self.reset()
+        for bar in _bars(klines):
+            self.append(*bar)
+
+    # ========== 与批量接口对齐 ==========
+    def analyze(self, klines: Sequence[Dict]) -> Dict:
+        n = len(klines) if klines else 0
+        if not n:
+            return {}
+        result = self._sync(klines, n)
+        self.metrics.inc("indicator_stream_updates_total", tf=self.tf, result=result)
+        return self.result()
+
+    def _sync(self, klines: Sequence[Dict], n: int) -> str:
+        """窗口起点不变（anchored 时起点只后移）且只有末尾变化时增量更新，否则重建"""
+        first = _bar(klines, 0)[0]
+        slid = self.anchored and self.count and first is not None and first > self.first_time
+        if first is None or (first != self.first_time and not slid):
+            self.rebuild(klines)
+            return "rebuild"
+        last = _bar(klines, n - 1)
+        if last[0] == self.last_time and (n == self.count or slid):
+            self.revise(*last)
+            return "revise"
+        if n >= 2 and (n == self.count + 1 or slid):
+            prev = _bar(klines, n - 2)
+            if prev[0] == self.last_time:
+                self.revise(*prev)  # 上一根的最终收盘值
+                self.append(*last)
+                return "append"
+        self.rebuild(klines)
+        return "rebuild"
+
+    def result(self) -> Dict:
+        ema_7 = self.ema_7.value
+        ema_25 = self.ema_25.value
+        ema_99 = self.ema_99.value if self.count >= 99 else ema_25
+        macd_data = self.macd.result()
+
+        trend = "NEUTRAL"
+        if ema_7 > ema_25 > ema_99:
+            trend = "BULLISH"
+        elif ema_7 < ema_25 < ema_99:
+            trend = "BEARISH"
+
+        return {
+            "ema_7": ema_7,
+            "ema_25": ema_25,
+            "ema_99": ema_99,
+            "rsi": self.rsi.value,
+            "macd": macd_data["macd"],
+            "macd_signal": macd_data["signal"],
+            "macd_histogram": macd_data["histogram"],
+            "atr": self.atr.value,
+            "volume_ratio": self.volume_ratio.value,
+            "trend": trend,
+        }
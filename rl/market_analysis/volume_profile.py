@@ -0,0 +1,290 @@
+"""
+成交量分布（volume-at-price）引擎
+
+LevelDiscovery 的成交量密集区和盘整区原来每次调用都从全部K线重建 $100 分桶字典，桶宽只适合 BTC 价位。
+VolumeProfile 把两者放进同一组定宽价格分箱：
+
+- 分箱宽度相对价格（默认 0.1%）或 ATR 的倍数，吸附到 1 / 2 / 2.5 / 5 x 10^k，
+  价格小幅波动时宽度不变（BTC 在 10 万附近仍是 $100，与原来一致）
+- 数组直方图：每个分箱的成交量（按收盘价归箱）、收盘根数、触及次数（最高 / 最低 / 收盘各计一次）
+- add / revise / expire 都是 O(1)：新K线、未收盘K线更新、滚动窗口淘汰最早一根
+- top_nodes(k)：成交量最大的 k 个分箱（同量按在窗口内首次出现的先后，与原 sorted 稳定排序一致）；
+  touched(m)：触及次数 >= m 的分箱
+
+成交量按增减维护，浮点累计误差通过定期（每 4 个窗口长度的更新）按窗口顺序重算消除；
+两次重算之间 top_nodes 把相对差在 TIE_RTOL 内的成交量视为同量，排序不受累计误差影响。
+VolumeProfileStream 把分箱和按时间同步的K线窗口（末根可能未收盘）对接，供逐 tick 调用。
+"""
+import math
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .candle_store import CandleWindow
+
+DEFAULT_BIN_PCT = 0.001  # 分箱宽度 = 价格的 0.1%
+NICE_STEPS = (1.0, 2.0, 2.5, 5.0, 10.0)
+RECOMPUTE_FACTOR = 4
+TIE_RTOL = 1e-9
+
+
+def nice_bin(width: float) -> float:
+    """宽度吸附到 {1, 2, 2.5, 5} x 10^k 中对数距离最近的值"""
+    if not width or width <= 0 or not math.isfinite(width):
+        return 1.0
+    exp = math.floor(math.log10(width))
+    scale = 10.0 ** exp
+    mantissa = width / scale
+    best = min(NICE_STEPS, key=lambda step: abs(math.log(mantissa / step)))
+    return best * scale
+
+
+def bin_size_for(
+    price: float, atr: Optional[float] = None, pct: float = DEFAULT_BIN_PCT, atr_mult: Optional[float] = None
+) -> float:
+    """给出 atr 和 atr_mult 时按 ATR 倍数，否则按价格百分比"""
+    if atr_mult and atr and atr > 0:
+        return nice_bin(atr * atr_mult)
+    return nice_bin(abs(price) * pct)
+
+
+class VolumeProfile:
+    """
+    profile = VolumeProfile(bin_size=100, window=150)
+    profile.add(t, high, low, close, volume)
+    profile.top_nodes(8), profile.touched(3)
+    """
+
+    def __init__(self, bin_size: float, window: Optional[int] = None):
+        if bin_size <= 0:
+            raise ValueError("bin_size must be positive")
+        self.bin_size = bin_size
+        self.window = window
+        self._origin = 0  # 数组第 0 格对应的分箱编号
+        self._volume = np.zeros(0)
+        self._closes = np.zeros(0, dtype=np.int64)
+        self._touches = np.zeros(0, dtype=np.int64)
+        # (时间, 收盘箱, 最高箱, 最低箱, 成交量)
+        self._candles: deque = deque()
+        self._updates = 0
+
+    @classmethod
+    def from_klines(cls, klines: Sequence[Dict], bin_size: float, window: Optional[int] = None) -> "VolumeProfile":
+        """整段K线一次建好（向量化分箱，成交量按K线顺序累加）"""
+        profile = cls(bin_size, window)
+        bars = _bars(klines)
+        if window is not None:
+            bars = bars[-window:]
+        if not bars:
+            return profile
+        times, high, low, close, volume = zip(*bars)
+        prices = np.array([close, high, low], dtype=np.float64)
+        bins = np.round(prices / bin_size).astype(np.int64)
+        profile._ensure(int(bins.min()), int(bins.max()))
+        idx = bins - profile._origin
+        size = len(profile._volume)
+        profile._volume += np.bincount(idx[0], weights=np.asarray(volume, dtype=np.float64), minlength=size)
+        profile._closes += np.bincount(idx[0], minlength=size)
+        profile._touches += np.bincount(idx.reshape(-1), minlength=size)
+        close_bins, high_bins, low_bins = bins.tolist()
+        profile._candles.extend(zip(times, close_bins, high_bins, low_bins, volume))
+        return profile
+
+    # ========== 分箱 ==========
+    def bin_of(self, price: float) -> int:
+        return round(price / self.bin_size)
+
+    def price_of(self, index: int) -> float:
+        return index * self.bin_size
+
+    def _ensure(self, lo: int, hi: int) -> None:
+        """保证分箱 [lo, hi] 在数组范围内（不够时按两倍扩容）"""
+        size = len(self._volume)
+        if size and self._origin <= lo and hi < self._origin + size:
+            return
+        if size:
+            lo = min(lo, self._origin)
+            hi = max(hi, self._origin + size - 1)
+        span = hi - lo + 1
+        new_size = max(16, 2 * span)
+        new_origin = lo - (new_size - span) // 2
+        volume = np.zeros(new_size)
+        closes = np.zeros(new_size, dtype=np.int64)
+        touches = np.zeros(new_size, dtype=np.int64)
+        if size:
+            offset = self._origin - new_origin
+            volume[offset:offset + size] = self._volume
+            closes[offset:offset + size] = self._closes
+            touches[offset:offset + size] = self._touches
+        self._origin = new_origin
+        self._volume, self._closes, self._touches = volume, closes, touches
+
+    def _apply(self, record: tuple, sign: int) -> None:
+        _, close_bin, high_bin, low_bin, volume = record
+        origin = self._origin
+        self._volume[close_bin - origin] += sign * volume
+        self._closes[close_bin - origin] += sign
+        self._touches[close_bin - origin] += sign
+        self._touches[high_bin - origin] += sign
+        self._touches[low_bin - origin] += sign
+
+    def _record(self, time, high: float, low: float, close: float, volume: float) -> tuple:
+        record = (time, self.bin_of(close), self.bin_of(high), self.bin_of(low), volume)
+        self._ensure(min(record[1:4]), max(record[1:4]))
+        return record
+
+    # ========== 更新 ==========
+    def add(self, time, high: float, low: float, close: float, volume: float) -> None:
+        """新K线；超过 window 时淘汰最早一根"""
+        record = self._record(time, high, low, close, volume)
+        self._apply(record, 1)
+        self._candles.append(record)
+        if self.window is not None and len(self._candles) > self.window:
+            self.expire()
+        self._touch_updates()
+
+    def revise(self, time, high: float, low: float, close: float, volume: float) -> None:
+        """替换最后一根（未收盘）K线"""
+        if not self._candles:
+            self.add(time, high, low, close, volume)
+            return
+        self._apply(self._candles.pop(), -1)
+        record = self._record(time, high, low, close, volume)
+        self._apply(record, 1)
+        self._candles.append(record)
+        self._touch_updates()
+
+    def expire(self) -> None:
+        """淘汰最早一根K线"""
+        if self._candles:
+            self._apply(self._candles.popleft(), -1)
+            self._touch_updates()
+
+    def _touch_updates(self) -> None:
+        self._updates += 1
+        if self._updates >= RECOMPUTE_FACTOR * max(len(self._candles), 64):
+            self.recompute()
+
+    def recompute(self) -> None:
+        """按窗口顺序重算成交量（与逐根累加字典的浮点结果一致）"""
+        self._volume[:] = 0.0
+        origin = self._origin
+        for _, close_bin, _, _, volume in self._candles:
+            self._volume[close_bin - origin] += volume
+        self._updates = 0
+
+    # ========== 查询 ==========
+    @property
+    def first_time(self):
+        return self._candles[0][0] if self._candles else None
+
+    @property
+    def last_time(self):
+        return self._candles[-1][0] if self._candles else None
+
+    def __len__(self) -> int:
+        return len(self._candles)
+
+    def top_nodes(self, k: int = 8) -> List[float]:
+        """成交量最大的 k 个分箱价格（只含有收盘K线落入的分箱）"""
+        present = np.flatnonzero(self._closes > 0)
+        if len(present) <= k:
+            chosen = present
+        else:
+            volumes = self._volume[present]
+            threshold = np.partition(volumes, len(volumes) - k)[len(volumes) - k]
+            tol = abs(threshold) * TIE_RTOL
+            greater = present[volumes > threshold + tol]
+            ties = present[np.abs(volumes - threshold) <= tol]
+            need = k - len(greater)
+            if len(ties) > need:
+                ties = self._first_seen(ties + self._origin, need) - self._origin
+            chosen = np.concatenate([greater, ties])
+        return [self.price_of(int(i) + self._origin) for i in chosen]
+
+    def _first_seen(self, bins: np.ndarray, count: int) -> np.ndarray:
+        """bins 中按收盘首次出现先后取前 count 个"""
+        wanted = set(bins.tolist())
+        order = []
+        for _, close_bin, _, _, _ in self._candles:
+            if close_bin in wanted:
+                order.append(close_bin)
+                wanted.discard(close_bin)
+                if len(order) == count:
+                    break
+        return np.array(order, dtype=np.int64)
+
+    def touched(self, min_touches: int = 3) -> List[float]:
+        """触及次数 >= min_touches 的分箱价格"""
+        return [self.price_of(int(i) + self._origin) for i in np.flatnonzero(self._touches >= min_touches)]
+
+    def histogram(self) -> Dict[float, float]:
+        present = np.flatnonzero(self._closes > 0)
+        return {self.price_of(int(i) + self._origin): float(self._volume[i]) for i in present}
+
+
+def _bars(klines: Sequence[Dict]) -> List[tuple]:
+    """(time, high, low, close, volume)"""
+    if isinstance(klines, CandleWindow):
+        cols = klines.columns
+        return list(zip(*(cols[name].tolist() for name in ("time", "high", "low", "close", "volume"))))
+    return [(k.get("time"), k["high"], k["low"], k["close"], k.get("volume", 0)) for k in klines]
+
+
+def _bar(klines: Sequence[Dict], i: int) -> tuple:
+    if isinstance(klines, CandleWindow):
+        t, _, high, low, close, volume = klines.columns_array()[:, i].tolist()
+        return t, high, low, close, volume
+    k = klines[i]
+    return k.get("time"), k["high"], k["low"], k["close"], k.get("volume", 0)
+
+
+def _time(klines: Sequence[Dict], i: int):
+    if isinstance(klines, CandleWindow):
+        return klines.column("time")[i]
+    return klines[i].get("time")
+
+
+class VolumeProfileStream:
+    """
+    同一序列（某个周期）连续多次传入的K线窗口 -> 与窗口内容一致的 VolumeProfile
+    按时间戳对齐：末根原地 revise，新K线 add，窗口起点后移的部分 expire；
+    对不上或分箱宽度变化时整体重建
+    """
+
+    def __init__(self, pct: float = DEFAULT_BIN_PCT, atr_mult: Optional[float] = None):
+        self.pct = pct
+        self.atr_mult = atr_mult
+        self.profile: Optional[VolumeProfile] = None
+        self.rebuilds = 0
+
+    def update(self, klines: Sequence[Dict], atr: Optional[float] = None, price: Optional[float] = None) -> VolumeProfile:
+        """price：分箱参考价（默认窗口最后收盘价）"""
+        n = len(klines)
+        last = _bar(klines, n - 1)
+        bin_size = bin_size_for(price or last[3], atr, self.pct, self.atr_mult)
+        profile = self.profile
+        if profile is None or profile.bin_size != bin_size or last[0] is None or not self._sync(profile, klines, n):
+            profile = self.profile = VolumeProfile.from_klines(klines, bin_size)
+            self.rebuilds += 1
+        return profile
+
+    @staticmethod
+    def _sync(profile: VolumeProfile, klines: Sequence[Dict], n: int) -> bool:
+        if not len(profile):
+            return False
+        # 上次的最后一根（可能当时未收盘）在本窗口中的位置
+        last_time = profile.last_time
+        pos = n - 1
+        while pos >= 0 and _time(klines, pos) > last_time:
+            pos -= 1
+        if pos < 0 or _time(klines, pos) != last_time:
+            return False
+        profile.revise(*_bar(klines, pos))
+        for i in range(pos + 1, n):
+            profile.add(*_bar(klines, i))
+        first_time = _time(klines, 0)
+        while len(profile) and profile.first_time < first_time:
+            profile.expire()
+        return len(profile) == n and profile.first_time == first_time
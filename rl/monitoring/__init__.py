@@ -0,0 +1,19 @@
+"""
+监控模块
+包含运行指标采集（Prometheus 文本格式）、agent 线程性能剖析和冷启动剖析
+"""
+from .metrics import Counter, Histogram, MetricsRegistry, registry
+from .profiler import AgentProfiler, profiler
+from .startup import lazy_component, lazy_exports, startup_profile
+
+__all__ = [
+    'Counter',
+    'Histogram',
+    'MetricsRegistry',
+    'registry',
+    'AgentProfiler',
+    'profiler',
+    'lazy_component',
+    'lazy_exports',
+    'startup_profile',
+]
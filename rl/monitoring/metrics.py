@@ -0,0 +1,227 @@
+"""
+运行指标采集 - Prometheus 文本格式（text exposition format 0.0.4）
+
+用法：
+    with registry.stage("fetch_1m"):
+        ...
+    registry.inc("agent_trades_total", action="entry")
+
+关闭时（RL_METRICS=0 或 registry.enabled = False）stage() 返回共享的空计时器，
+inc()/observe() 直接返回，开销只有一次属性判断。
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = "agent_stage_duration_seconds"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(k, "")) for k in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        key = tuple(str(labels.get(k, "")) for k in self.label_names)
+        return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket_counts..., sum, count]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(k, "")) for k in self.label_names)
+        self._observe_key(key, value)
+
+    def _observe_key(self, key: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def summary(self, **labels) -> Dict[str, float]:
+        key = tuple(str(labels.get(k, "")) for k in self.label_names)
+        series = self._series.get(key)
+        if not series:
+            return {"count": 0, "sum": 0.0, "avg": 0.0}
+        return {
+            "count": int(series[-1]),
+            "sum": series[-2],
+            "avg": series[-2] / series[-1] if series[-1] else 0.0,
+        }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {_format_value(cumulative)}")
+            le = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {_format_value(series[-1])}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "key", "start")
+
+    def __init__(self, histogram: Histogram, key: Tuple[str, ...]):
+        self.histogram = histogram
+        self.key = key
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram._observe_key(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.histogram(
+            STAGE_METRIC,
+            "Duration of agent tick stages in seconds",
+            ("stage",),
+        )
+        self.counter("agent_trades_total", "Trades executed by the agent", ("action",))
+        self.counter("agent_requotes_total", "Limit order re-quotes", ("side",))
+        self.counter("agent_errors_total", "Errors raised inside the agent loop", ("stage",))
+
+    def counter(self, name: str, help_text: str = "", label_names: Iterable[str] = ()) -> Counter:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Counter(name, help_text or name, label_names)
+                self._metrics[name] = metric
+            return metric
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str = "",
+        label_names: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Histogram(name, help_text or name, label_names, buckets)
+                self._metrics[name] = metric
+            return metric
+
+    def stage(self, stage: str):
+        """计时一个 tick 阶段，关闭时返回空计时器"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self._metrics[STAGE_METRIC], (stage,))
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        if not self.enabled:
+            return
+        metric = self._metrics.get(name)
+        if isinstance(metric, Counter):
+            metric.inc(amount, **labels)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        metric = self._metrics.get(name)
+        if isinstance(metric, Histogram):
+            metric.observe(value, **labels)
+
+    def get(self, name: str) -> Optional[object]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[k] for k in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(enabled=os.getenv("RL_METRICS", "1") != "0")
@@ -0,0 +1,223 @@
+"""
+Agent 线程按需性能剖析
+
+两种模式：
+- cprofile：确定性剖析，只在 agent 线程的 tick 内开启，采集 N 个 tick 后自动停止
+- sampling：低开销采样，后台线程定时读取 agent 线程的调用栈
+
+会话有最长时长限制；结果可导出为 pstats 二进制或火焰图用的 collapsed stacks。
+Web 线程从不开启 profiler，只调用 start/stop/status/result。
+"""
+import cProfile
+import io
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+class AgentProfiler:
+    MODES = ("cprofile", "sampling")
+
+    def __init__(
+        self,
+        max_duration: float = 300.0,
+        max_ticks: int = 100,
+        min_interval: float = 0.001,
+    ):
+        self.max_duration = max_duration
+        self.max_ticks = max_ticks
+        self.min_interval = min_interval
+        self.agent_thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._session: Optional[Dict] = None
+        self._last_result: Optional[Dict] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._profiling_tick = False
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ========== agent 线程钩子 ==========
+    def attach(self, thread_id: Optional[int] = None) -> None:
+        """登记 agent 线程（在 agent 循环开始时调用）"""
+        self.agent_thread_id = thread_id or threading.get_ident()
+
+    def tick_begin(self) -> None:
+        session = self._session
+        if session is None or session["mode"] != "cprofile":
+            return
+        if threading.get_ident() != self.agent_thread_id:
+            return
+        if self._expired(session):
+            self.stop("duration_limit")
+            return
+        self._profile.enable()
+        self._profiling_tick = True
+
+    def tick_end(self) -> None:
+        if not self._profiling_tick:
+            return
+        if threading.get_ident() != self.agent_thread_id:
+            return
+        self._profile.disable()
+        self._profiling_tick = False
+        session = self._session
+        if session is None:
+            return
+        session["ticks_done"] += 1
+        if session["ticks_done"] >= session["ticks"]:
+            self.stop("ticks_done")
+        elif self._expired(session):
+            self.stop("duration_limit")
+
+    # ========== 控制接口 ==========
+    def start(
+        self,
+        mode: str = "cprofile",
+        ticks: int = 5,
+        duration: float = 60.0,
+        interval: float = 0.005,
+    ) -> Dict:
+        if mode not in self.MODES:
+            raise ValueError(f"unknown profiler mode: {mode}")
+        if self.agent_thread_id is None:
+            raise RuntimeError("agent thread not running")
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError("profiler session already running")
+            duration = max(1.0, min(float(duration), self.max_duration))
+            session = {
+                "mode": mode,
+                "ticks": max(1, min(int(ticks), self.max_ticks)),
+                "ticks_done": 0,
+                "duration": duration,
+                "interval": max(self.min_interval, float(interval)),
+                "started_at": time.time(),
+                "samples": 0,
+            }
+            if mode == "cprofile":
+                self._profile = cProfile.Profile()
+            else:
+                self._stop_event.clear()
+                session["stacks"] = Counter()
+                self._sampler = threading.Thread(
+                    target=self._sample_loop, args=(session,), daemon=True
+                )
+            self._session = session
+        if mode == "sampling":
+            self._sampler.start()
+        return self.status()
+
+    def stop(self, reason: str = "manual") -> Dict:
+        with self._lock:
+            session = self._session
+            if session is None:
+                return self.status()
+            self._session = None
+        session["stopped_at"] = time.time()
+        session["stop_reason"] = reason
+        if session["mode"] == "cprofile":
+            # tick 中途停止时，由 tick_end 负责 disable（必须在 agent 线程内调用）
+            result = {"profile": self._profile}
+        else:
+            self._stop_event.set()
+            sampler = self._sampler
+            if sampler is not None and sampler is not threading.current_thread():
+                sampler.join(timeout=2.0)
+            result = {"stacks": session.pop("stacks")}
+        result["session"] = session
+        self._last_result = result
+        return self.status()
+
+    def status(self) -> Dict:
+        session = self._session
+        if session is not None and self._expired(session):
+            if session["mode"] == "sampling":
+                self.stop("duration_limit")
+                session = None
+            # cprofile 会话在下一个 tick 边界按时长停止
+        info = {"running": session is not None, "agent_attached": self.agent_thread_id is not None}
+        if session is not None:
+            info["session"] = self._public(session)
+        if self._last_result:
+            info["last"] = self._public(self._last_result["session"])
+        return info
+
+    # ========== 结果导出 ==========
+    def result_pstats(self) -> Optional[bytes]:
+        result = self._last_result
+        if not result or "profile" not in result:
+            return None
+        if self._profiling_tick and result["profile"] is self._profile:
+            # agent 线程还在当前 tick 内，等 tick_end 关闭后再导出
+            return None
+        profile = result["profile"]
+        profile.create_stats()
+        return marshal.dumps(profile.stats)
+
+    def result_collapsed(self) -> Optional[str]:
+        result = self._last_result
+        if not result:
+            return None
+        lines = []
+        if "stacks" in result:
+            for stack, count in result["stacks"].most_common():
+                lines.append(f"{stack} {count}")
+        else:
+            if self._profiling_tick and result["profile"] is self._profile:
+                # 与 result_pstats 相同：tick 内 profile 仍启用，等 tick_end 关闭后再导出
+                return None
+            # cProfile 只记录调用边，导出为 "caller;callee 自身耗时(微秒)"
+            # pstats 会带入 dataclasses/inspect（十几毫秒），只在导出时导入
+            import pstats
+            stats = pstats.Stats(result["profile"], stream=io.StringIO()).stats
+            for func, (_, _, tt, _, callers) in stats.items():
+                name = self._func_label(func)
+                if not callers:
+                    weight = int(tt * 1e6)
+                    if weight > 0:
+                        lines.append(f"{name} {weight}")
+                    continue
+                for caller, edge in callers.items():
+                    weight = int(edge[2] * 1e6)
+                    if weight > 0:
+                        lines.append(f"{self._func_label(caller)};{name} {weight}")
+        return "\n".join(lines) + "\n"
+
+    # ========== 内部 ==========
+    def _sample_loop(self, session: Dict) -> None:
+        interval = session["interval"]
+        stacks = session["stacks"]
+        while not self._stop_event.wait(interval):
+            if self._expired(session):
+                self.stop("duration_limit")
+                return
+            frame = sys._current_frames().get(self.agent_thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stacks[";".join(reversed(names))] += 1
+            session["samples"] += 1
+
+    def _expired(self, session: Dict) -> bool:
+        return time.time() - session["started_at"] >= session["duration"]
+
+    @staticmethod
+    def _func_label(func) -> str:
+        filename, lineno, name = func
+        if filename == "~":
+            return name
+        return f"{name} ({filename}:{lineno})"
+
+    @staticmethod
+    def _public(session: Dict) -> Dict:
+        return {k: v for k, v in session.items() if k != "stacks"}
+
+
+profiler = AgentProfiler()
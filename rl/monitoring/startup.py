@@ -0,0 +1,177 @@
+"""
+冷启动剖析与延迟加载
+
+崩溃重启后第一个 tick 之前要做的事：import rl（原来会导入全部子包）、构造 TradingAgent（约 20 个组件，
+多数从磁盘读 JSON）。这里提供三样东西，把启动耗时量化到毫秒：
+
+- lazy_exports：PEP 562 模块级 __getattr__，包的 __init__ 只声明导出名 -> 子模块，首次访问才导入
+- lazy_component：实例级延迟构造（首次访问时构造并写入实例字典，之后是普通属性访问），线程安全
+- startup_profile：记录导入（import）、构造（ctor）、延迟构造（lazy）各段耗时和里程碑（mark），
+  时间零点为本模块首次导入（即 import rl）
+"""
+import functools
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+PHASES = ("import", "ctor", "lazy")
+
+
+class StartupProfile:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.entries: List[Dict] = []
+        self.marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(self, name: str, seconds: float, phase: str = "ctor", depth: Optional[int] = None) -> None:
+        with self._lock:
+            self.entries.append({
+                "name": name,
+                "phase": phase,
+                "ms": round(seconds * 1000, 3),
+                "at_ms": round((time.perf_counter() - self.origin) * 1000, 3),
+                "depth": getattr(self._local, "depth", 0) if depth is None else depth,
+            })
+
+    @contextmanager
+    def section(self, name: str, phase: str = "ctor"):
+        """计时一段代码；嵌套段记录 depth，汇总时只累加最外层，避免重复计算"""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            self.record(name, time.perf_counter() - start, phase, depth)
+
+    def timed(self, name: str, phase: str = "ctor") -> Callable:
+        """装饰器版 section，用于构造函数"""
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.section(name, phase):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def mark(self, name: str) -> float:
+        """记录里程碑（距 import rl 的毫秒数），同名只记第一次"""
+        with self._lock:
+            if name not in self.marks:
+                self.marks[name] = round((time.perf_counter() - self.origin) * 1000, 3)
+            return self.marks[name]
+
+    def report(self, top: int = 30) -> Dict:
+        with self._lock:
+            entries = list(self.entries)
+            marks = dict(self.marks)
+        totals = {phase: 0.0 for phase in PHASES}
+        for entry in entries:
+            if entry["depth"] == 0:
+                totals[entry["phase"]] = totals.get(entry["phase"], 0.0) + entry["ms"]
+        return {
+            "marks_ms": marks,
+            "totals_ms": {k: round(v, 3) for k, v in totals.items()},
+            "slowest": sorted(entries, key=lambda e: e["ms"], reverse=True)[:top],
+            "entries": len(entries),
+        }
+
+    def summary_line(self) -> str:
+        data = self.report(top=3)
+        slowest = ", ".join(f"{e['name']}={e['ms']:.1f}ms" for e in data["slowest"])
+        marks = ", ".join(f"{k}={v:.0f}ms" for k, v in data["marks_ms"].items())
+        return f"{marks} | 最慢: {slowest}"
+
+
+startup_profile = StartupProfile()
+
+
+# ========== 延迟导入 ==========
+def timed_import(name: str):
+    """导入模块；首次导入时记入启动剖析（含其依赖的导入时间）"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with startup_profile.section(name, "import"):
+        return importlib.import_module(name)
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable, Callable]:
+    """
+    __getattr__, __dir__ = lazy_exports(__name__, {"TradingAgent": ".agent", ...})
+    导出名首次访问时导入对应子模块并缓存到包的模块字典；也可按属性访问未导入的子模块
+    """
+
+    def __getattr__(name: str):
+        target = exports.get(name)
+        if target is not None:
+            module = timed_import(importlib.util.resolve_name(target, package))
+            value = getattr(module, name)
+        else:
+            full = f"{package}.{name}"
+            if name.startswith("_") or importlib.util.find_spec(full) is None:
+                raise AttributeError(f"module {package!r} has no attribute {name!r}")
+            value = timed_import(full)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
+
+
+# ========== 延迟构造 ==========
+_component_lock = threading.RLock()
+
+
+class lazy_component:
+    """
+    class TradingAgent:
+        @lazy_component
+        def exit_learner(self):
+            return ExitTimingLearner(self.data_dir)
+    """
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.name = factory.__name__
+        self.owner: Optional[str] = None
+        self.__doc__ = factory.__doc__
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+        self.owner = owner.__name__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # 非数据描述符：构造后实例字典优先，之后的访问不再经过这里
+        with _component_lock:
+            cache = instance.__dict__
+            if self.name in cache:
+                return cache[self.name]
+            with startup_profile.section(f"{self.owner}.{self.name}", "lazy"):
+                value = self.factory(instance)
+            cache[self.name] = value
+        return value
+
+    @staticmethod
+    def pending(instance) -> List[str]:
+        """实例上尚未构造的延迟组件"""
+        return [
+            name
+            for klass in type(instance).__mro__
+            for name, attr in vars(klass).items()
+            if isinstance(attr, lazy_component) and name not in instance.__dict__
+        ]
@@ -0,0 +1,178 @@
+"""
+本地账户 / 保证金模型
+
+入场路径上 execute_entry 和 _smart_position_size 各调用一次 get_balance（签名 REST 请求，阻塞）。
+AccountModel 在本地维护账户状态，仓位计算只读内存：
+
+- 钱包余额：对账时取交易所值，之后按成交记账（开仓扣手续费，平仓加已实现盈亏并扣手续费）
+- 持仓保证金：按持仓列表逐笔计算 entry_price * quantity / leverage；挂单中的入场单按同样方式预留
+- 未实现盈亏：按最近一次标记价（analyze_market / 看门狗价格）计算
+- 可用保证金 = 钱包 + 未实现盈亏 - 持仓保证金 - 预留 + 偏差
+
+偏差在对账时确定，吸收模型之外的部分（其他交易对的持仓、资金费、维持保证金规则等），
+使对账那一刻本地值与交易所 availableBalance 一致。每 reconcile_interval 秒对账一次，
+对账前的本地预测与交易所值之差记为 drift，用于判断模型是否可靠。
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..monitoring.metrics import registry as metrics_registry
+
+COMMISSION_RATE = 0.0002  # 与平仓记账一致：每边 0.02%
+
+
+def position_margin(position: Dict) -> float:
+    qty = float(position.get("quantity", 0) or 0)
+    price = float(position.get("entry_price", 0) or 0)
+    leverage = max(1, int(position.get("leverage", 1) or 1))
+    return qty * price / leverage
+
+
+def position_unrealized(position: Dict, mark_price: float) -> float:
+    qty = float(position.get("quantity", 0) or 0)
+    entry = float(position.get("entry_price", 0) or 0)
+    if not mark_price or not entry:
+        return 0.0
+    diff = mark_price - entry if position.get("direction") == "LONG" else entry - mark_price
+    return diff * qty
+
+
+class AccountModel:
+    """
+    account = AccountModel(client, positions=lambda: agent.positions,
+                           pending=lambda: agent.pending_entries.values())
+    account.available_margin()   # 不访问网络（首次使用前会对账一次）
+    """
+
+    def __init__(
+        self,
+        client,
+        asset: str = "USDT",
+        positions: Optional[Callable[[], Iterable[Dict]]] = None,
+        pending: Optional[Callable[[], Iterable[Dict]]] = None,
+        reconcile_interval: float = 60.0,
+        clock: Callable[[], float] = time.time,
+        metrics=None,
+    ):
+        self.client = client
+        self.asset = asset
+        self.positions = positions or (lambda: [])
+        self.pending = pending or (lambda: [])
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock
+        self.metrics = metrics or metrics_registry
+        self.metrics.counter("account_reconciles_total", "Account model reconciliations", ("result",))
+        self.wallet = 0.0
+        self.mark_price = 0.0
+        self.offset = 0.0
+        self.drift: Optional[float] = None
+        self.exchange_available: Optional[float] = None
+        self.last_sync: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.reconciles = 0
+        self.fills = 0
+        self._lock = threading.Lock()
+
+    # ========== 查询（纯本地） ==========
+    def used_margin(self) -> float:
+        return sum(position_margin(p) for p in list(self.positions()))
+
+    def reserved_margin(self) -> float:
+        return sum(position_margin(p) for p in list(self.pending()))
+
+    def unrealized_pnl(self) -> float:
+        mark = self.mark_price
+        return sum(position_unrealized(p, mark) for p in list(self.positions()))
+
+    def available_margin(self) -> float:
+        """本地可用保证金；从未对账过时先对账一次，对账失败返回 0"""
+        if self.last_sync is None and not self.reconcile():
+            return 0.0
+        with self._lock:
+            return max(0.0, self._local_available() + self.offset)
+
+    def _local_available(self) -> float:
+        return self.wallet + self.unrealized_pnl() - self.used_margin() - self.reserved_margin()
+
+    # ========== 事件 ==========
+    def update_mark(self, price: float) -> None:
+        if price and price > 0:
+            self.mark_price = float(price)
+
+    def on_entry_fill(self, position: Dict) -> None:
+        """入场成交：持仓保证金随持仓列表变化，这里只扣开仓手续费"""
+        fee = float(position.get("entry_price", 0) or 0) * float(position.get("quantity", 0) or 0) * COMMISSION_RATE
+        with self._lock:
+            self.wallet -= fee
+            self.fills += 1
+
+    def on_exit_fill(self, position: Dict, exit_price: float) -> None:
+        """平仓成交：已实现盈亏计入钱包，扣平仓手续费（持仓随后从列表移除）"""
+        qty = float(position.get("quantity", 0) or 0)
+        realized = position_unrealized(position, exit_price) - exit_price * qty * COMMISSION_RATE
+        with self._lock:
+            self.wallet += realized
+            self.fills += 1
+
+    # ========== 对账 ==========
+    def due(self) -> bool:
+        return self.last_sync is None or self.clock() - self.last_sync >= self.reconcile_interval
+
+    def maybe_reconcile(self) -> bool:
+        """到期才对账（agent 循环在 tick 开头调用，不在入场路径上）"""
+        return self.reconcile() if self.due() else False
+
+    def reconcile(self) -> bool:
+        try:
+            balances = self.client.get_balance()
+            row = next((b for b in balances or [] if b.get("asset") == self.asset), None)
+            if row is None:
+                raise ValueError(f"{self.asset} balance missing")
+            wallet = float(row.get("crossWalletBalance", row.get("balance", 0)) or 0)
+            available = float(row.get("availableBalance", row.get("balance", 0)) or 0)
+        except Exception as exc:
+            self.last_error = str(exc)
+            self.metrics.inc("account_reconciles_total", result="error")
+            return False
+        with self._lock:
+            if self.last_sync is not None:
+                self.drift = round(self._local_available() + self.offset - available, 6)
+            self.wallet = wallet
+            self.exchange_available = available
+            self.offset = available - self._local_available()
+            self.last_sync = self.clock()
+            self.last_error = None
+            self.reconciles += 1
+        self.metrics.inc("account_reconciles_total", result="ok")
+        return True
+
+    def invalidate(self) -> None:
+        """持仓被外部整体修改（手动同步等）后调用，下次使用前重新对账"""
+        self.last_sync = None
+
+    def status(self) -> Dict:
+        positions: List[Dict] = list(self.positions())
+        return {
+            "wallet": round(self.wallet, 4),
+            "available": round(max(0.0, self._local_available() + self.offset), 4) if self.last_sync else None,
+            "exchange_available": self.exchange_available,
+            "used_margin": round(self.used_margin(), 4),
+            "reserved_margin": round(self.reserved_margin(), 4),
+            "unrealized_pnl": round(self.unrealized_pnl(), 4),
+            "mark_price": self.mark_price,
+            "offset": round(self.offset, 4),
+            "drift": self.drift,
+            "positions": [
+                {
+                    "trade_id": p.get("trade_id"),
+                    "margin": round(position_margin(p), 4),
+                    "unrealized_pnl": round(position_unrealized(p, self.mark_price), 4),
+                }
+                for p in positions
+            ],
+            "fills": self.fills,
+            "reconciles": self.reconciles,
+            "last_sync_age": round(self.clock() - self.last_sync, 1) if self.last_sync else None,
+            "last_error": self.last_error,
+        }
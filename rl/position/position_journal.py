@@ -0,0 +1,188 @@
+"""
+持仓预写日志（SQLite WAL）
+
+原来每次开平仓都用 indent=2 整体重写 active_positions.json，Web 线程也会直接重写该文件，
+没有原子替换，并发写入可能把文件写坏。这里改为只追加的事件日志：
+- events：open（完整持仓）/ update（变更字段）/ close（trade_id）/ reset（整表替换，用于同步对账）
+- snapshot：压缩点，保存某个 seq 时的完整持仓列表；压缩时删除该 seq 之前的事件
+
+每个事件一个事务，写入代价与持仓数量无关；WAL + synchronous=FULL 保证提交即持久。
+启动时读取 snapshot 并重放其后的事件恢复到内存。
+首次打开时如果日志为空且存在旧的 active_positions.json，会导入为一次 reset 并把旧文件改名。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+LEGACY_FILE = "active_positions.json"
+JOURNAL_FILE = "positions.db"
+
+# 只在内存中有意义的字段，不写入日志
+TRANSIENT_KEYS = ("exit_pending",)
+
+
+def _clean(position: Dict) -> Dict:
+    return {k: v for k, v in position.items() if k not in TRANSIENT_KEYS}
+
+
+class PositionJournal:
+    def __init__(self, db_path: str, compact_every: int = 500, migrate_legacy: bool = True):
+        self.db_path = db_path
+        self.compact_every = compact_every
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._init_db()
+        self._pending = self._count_events()
+        if migrate_legacy:
+            self._migrate_legacy()
+
+    @classmethod
+    def for_dir(cls, data_dir: str, **kwargs) -> "PositionJournal":
+        return cls(os.path.join(data_dir, JOURNAL_FILE), **kwargs)
+
+    def _init_db(self) -> None:
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL,
+                kind TEXT,
+                trade_id TEXT,
+                data TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS snapshot (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER,
+                ts REAL,
+                positions TEXT
+            )
+            """
+        )
+
+    # ========== 写入 ==========
+    def open(self, position: Dict) -> None:
+        self._append("open", position.get("trade_id"), _clean(position))
+
+    def update(self, trade_id: str, fields: Dict) -> None:
+        self._append("update", trade_id, _clean(fields))
+
+    def close(self, trade_id: str) -> None:
+        self._append("close", trade_id, None)
+
+    def reset(self, positions: List[Dict]) -> None:
+        """整表替换（外部同步、一键清仓等批量修改），直接写成新的压缩点"""
+        self.compact(positions)
+
+    def compact(self, positions: Optional[List[Dict]] = None) -> None:
+        """写入压缩点并删除之前的事件；不传 positions 时按日志重放结果压缩"""
+        with self._lock:
+            if positions is None:
+                positions = self._replay()
+            data = json.dumps([_clean(p) for p in positions], ensure_ascii=False)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()
+                seq = row[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshot (id, seq, ts, positions) VALUES (1, ?, ?, ?)",
+                    (seq, time.time(), data),
+                )
+                self._conn.execute("DELETE FROM events WHERE seq <= ?", (seq,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._pending = 0
+
+    def _append(self, kind: str, trade_id: Optional[str], data: Optional[Dict]) -> None:
+        payload = json.dumps(data, ensure_ascii=False) if data is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO events (ts, kind, trade_id, data) VALUES (?, ?, ?, ?)",
+                (time.time(), kind, trade_id, payload),
+            )
+            self._pending += 1
+            need_compact = self.compact_every and self._pending >= self.compact_every
+        if need_compact:
+            self.compact()
+
+    # ========== 恢复 ==========
+    def recover(self) -> List[Dict]:
+        """snapshot + 之后的事件 -> 当前持仓列表（按开仓顺序）"""
+        with self._lock:
+            return self._replay()
+
+    def _replay(self) -> List[Dict]:
+        row = self._conn.execute("SELECT seq, positions FROM snapshot WHERE id = 1").fetchone()
+        since = 0
+        positions: Dict[str, Dict] = {}
+        if row:
+            since = row[0]
+            for pos in json.loads(row[1] or "[]"):
+                positions[pos.get("trade_id")] = pos
+        cursor = self._conn.execute(
+            "SELECT kind, trade_id, data FROM events WHERE seq > ? ORDER BY seq", (since,)
+        )
+        for kind, trade_id, data in cursor:
+            if kind == "open":
+                positions[trade_id] = json.loads(data)
+            elif kind == "update":
+                if trade_id in positions:
+                    positions[trade_id].update(json.loads(data))
+            elif kind == "close":
+                positions.pop(trade_id, None)
+        return list(positions.values())
+
+    def _count_events(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def _migrate_legacy(self) -> None:
+        legacy = os.path.join(os.path.dirname(self.db_path), LEGACY_FILE)
+        if not os.path.exists(legacy):
+            return
+        with self._lock:
+            has_data = self._pending or self._conn.execute("SELECT 1 FROM snapshot").fetchone()
+        if has_data:
+            return
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                positions = json.load(f).get("positions", [])
+        except Exception:
+            positions = []
+        self.reset(positions)
+        os.replace(legacy, legacy + ".migrated")
+
+    def stats(self) -> Dict:
+        return {"path": self.db_path, "pending_events": self._pending, "compact_every": self.compact_every}
+
+    def close_db(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def load_positions(data_dir: str) -> List[Dict]:
+    """agent 未运行时读取持久化的持仓（Web 接口用）"""
+    journal = PositionJournal.for_dir(data_dir)
+    try:
+        return journal.recover()
+    finally:
+        journal.close_db()
+
+
+def save_positions(data_dir: str, positions: List[Dict]) -> None:
+    """agent 未运行时整表替换持仓（Web 同步接口用）"""
+    journal = PositionJournal.for_dir(data_dir)
+    try:
+        journal.reset(positions)
+    finally:
+        journal.close_db()
@@ -1,11 +1,15 @@
 """
 风险控制模块
 包含风险控制和限制系统
+子模块在首次访问导出名时才导入（PEP 562）
 """
-from .risk_controller import RiskController
+from ..monitoring.startup import lazy_exports
+
+_EXPORTS = {
+    'RiskController': '.risk_controller',
+}
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 __all__ = [
     'RiskController',
 ]
-
-
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+回测任务端到端验证脚本（不需要 API 密钥）
+
+测试项目：
+1. 提交回测任务 -> 轮询进度 -> 取结果
+2. 运行中的任务取消
+3. 录制会话回放任务（与回测共用任务表）
+
+使用生成的确定性 1m K线 CSV 和录制会话，数据目录为临时目录，不影响 rl_data。
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TERMINAL = ("finished", "failed", "cancelled")
+
+
+def print_section(title):
+    """打印分隔线"""
+    print("\n" + "="*80)
+    print(f"  {title}")
+    print("="*80)
+
+
+def write_csv(path, bars=4000, seed=7):
+    """BTC 价位的随机游走 1m K线"""
+    rng = np.random.default_rng(seed)
+    closes = 60000 * np.exp(np.cumsum(rng.normal(0, 0.0015, bars)))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["open_time", "open", "high", "low", "close", "volume"])
+        prev = closes[0]
+        for i, close in enumerate(closes):
+            high = max(prev, close) * (1 + abs(rng.normal(0, 0.0007)))
+            low = min(prev, close) * (1 - abs(rng.normal(0, 0.0007)))
+            volume = rng.gamma(2, 5)
+            writer.writerow([1700000000000 + i * 60000, round(prev, 2), round(high, 2),
+                             round(low, 2), round(close, 2), round(volume, 3)])
+            prev = close
+
+
+def write_recording(root, ticks=120, seed=11):
+    """合成一个录制会话：各周期K线随 tick 前移一根，账户查询返回固定余额"""
+    from rl.core.recorder import TickRecorder
+
+    rng = np.random.default_rng(seed)
+    steps = {"1m": 60, "15m": 900, "8h": 28800, "1w": 604800}
+    limits = {"1m": 150, "15m": 150, "8h": 150, "1w": 50}
+    series = {tf: 60000 * np.exp(np.cumsum(rng.normal(0, 0.002, limits[tf] + ticks))) for tf in steps}
+    account = {
+        "get_balance": [{"asset": "USDT", "balance": "1000", "crossWalletBalance": "1000",
+                         "availableBalance": "1000"}],
+        "get_symbol_filters": {"tick_size": 0.1, "step_size": 0.001, "min_qty": 0.001,
+                               "max_qty": 1000.0, "min_notional": 5.0},
+    }
+    recorder = TickRecorder(root, "BTCUSDT", chunk_ticks=50)
+    start = 1760000000
+    for i in range(ticks):
+        klines = {}
+        for tf, closes in series.items():
+            window = closes[i:i + limits[tf]]
+            t0 = start - (limits[tf] - i) * steps[tf]
+            klines[tf] = [
+                {"time": (t0 + j * steps[tf]) * 1000, "open": float(c), "high": float(c) * 1.001,
+                 "low": float(c) * 0.999, "close": float(c), "volume": 10.0}
+                for j, c in enumerate(window)
+            ]
+        recorder.record(klines, account=account, t=start + i * 60)
+    recorder.close()
+    return recorder.session
+
+
+def wait_job(client, job_id, timeout=120, until=TERMINAL):
+    """轮询任务状态，返回 (最后状态, 观察到的进度列表)"""
+    seen = []
+    deadline = time.time() + timeout
+    job = None
+    while time.time() < deadline:
+        job = client.get(f"/api/backtest/jobs/{job_id}").get_json()
+        seen.append((job["status"], job["progress"]["progress"]))
+        if job["status"] in until:
+            break
+        time.sleep(0.2)
+    return job, seen
+
+
+def test_job_roundtrip(client, csv_file):
+    """测试1: 提交 -> 进度 -> 结果"""
+    print_section("TEST 1: Backtest Job Submit / Progress / Result")
+    try:
+        resp = client.post("/api/backtest/jobs", json={"csv": csv_file, "max_trades": 10000})
+        assert resp.status_code == 200, resp.get_json()
+        job_id = resp.get_json()["job_id"]
+        print(f"Submitted: {job_id}")
+
+        job, seen = wait_job(client, job_id)
+        running = [p for status, p in seen if status == "running"]
+        print(f"Final Status: {job['status']} (error={job.get('error')})")
+        print(f"Progress Samples: {len(running)} running, max {max(running, default=0):.1f}%")
+        assert job["status"] == "finished", job.get("error")
+        assert any(p > 0 for p in running), "no progress observed while running"
+
+        result = client.get(f"/api/backtest/jobs/{job_id}/result").get_json()["result"]
+        print(f"Result: trades={result['total_trades']} win_rate={result['win_rate']:.2f} "
+              f"balance={result['final_balance']:.2f}")
+        assert result["total_trades"] > 0
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def test_job_cancel(client, csv_file):
+    """测试2: 取消运行中的任务"""
+    print_section("TEST 2: Backtest Job Cancel")
+    try:
+        resp = client.post("/api/backtest/jobs", json={"csv": csv_file, "max_trades": 10000})
+        job_id = resp.get_json()["job_id"]
+        job, _ = wait_job(client, job_id, until=("running",) + TERMINAL)
+        assert job["status"] == "running", job["status"]
+
+        cancel = client.post(f"/api/backtest/jobs/{job_id}/cancel").get_json()
+        print(f"Cancel Response: {cancel}")
+        job, _ = wait_job(client, job_id)
+        print(f"Final Status: {job['status']}")
+        assert job["status"] == "cancelled"
+        assert client.get(f"/api/backtest/jobs/{job_id}/result").status_code == 409
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def test_replay_job(client):
+    """测试3: 录制回放任务"""
+    print_section("TEST 3: Recording Replay Job")
+    try:
+        sessions = client.get("/api/recordings").get_json()["sessions"]
+        session = sessions[0]["session"]
+        resp = client.post(f"/api/recordings/{session}/replay", json={"include_decisions": False})
+        assert resp.status_code == 200, resp.get_json()
+        job = resp.get_json()
+        assert job["kind"] == "replay" and job["status"] in ("queued", "running"), job
+        print(f"Submitted: {job['job_id']} (session={session})")
+
+        job, seen = wait_job(client, job["job_id"])
+        print(f"Final Status: {job['status']} (error={job.get('error')})")
+        assert job["status"] == "finished", job.get("error")
+        result = client.get(f"/api/backtest/jobs/{job['job_id']}/result").get_json()["result"]
+        print(f"Result: ticks={result['ticks']} entries={result['entries']} exits={result['exits']}")
+        assert result["ticks"] == sessions[0]["ticks"]
+        assert "decisions" not in result
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def main():
+    """主测试流程"""
+    print(f"\nStart Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    import web.app as web_app
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # 回测学习文件写到临时目录
+        web_app.RL_DATA_DIR = tmp
+        csv_file = os.path.join(tmp, "btcusdt_1m_test.csv")
+        write_csv(csv_file)
+        client = web_app.app.test_client()
+
+        results["Job Roundtrip"] = test_job_roundtrip(client, csv_file) is not None
+        # 取消用更长的数据，保证任务在取消时仍在运行
+        long_csv = os.path.join(tmp, "btcusdt_1m_long.csv")
+        write_csv(long_csv, bars=60000)
+        results["Job Cancel"] = test_job_cancel(client, long_csv) is not None
+
+        web_app.RECORDINGS_DIR = os.path.join(tmp, "recordings")
+        write_recording(web_app.RECORDINGS_DIR)
+        results["Replay Job"] = test_replay_job(client) is not None
+
+        web_app.backtest_state["executor"].shutdown(wait=True)
+
+    print_section("TEST SUMMARY")
+    for test_name, result in results.items():
+        symbol = "[OK]" if result else "[XX]"
+        print(f"    {symbol} {test_name:<30} {'PASS' if result else 'FAIL'}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+增量/向量化实现与批量参考实现的一致性验证脚本（不需要 API 密钥）
+
+测试项目：
+1. StreamingAnalyzer vs TechnicalAnalyzer（定长滑动窗口）
+2. StreamingAnalyzer vs TechnicalAnalyzer（增长窗口）
+3. CandleStore 缓冲喂增量指标：实时 tick 以 append/revise 为主，结果与全量历史一致
+4. LevelEngine.score_levels vs LevelScoring.score_multi_tf（逐个关键位）
+5. ExtremaStream vs extrema_levels（滑动窗口 + 未收盘K线修正 + 时间跳变）
+6. VolumeProfileStream vs VolumeProfile.from_klines（滑动窗口 + 未收盘K线修正）
+7. 降级 tick（cached_htf）的高周期缓存不落后于传入的收盘K线
+
+数据为固定种子生成的随机游走K线，结果可复现。
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rl.core.agent import TradingAgent
+from rl.core.replay import ReplayClient
+from rl.core.tick_budget import CACHED_HTF, FULL
+from rl.market_analysis.candle_store import CandleStore
+from rl.market_analysis.extrema import ExtremaStream, extrema_levels
+from rl.market_analysis.indicators import TechnicalAnalyzer
+from rl.market_analysis.level_engine import candle_columns
+from rl.market_analysis.levels import LevelScoring
+from rl.market_analysis.volume_profile import VolumeProfile, VolumeProfileStream
+from rl.monitoring.metrics import registry as metrics_registry
+
+TF_WEIGHTS = {"1m": 0.10, "15m": 0.55, "8h": 0.25, "1w": 0.10}
+# 向量化打分与逐个打分的浮点求和顺序不同，允许的最大绝对误差
+SCORE_TOL = 1e-9
+# 成交量按增减维护，允许的相对误差（定期重算会消除累计误差）
+VOLUME_RTOL = 1e-9
+
+INDICATOR_KEYS = (
+    "ema_7", "ema_25", "ema_99", "rsi", "macd", "macd_signal",
+    "macd_histogram", "atr", "volume_ratio", "trend",
+)
+
+
+def print_section(title):
+    """打印分隔线"""
+    print("\n" + "="*80)
+    print(f"  {title}")
+    print("="*80)
+
+
+def make_klines(n, seed=3, start=1700000000, step=60, base=60000.0):
+    """随机游走K线（秒级时间戳）"""
+    rng = np.random.default_rng(seed)
+    closes = base * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    klines = []
+    prev = closes[0]
+    for i, close in enumerate(closes):
+        close = float(close)
+        klines.append({
+            "time": start + i * step,
+            "open": float(prev),
+            "high": max(prev, close) * (1 + abs(rng.normal(0, 0.001))),
+            "low": min(prev, close) * (1 - abs(rng.normal(0, 0.001))),
+            "close": close,
+            "volume": float(rng.gamma(2, 5)),
+        })
+        prev = close
+    return klines
+
+
+def intrabar_ticks(candle, rng, count=3):
+    """一根K线收盘前的若干次未收盘状态，最后一次为收盘值"""
+    ticks = []
+    for j in range(1, count + 1):
+        frac = j / count
+        close = candle["open"] + (candle["close"] - candle["open"]) * frac + (
+            rng.normal(0, 5) if j < count else 0.0
+        )
+        ticks.append({
+            **candle,
+            "high": max(candle["open"], close) if j < count else candle["high"],
+            "low": min(candle["open"], close) if j < count else candle["low"],
+            "close": close,
+            "volume": candle["volume"] * frac,
+        })
+    return ticks
+
+
+def max_diff(a, b):
+    """两份指标结果的最大差异（trend 不同视为无穷大）"""
+    worst = 0.0
+    for key in INDICATOR_KEYS:
+        if key == "trend":
+            if a[key] != b[key]:
+                return float("inf")
+            continue
+        worst = max(worst, abs(a[key] - b[key]))
+    return worst
+
+
+def stream_counts(tf):
+    counter = metrics_registry.get("indicator_stream_updates_total")
+    if counter is None:
+        return {}
+    return {result: counter.get(tf=tf, result=result) for result in ("append", "revise", "rebuild")}
+
+
+def test_streaming_sliding():
+    """测试1: 定长滑动窗口（每根新K线窗口起点后移）"""
+    print_section("TEST 1: StreamingAnalyzer vs TechnicalAnalyzer (Sliding Window)")
+    try:
+        klines = make_klines(400)
+        rng = np.random.default_rng(5)
+        stream, batch = TechnicalAnalyzer(), TechnicalAnalyzer()
+        worst, checks = 0.0, 0
+        for i in range(150, len(klines)):
+            for tick in intrabar_ticks(klines[i], rng):
+                window = klines[i - 149:i] + [tick]
+                worst = max(worst, max_diff(stream.analyze(window, stream="eq_slide"), batch.analyze(window)))
+                checks += 1
+        print(f"Checks: {checks}, Max Diff: {worst:.3e}")
+        assert worst == 0.0, worst
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def test_streaming_growing():
+    """测试2: 增长窗口（起点固定，走 append/revise）"""
+    print_section("TEST 2: StreamingAnalyzer vs TechnicalAnalyzer (Growing Window)")
+    try:
+        klines = make_klines(300, seed=4)
+        rng = np.random.default_rng(6)
+        stream, batch = TechnicalAnalyzer(), TechnicalAnalyzer()
+        before = stream_counts("eq_grow")
+        worst = 0.0
+        for i in range(1, len(klines)):
+            for tick in intrabar_ticks(klines[i], rng):
+                window = klines[:i] + [tick]
+                worst = max(worst, max_diff(stream.analyze(window, stream="eq_grow"), batch.analyze(window)))
+        after = stream_counts("eq_grow")
+        counts = {k: after[k] - before.get(k, 0) for k in after}
+        print(f"Updates: {counts}, Max Diff: {worst:.3e}")
+        assert worst == 0.0, worst
+        assert counts["rebuild"] == 1, counts
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def test_store_fed_stream():
+    """测试3: 按 agent 的方式喂 CandleStore 缓冲（缓冲写满后起点后移）"""
+    print_section("TEST 3: CandleStore-Fed Stream (Live Ticks)")
+    try:
+        klines = make_klines(700, seed=8)
+        rng = np.random.default_rng(9)
+        store = CandleStore({"1m": 300})
+        stream, batch = TechnicalAnalyzer(), TechnicalAnalyzer()
+        before = stream_counts("eq_store")
+        worst = 0.0
+        for i in range(150, len(klines)):
+            for tick in intrabar_ticks(klines[i], rng):
+                # 每个 tick 拉取最近 150 根（最后一根未收盘）写入缓冲，指标读整段缓冲
+                store.ingest("1m", klines[i - 149:i] + [tick])
+                result = stream.analyze(store.window("1m"), stream="eq_store", anchored=True)
+                # 参考：从首次拉取窗口的第一根开始的全量历史
+                worst = max(worst, max_diff(result, batch.analyze(klines[1:i] + [tick])))
+        after = stream_counts("eq_store")
+        counts = {k: after[k] - before.get(k, 0) for k in after}
+        total = sum(counts.values())
+        incremental = (counts["append"] + counts["revise"]) / total
+        print(f"Updates: {counts}, Incremental: {incremental:.1%}, Max Diff: {worst:.3e}")
+        assert counts["rebuild"] == 1, counts
+        assert worst == 0.0, worst
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def test_level_scoring():
+    """测试4: 向量化关键位打分与逐个打分"""
+    print_section("TEST 4: LevelEngine.score_levels vs score_multi_tf")
+    try:
+        klines_by_tf = {
+            "1m": make_klines(150, seed=11),
+            "15m": make_klines(150, seed=12, step=900),
+            "8h": make_klines(150, seed=13, step=28800),
+            "1w": make_klines(50, seed=14, step=604800),
+        }
+        rng = np.random.default_rng(15)
+        # 贴近K线的价位（有触及）和远离的随机价位
+        levels = [k["close"] for k in klines_by_tf["15m"][::5]]
+        levels += (60000 * np.exp(rng.normal(0, 0.05, 30))).tolist()
+        extra = [{"orderbook_bid_wall": float(rng.random())} if i % 3 == 0 else None for i in range(len(levels))]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            scoring = LevelScoring(os.path.join(tmp, "level_weights.json"))
+            columns = {tf: candle_columns(kl) for tf, kl in klines_by_tf.items()}
+            vectorized = scoring.engine.score_levels(levels, columns, TF_WEIGHTS, scoring.weights, extra)
+            worst = 0.0
+            for level, extra_features, vec in zip(levels, extra, vectorized):
+                ref = scoring.score_multi_tf(level, klines_by_tf, TF_WEIGHTS, extra_features)
+                assert set(ref["features"]) == set(vec["features"]), level
+                worst = max(worst, abs(ref["score"] - vec["score"]))
+                for name, value in ref["features"].items():
+                    worst = max(worst, abs(value - vec["features"][name]))
+        print(f"Levels: {len(levels)}, Max Diff: {worst:.3e}")
+        assert worst <= SCORE_TOL, worst
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def rounded(klines, step=10.0):
+    """价格取整到 step，制造相等的高低点（检验 >= 与 > 的区别）"""
+    return [
+        {**k, **{name: round(k[name] / step) * step for name in ("open", "high", "low", "close")}}
+        for k in klines
+    ]
+
+
+def test_extrema_stream():
+    """测试5: 增量极值与批量极值"""
+    print_section("TEST 5: ExtremaStream vs extrema_levels")
+    try:
+        klines = rounded(make_klines(500, seed=21))
+        # 中途K线时间出现缺口（如断线一小时），时间仍递增，增量状态应能接上
+        klines = klines[:300] + [{**k, "time": k["time"] + 3600} for k in klines[300:]]
+        rng = np.random.default_rng(22)
+        checks = 0
+        for window, strict in ((5, False), (3, True)):
+            list_stream = ExtremaStream(window, strict)
+            store_stream = ExtremaStream(window, strict)
+            store = CandleStore({"1m": 300})
+            for i in range(150, len(klines)):
+                for tick in rounded(intrabar_ticks(klines[i], rng)):
+                    fetched = klines[i - 149:i] + [tick]
+                    expected = sorted(extrema_levels(fetched, window, strict))
+                    assert sorted(list_stream.levels(fetched)) == expected, (window, strict, i)
+                    # agent 路径：写入环形缓冲后按列读取的窗口视图
+                    view = store.ingest("1m", fetched)
+                    assert sorted(store_stream.levels(view)) == expected, (window, strict, i, "store")
+                    checks += 2
+            # 时间回退（回放重启），只能整体重建
+            fetched = klines[1:151]
+            assert sorted(list_stream.levels(fetched)) == sorted(extrema_levels(fetched, window, strict))
+            print(f"window={window} strict={strict}: rebuilds list={list_stream.rebuilds} "
+                  f"store={store_stream.rebuilds}")
+            assert list_stream.rebuilds == 2 and store_stream.rebuilds == 1
+        print(f"Checks: {checks}")
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def test_volume_profile_stream():
+    """测试6: 增量成交量分布与整段重建"""
+    print_section("TEST 6: VolumeProfileStream vs VolumeProfile.from_klines")
+    try:
+        # 成交量取整制造同量分箱，检验 top_nodes 的同量排序
+        klines = [{**k, "volume": float(round(k["volume"]))} for k in make_klines(900, seed=31)]
+        rng = np.random.default_rng(32)
+        stream = VolumeProfileStream()
+        store_stream = VolumeProfileStream()
+        store = CandleStore({"1m": 300})
+        worst, checks = 0.0, 0
+        for i in range(150, len(klines)):
+            for tick in intrabar_ticks(klines[i], rng):
+                fetched = klines[i - 149:i] + [tick]
+                price = tick["close"]
+                for profile_stream, window in ((stream, fetched), (store_stream, store.ingest("1m", fetched))):
+                    profile = profile_stream.update(window, price=price)
+                    expected = VolumeProfile.from_klines(fetched, profile.bin_size)
+                    assert profile.top_nodes(8) == expected.top_nodes(8), (i, "top_nodes")
+                    assert profile.touched(3) == expected.touched(3), (i, "touched")
+                    hist, ref = profile.histogram(), expected.histogram()
+                    assert hist.keys() == ref.keys(), (i, "bins")
+                    for key, volume in ref.items():
+                        worst = max(worst, abs(hist[key] - volume) / max(volume, 1.0))
+                    checks += 1
+        print(f"Checks: {checks}, Rebuilds: list={stream.rebuilds} store={store_stream.rebuilds}, "
+              f"Max Rel Diff: {worst:.3e}")
+        assert worst <= VOLUME_RTOL, worst
+        # 分箱宽度随价格吸附变化时才重建，绝大多数 tick 走增量
+        assert stream.rebuilds < checks // 20, stream.rebuilds
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def test_htf_cache_degraded():
+    """测试7: FULL tick 之间插入降级 tick，高周期缓存与当前收盘K线的批量分析一致"""
+    print_section("TEST 7: HTF Cache on Degraded Ticks")
+    try:
+        k1m = make_klines(400, seed=41)
+        k15m = make_klines(400, seed=42, step=900)
+        k8h = make_klines(200, seed=43, step=28800)
+        k1w = make_klines(60, seed=44, step=604800)
+        batch = TechnicalAnalyzer()
+
+        def tick(agent, j, degrade):
+            return agent.analyze_market(
+                k1m[j:j + 150], k15m[j:j + 150], k8h[j:j + 150], k1w[:50], None, degrade=degrade
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = TradingAgent(ReplayClient(), data_dir=tmp)
+            # 第一次降级写入缓存，之后若干 FULL tick 期间出现新的 8h 收盘K线
+            tick(agent, 0, CACHED_HTF)
+            seeded = agent._htf_cache["8h"]["key"]
+            for j in range(1, 6):
+                tick(agent, j, FULL)
+            tick(agent, 5, CACHED_HTF)
+            entry = agent._htf_cache["8h"]
+            closed = k8h[5:5 + 149]
+            print(f"Seeded Key: {seeded}, After Degraded Tick: {entry['key']}, Expected: {closed[-1]['time']}")
+            assert entry["key"] == closed[-1]["time"]
+            assert max_diff(entry["analysis"], batch.analyze(closed)) == 0.0
+            # 降级 tick 传入上次拉取的旧K线：沿用更新的缓存，不回退
+            tick(agent, 3, CACHED_HTF)
+            assert agent._htf_cache["8h"]["key"] == closed[-1]["time"]
+        print("Result: PASS")
+        return True
+    except Exception as e:
+        print(f"Result: FAIL - {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def main():
+    """主测试流程"""
+    print(f"\nStart Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    results = {}
+    results["Streaming Sliding"] = test_streaming_sliding() is not None
+    results["Streaming Growing"] = test_streaming_growing() is not None
+    results["Store-Fed Stream"] = test_store_fed_stream() is not None
+    results["Level Scoring"] = test_level_scoring() is not None
+    results["Extrema Stream"] = test_extrema_stream() is not None
+    results["Volume Profile Stream"] = test_volume_profile_stream() is not None
+    results["HTF Cache Degraded"] = test_htf_cache_degraded() is not None
+
+    print_section("TEST SUMMARY")
+    for test_name, result in results.items():
+        symbol = "[OK]" if result else "[XX]"
+        print(f"    {symbol} {test_name:<30} {'PASS' if result else 'FAIL'}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
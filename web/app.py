@@ -1,13 +1,16 @@
 import json
+import multiprocessing
 import os
 import sqlite3
 import threading
 import time
+import uuid
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 import requests
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 
 import sys
 
@@ -16,11 +19,27 @@ if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
 from client import BinanceFuturesClient
+from config import DEFAULT_SYMBOL
 from rl.core.agent import TradingAgent
+from rl.core.orchestrator import AgentOrchestrator, MarketDataFeed
+from rl.core.recorder import TickRecorder, list_sessions
+from rl.core.scheduler import CandleScheduler
+from rl.core.shadow import ShadowEvaluator
+from rl.core.tick_budget import CACHED_HTF, EXITS_ONLY, NO_ORDERBOOK, TickBudget
+from rl.core.warm_start import WarmStartStore
+from rl.execution.exit_watchdog import ExitWatchdog
+from rl.monitoring.metrics import STAGE_METRIC, registry as metrics
+from rl.monitoring.profiler import profiler
+from rl.monitoring.startup import lazy_component, startup_profile
+from rl.position.position_journal import load_positions, save_positions
+
+startup_profile.mark("imports")
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "trading.db")
 RL_DATA_DIR = os.path.join(BASE_DIR, "rl_data")
 LOG_FILE = os.path.join(RL_DATA_DIR, "agent.log")
+RECORDINGS_DIR = os.path.join(RL_DATA_DIR, "recordings")
+SHADOW_FILE = os.path.join(RL_DATA_DIR, "shadow_variants.json")
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -41,10 +60,37 @@ agent_state = {
     "logs": deque(maxlen=200),
     "last_update": None,
     "last_stop_reason": None,
-    "config": {"leverage": 10},
+    "config": {
+        "leverage": 10,
+        "symbol": DEFAULT_SYMBOL,
+        "incremental": os.getenv("RL_INCREMENTAL", "0") == "1",
+        "exit_watchdog": os.getenv("RL_EXIT_WATCHDOG", "1") == "1",
+        "protective_orders": os.getenv("RL_PROTECTIVE_ORDERS", "0") == "1",
+        "record_ticks": os.getenv("RL_RECORD_TICKS", "0") == "1",
+        "tick_deadline": _safe_float(os.getenv("RL_TICK_DEADLINE"), 20.0),
+        "warm_start": os.getenv("RL_WARM_START", "1") == "1",
+    },
+    "orchestrator": None,
+    # 单 agent 与多币种编排共用同一账户，同一时间只允许运行一种
+    "mode_lock": threading.Lock(),
+    "scheduler": None,
+    "watchdog": None,
+    "recorder": None,
+    "tick_budget": None,
+    "shadow": None,
+    "warm_start": None,
 }
 
 
+def _request_symbol() -> str:
+    """请求中的 symbol 参数（query 或 JSON），缺省为单 agent 当前交易的 symbol"""
+    data = request.get_json(silent=True) or {}
+    symbol = request.args.get("symbol") or data.get("symbol")
+    if not symbol:
+        symbol = agent_state.get("config", {}).get("symbol", DEFAULT_SYMBOL)
+    return str(symbol).upper()
+
+
 def add_log(message: str, level: str = "INFO") -> None:
     timestamp = datetime.now().strftime("%H:%M:%S")
     agent_state["logs"].append(
@@ -97,21 +143,26 @@ def save_api_keys(api_key: str, api_secret: str) -> None:
     conn.close()
 
 
-def get_client():
-    keys = get_api_keys()
-    if not keys:
-        return None
+def make_client(api_key: str, api_secret: str):
     client = BinanceFuturesClient.__new__(BinanceFuturesClient)
     client.base_url = "https://testnet.binancefuture.com"
-    client.api_key = keys[0]
-    client.api_secret = keys[1]
+    client.api_key = api_key
+    client.api_secret = api_secret
     client.session = requests.Session()
     client.session.headers.update({"X-MBX-APIKEY": client.api_key})
     client.time_offset = 0
+    client._symbol_filters = {}
     client._sync_time()
     return client
 
 
+def get_client():
+    keys = get_api_keys()
+    if not keys:
+        return None
+    return make_client(keys[0], keys[1])
+
+
 def get_mainnet_klines(symbol: str, interval: str, limit: int = 150):
     base_url = "https://fapi.binance.com"
     res = requests.get(
@@ -122,6 +173,16 @@ def get_mainnet_klines(symbol: str, interval: str, limit: int = 150):
     return res.json()
 
 
+def get_mainnet_price(symbol: str) -> float:
+    base_url = "https://fapi.binance.com"
+    res = requests.get(
+        f"{base_url}/fapi/v1/ticker/price",
+        params={"symbol": symbol},
+        timeout=5,
+    )
+    return _safe_float(res.json().get("price"))
+
+
 def get_mainnet_order_book(symbol: str, limit: int = 100):
     base_url = "https://fapi.binance.com"
     res = requests.get(
@@ -165,6 +226,73 @@ def convert_order_book(depth):
     return {"bids": bids, "asks": asks}
 
 
+def _log_trade_learning(trade):
+    update = trade.get("weight_update")
+    if not update:
+        return
+    delta = update.get("delta", {})
+    lines = []
+    for k, v in delta.items():
+        if abs(v) >= 0.0001:
+            lines.append(f"{k}: {v:+.4f}")
+    strategy = trade.get("strategy_params") or {}
+    reward = trade.get("reward")
+    if lines or strategy or reward is not None:
+        parts = []
+        if reward is not None:
+            parts.append(f"reward={reward:+.2f}")
+        if strategy:
+            parts.append(
+                "参数:入场偏移={bias:+.2f},锁利起点={start:.2f},回撤={drop:.2f},斜率={slope:.2f}".format(
+                    bias=strategy.get("entry_threshold_bias", 0),
+                    start=strategy.get("profit_lock_start", 0),
+                    drop=strategy.get("profit_lock_base_drop", 0),
+                    slope=strategy.get("profit_lock_slope", 0),
+                )
+            )
+        if lines:
+            parts.append("权重变化:" + ", ".join(lines))
+        add_log(
+            "学习链: " + " | ".join(parts),
+            "INFO",
+        )
+
+
+def _log_exit_trade(trade):
+    outcome = "盈利" if trade["pnl"] >= 0 else "亏损"
+    add_log(
+        f"平仓 {trade['trade_id'][:8]} {outcome} PnL={trade['pnl']:.2f} ({trade['pnl_percent']:.2f}%) 原因={trade['exit_reason']}",
+        "SUCCESS" if trade["pnl"] >= 0 else "WARNING",
+    )
+    _log_trade_learning(trade)
+
+
+def _log_order_events(events):
+    for event in events:
+        if event["type"] == "entry_filled":
+            pos = event["position"]
+            add_log(
+                f"入场成交 {pos['trade_id'][:8]} {pos['direction']} 数量={pos['quantity']} 价={pos['entry_price']:.2f}",
+                "SUCCESS",
+            )
+        elif event["type"] == "entry_failed":
+            add_log(f"入场未成交 {event['trade_id'][:8]}: {event['error']}", "WARNING")
+        elif event["type"] == "exit_filled":
+            _log_exit_trade(event["trade"])
+        elif event["type"] == "exit_unfilled":
+            add_log(f"平仓挂单未成交 {event['trade_id'][:8]}，下一轮重新评估", "WARNING")
+
+
+def _run_exits_only(agent, price):
+    """tick 降级为只检查出场：价格类规则 + 上一轮分析的支撑阻力"""
+    for pos, decision in agent.check_exit_price(price):
+        trade = agent.execute_exit_position(pos, price, decision.reason, decision.confirmations)
+        if trade:
+            _log_exit_trade(trade)
+        elif pos.get("exit_pending"):
+            add_log(f"平仓挂单 {pos['trade_id'][:8]} 原因={decision.reason}", "INFO")
+
+
 def run_agent_loop():
     os.makedirs(RL_DATA_DIR, exist_ok=True)
     client = get_client()
@@ -175,8 +303,38 @@ def run_agent_loop():
         return
 
     leverage = agent_state.get("config", {}).get("leverage", 10)
-    agent = TradingAgent(client, data_dir=RL_DATA_DIR, leverage=leverage)
+    symbol = agent_state.get("config", {}).get("symbol", DEFAULT_SYMBOL)
+    recorder = None
+    agent_client = client
+    if agent_state["config"].get("record_ticks"):
+        # 录制每个 tick 的原始输入，异常决策可离线回放复现
+        recorder = TickRecorder(RECORDINGS_DIR, symbol)
+        agent_client = recorder.wrap_client(client)
+    agent_state["recorder"] = recorder
+    agent = TradingAgent(
+        agent_client,
+        data_dir=RL_DATA_DIR,
+        leverage=leverage,
+        symbol=symbol,
+        incremental=agent_state["config"].get("incremental", False),
+        async_orders=True,
+        protective_orders=agent_state["config"].get("protective_orders", False),
+    )
     agent_state["agent"] = agent
+    warm_start = None
+    if agent_state["config"].get("warm_start"):
+        # 恢复上次运行的内存状态（持仓出场状态、行情状态历史、K线与高周期缓存）
+        warm_start = WarmStartStore(RL_DATA_DIR)
+        restored = warm_start.restore(agent)
+        if restored:
+            add_log(
+                f"热启动: 快照 {restored['age']:.0f}s 前, 持仓状态 {restored['position_states']} 个, "
+                f"行情状态{'已恢复' if restored['market'] else '已过期未恢复'}"
+            )
+        elif warm_start.last_error:
+            add_log(f"热启动失败: {warm_start.last_error}", "WARNING")
+    agent_state["warm_start"] = warm_start
+    startup_profile.mark("agent_ready")
     add_log("Agent已启动", "SUCCESS")
     
     # Force sync positions on startup
@@ -195,37 +353,113 @@ def run_agent_loop():
     except Exception as e:
         add_log(f"启动时持仓检查失败: {str(e)}", "ERROR")
 
+    scheduler = CandleScheduler(price_probe=lambda: get_mainnet_price(symbol))
+    agent_state["scheduler"] = scheduler
+    watchdog = None
+    if agent_state["config"].get("exit_watchdog"):
+        # 逐笔价格驱动的止损/止盈检查，出场成交通过 interrupt 唤醒本循环记账
+        watchdog = ExitWatchdog(agent, price_probe=lambda: get_mainnet_price(symbol))
+        watchdog.start()
+        add_log("出场看门狗已启动")
+    agent_state["watchdog"] = watchdog
+    budget = TickBudget(
+        deadline=agent_state["config"].get("tick_deadline", 20.0),
+        on_degrade=lambda e: add_log(
+            f"tick 降级: {e['level']} ({e['reason']}, 已用 {e['elapsed']:.2f}s)", "WARNING"
+        ),
+    )
+    agent_state["tick_budget"] = budget
+    shadow = None
+    try:
+        # 影子变体：共享本轮 market，各自按纸面持仓评估
+        shadow = ShadowEvaluator.from_file(agent, SHADOW_FILE)
+        if shadow.variants:
+            add_log(f"影子变体已加载: {len(shadow.variants)} 个")
+    except Exception as exc:
+        add_log(f"影子变体加载失败: {exc}", "WARNING")
+    agent_state["shadow"] = shadow
+    htf_klines = {}
+    profiler.attach()
     while agent_state["running"]:
+        event = scheduler.wait_next(
+            lambda: not agent_state["running"],
+            interrupt=agent.has_order_events,
+            heartbeat=bool(agent.positions),
+        )
+        if event["reason"] == "stopped":
+            break
+        profiler.tick_begin()
         try:
-            kl_1m = get_mainnet_klines("BTCUSDT", "1m", 150)
-            kl_15m = get_mainnet_klines("BTCUSDT", "15m", 150)
-            kl_8h = get_mainnet_klines("BTCUSDT", "8h", 150)
-            kl_1w = get_mainnet_klines("BTCUSDT", "1w", 50)
-            order_book = None
-            try:
-                depth = get_mainnet_order_book("BTCUSDT", 100)
-                if isinstance(depth, dict):
-                    order_book = convert_order_book(depth)
-            except Exception:
-                order_book = None
-
-            market = agent.analyze_market(
-                convert_klines(kl_1m),
-                convert_klines(kl_15m),
-                convert_klines(kl_8h),
-                convert_klines(kl_1w),
-                order_book,
+            tick_start = time.perf_counter()
+            budget.begin()
+            with metrics.stage("order_events"):
+                _log_order_events(agent.process_order_events())
+            with metrics.stage("account_reconcile"):
+                # 到期才请求交易所余额；入场仓位计算只读本地账户模型
+                agent.account.maybe_reconcile()
+            if event["reason"] == "interrupt":
+                profiler.tick_end()
+                continue
+            with budget.stage("fetch_1m"):
+                klines_1m = convert_klines(get_mainnet_klines(symbol, "1m", 150))
+            fingerprint = scheduler.fingerprint(klines_1m)
+            # 指纹只看已收盘K线：价格变动唤醒强制分析；心跳唤醒且有持仓时强制分析，保证时间类出场条件被检查
+            force = event["reason"] == "price_move" or (
+                event["reason"] == "heartbeat" and bool(agent.positions)
             )
+            if not scheduler.has_changed(fingerprint, force=force):
+                profiler.tick_end()
+                continue
+            with budget.stage("fetch_15m"):
+                klines_15m = convert_klines(get_mainnet_klines(symbol, "15m", 150))
+            budget.plan()
+            # 降级到 cached_htf 后不再拉 8h/1w，沿用上一次拉到的K线（首个 tick 仍需拉取）
+            if budget.allows(CACHED_HTF) or (not htf_klines and budget.allows(EXITS_ONLY)):
+                with budget.stage("fetch_htf"):
+                    for interval, limit in (("8h", 150), ("1w", 50)):
+                        with metrics.stage(f"fetch_{interval}"):
+                            htf_klines[interval] = convert_klines(get_mainnet_klines(symbol, interval, limit))
+                budget.plan()
+            order_book = None
+            if budget.allows(NO_ORDERBOOK):
+                try:
+                    with budget.stage("fetch_orderbook"):
+                        depth = get_mainnet_order_book(symbol, 100)
+                    if isinstance(depth, dict):
+                        order_book = convert_order_book(depth)
+                except Exception:
+                    order_book = None
+                budget.plan()
+
+            if not budget.allows(EXITS_ONLY):
+                # 剩余时间不够完整分析：只按最新价检查出场，不标记指纹，下一轮重新分析
+                if klines_1m:
+                    with budget.stage("decide"):
+                        _run_exits_only(agent, klines_1m[-1]["close"])
+                budget.end()
+                profiler.tick_end()
+                continue
+
+            klines = {"1m": klines_1m, "15m": klines_15m, "8h": htf_klines["8h"], "1w": htf_klines["1w"]}
+            tick_time = time.time()
+            with budget.stage("analyze_market"):
+                market = agent.analyze_market(
+                    klines["1m"], klines["15m"], klines["8h"], klines["1w"], order_book,
+                    degrade=budget.level,
+                )
 
             if not market:
+                metrics.inc("agent_errors_total", stage="analyze_market")
                 add_log("市场分析失败，等待下一轮", "WARNING")
+                profiler.tick_end()
                 time.sleep(5)
                 continue
 
             price = market.get("current_price", 0)
             best_support = market.get("best_support")
             best_resistance = market.get("best_resistance")
-            scores = agent.get_current_scores(market)
+            with metrics.stage("get_current_scores"):
+                scores = agent.get_current_scores(market)
             tf_weights = market.get("tf_weights") or {}
 
             if best_support and best_support.get("price") is not None:
@@ -260,73 +494,79 @@ def run_agent_loop():
                 "INFO",
             )
 
-            exits = agent.check_exit_all(price, market)
-            for pos, decision in exits:
-                trade = agent.execute_exit_position(
-                    pos, price, decision.reason, decision.confirmations
-                )
-                if trade:
-                    outcome = "盈利" if trade["pnl"] >= 0 else "亏损"
-                    add_log(
-                        f"平仓 {trade['trade_id'][:8]} {outcome} PnL={trade['pnl']:.2f} ({trade['pnl_percent']:.2f}%) 原因={trade['exit_reason']}",
-                        "SUCCESS" if trade["pnl"] >= 0 else "WARNING",
-                    )
-                    update = trade.get("weight_update")
-                    if update:
-                        delta = update.get("delta", {})
-                        lines = []
-                        for k, v in delta.items():
-                            if abs(v) >= 0.0001:
-                                lines.append(f"{k}: {v:+.4f}")
-                        strategy = trade.get("strategy_params") or {}
-                        reward = trade.get("reward")
-                        if lines or strategy or reward is not None:
-                            parts = []
-                            if reward is not None:
-                                parts.append(f"reward={reward:+.2f}")
-                            if strategy:
-                                parts.append(
-                                    "参数:入场偏移={bias:+.2f},锁利起点={start:.2f},回撤={drop:.2f},斜率={slope:.2f}".format(
-                                        bias=strategy.get("entry_threshold_bias", 0),
-                                        start=strategy.get("profit_lock_start", 0),
-                                        drop=strategy.get("profit_lock_base_drop", 0),
-                                        slope=strategy.get("profit_lock_slope", 0),
-                                    )
-                                )
-                            if lines:
-                                parts.append("权重变化:" + ", ".join(lines))
-                            add_log(
-                                "学习链: " + " | ".join(parts),
-                                "INFO",
-                            )
-
-            signal = agent.should_enter(market)
-            if signal:
-                pos = agent.execute_entry(market, signal)
-                if pos and "error" not in pos:
-                    effective_threshold = signal.get("effective_threshold")
-                    if effective_threshold is None:
-                        effective_threshold = signal.get("threshold", {}).get("threshold")
-                    add_log(
-                        "入场 {direction} 价={price:.2f} 分数={score:.0f} 阈值={threshold:.0f} "
-                        "SL={sl:.2f} TP={tp:.2f} 杠杆={lev}x".format(
-                            direction=signal["direction"],
-                            price=price,
-                            score=signal.get("strength", 0),
-                            threshold=effective_threshold or 0,
-                            sl=pos.get("stop_loss", 0),
-                            tp=pos.get("take_profit", 0),
-                            lev=pos.get("leverage", leverage),
-                        ),
-                        "SUCCESS",
+            with budget.stage("decide"):
+                with metrics.stage("check_exit_all"):
+                    exits = agent.check_exit_all(price, market)
+                for pos, decision in exits:
+                    trade = agent.execute_exit_position(
+                        pos, price, decision.reason, decision.confirmations
                     )
-                elif pos and "error" in pos:
-                    add_log(f"入场失败: {pos['error']}", "WARNING")
+                    if trade:
+                        _log_exit_trade(trade)
+                    elif pos.get("exit_pending"):
+                        add_log(f"平仓挂单 {pos['trade_id'][:8]} 原因={decision.reason}", "INFO")
+
+                with metrics.stage("should_enter"):
+                    signal = agent.should_enter(market)
+                if signal:
+                    with metrics.stage("execute_entry"):
+                        pos = agent.execute_entry(market, signal)
+                    if pos and "error" not in pos:
+                        effective_threshold = signal.get("effective_threshold")
+                        if effective_threshold is None:
+                            effective_threshold = signal.get("threshold", {}).get("threshold")
+                        add_log(
+                            "入场{pending} {direction} 价={price:.2f} 分数={score:.0f} 阈值={threshold:.0f} "
+                            "SL={sl:.2f} TP={tp:.2f} 杠杆={lev}x".format(
+                                pending="挂单" if pos.get("order_state") else "",
+                                direction=signal["direction"],
+                                price=price,
+                                score=signal.get("strength", 0),
+                                threshold=effective_threshold or 0,
+                                sl=pos.get("stop_loss", 0),
+                                tp=pos.get("take_profit", 0),
+                                lev=pos.get("leverage", leverage),
+                            ),
+                            "SUCCESS",
+                        )
+                    elif pos and "error" in pos:
+                        add_log(f"入场失败: {pos['error']}", "WARNING")
 
-            time.sleep(10)
+            if shadow is not None and shadow.variants:
+                try:
+                    with metrics.stage("shadow"):
+                        shadow.on_market(market)
+                except Exception as exc:
+                    metrics.inc("agent_errors_total", stage="shadow")
+                    add_log(f"影子变体评估失败: {exc}", "WARNING")
+            if recorder is not None:
+                try:
+                    with metrics.stage("record_tick"):
+                        recorder.record(klines, order_book, t=tick_time)
+                except Exception as exc:
+                    metrics.inc("agent_errors_total", stage="record_tick")
+                    add_log(f"tick 录制失败: {exc}", "WARNING")
+            if warm_start is not None:
+                with metrics.stage("warm_start"):
+                    warm_start.maybe_save(agent)
+            budget.end()
+            scheduler.mark_processed(fingerprint, price)
+            if "first_tick" not in startup_profile.marks:
+                startup_profile.mark("first_tick")
+                add_log(f"冷启动: {startup_profile.summary_line()}")
+            metrics.observe(STAGE_METRIC, time.perf_counter() - tick_start, stage="tick")
+            profiler.tick_end()
         except Exception as exc:
+            profiler.tick_end()
+            metrics.inc("agent_errors_total", stage="loop")
             add_log(f"Agent循环异常: {exc}", "ERROR")
             time.sleep(5)
+    if watchdog is not None:
+        watchdog.stop()
+    if recorder is not None:
+        recorder.close()
+    if warm_start is not None:
+        warm_start.close(agent)
 
 
 def run_agent_loop_with_restart():
@@ -341,6 +581,385 @@ def run_agent_loop_with_restart():
             time.sleep(min(60, 5 * retries))
 
 
+# ========== 回测任务（独立进程，不与实盘 agent 争抢 GIL）==========
+BACKTEST_MAX_WORKERS = 1
+BACKTEST_TERMINAL = ("finished", "failed", "cancelled")
+
+backtest_state = {
+    "lock": threading.Lock(),
+    "jobs": {},
+    "executor": None,
+    "manager": None,
+    "progress_queue": None,
+    "cancel_flags": None,
+    "pump": None,
+}
+
+
+class BacktestCancelled(Exception):
+    pass
+
+
+def _run_backtest_job(job_id, params, progress_queue, cancel_flags):
+    """在子进程中运行回测，进度通过 Manager 队列回传"""
+    if cancel_flags.get(job_id):
+        return {"cancelled": True}
+    progress_queue.put((job_id, {"progress": 0.0, "balance": params["initial_balance"]}))
+    from backtest_trainer import BacktestTrainer
+
+    def _progress(info):
+        if cancel_flags.get(job_id):
+            raise BacktestCancelled()
+        progress_queue.put((job_id, info))
+
+    trainer = BacktestTrainer(
+        data_dir=params["data_dir"],
+        initial_balance=params["initial_balance"],
+        leverage=params["leverage"],
+        train_real=False,
+        progress_callback=_progress,
+    )
+    run = trainer.run_random_backtest if params.get("random_mode") else trainer.run_backtest
+    try:
+        result = run(
+            csv_file=params["csv_file"],
+            max_trades=params["max_trades"],
+            start_idx=params["start_idx"],
+        )
+    except BacktestCancelled:
+        return {"cancelled": True}
+    return dict(result or {})
+
+
+def _pump_backtest_progress():
+    queue = backtest_state["progress_queue"]
+    while True:
+        try:
+            job_id, info = queue.get()
+        except (EOFError, OSError):
+            return
+        with backtest_state["lock"]:
+            job = backtest_state["jobs"].get(job_id)
+            # Manager 队列里迟到的进度不能覆盖已结束任务的最终状态
+            if not job or job["status"] in BACKTEST_TERMINAL:
+                continue
+            if job["status"] == "queued":
+                job["status"] = "running"
+                job["started_at"] = datetime.now().isoformat()
+            job["progress"] = {
+                "progress": round(_safe_float(info.get("progress")), 2),
+                "trades": int(info.get("trades", 0) or 0),
+                "balance": round(_safe_float(info.get("balance")), 2),
+                "pnl": round(_safe_float(info.get("pnl")), 2),
+            }
+            job["seq"] += 1
+
+
+def _ensure_backtest_executor():
+    with backtest_state["lock"]:
+        if backtest_state["executor"] is None:
+            # spawn：不 fork 带着 agent 线程和锁的 Web 进程
+            ctx = multiprocessing.get_context("spawn")
+            manager = ctx.Manager()
+            backtest_state["manager"] = manager
+            backtest_state["progress_queue"] = manager.Queue()
+            backtest_state["cancel_flags"] = manager.dict()
+            backtest_state["executor"] = ProcessPoolExecutor(
+                max_workers=BACKTEST_MAX_WORKERS, mp_context=ctx
+            )
+            pump = threading.Thread(target=_pump_backtest_progress, daemon=True)
+            pump.start()
+            backtest_state["pump"] = pump
+        return backtest_state["executor"]
+
+
+def _on_backtest_done(job_id, future):
+    with backtest_state["lock"]:
+        job = backtest_state["jobs"].get(job_id)
+        if not job:
+            return
+        job["finished_at"] = datetime.now().isoformat()
+        job["seq"] += 1
+        backtest_state["cancel_flags"].pop(job_id, None)
+        if future.cancelled():
+            job["status"] = "cancelled"
+            return
+        exc = future.exception()
+        if exc is not None:
+            job["status"] = "failed"
+            job["error"] = str(exc)
+            add_log(f"{job['kind']} 任务 {job_id} 失败: {exc}", "ERROR")
+            return
+        result = future.result()
+        if result.get("cancelled"):
+            job["status"] = "cancelled"
+            return
+        if result.get("error"):
+            job["status"] = "failed"
+            job["error"] = result["error"]
+            return
+        job["status"] = "finished"
+        job["result"] = result
+        job["progress"]["progress"] = 100.0
+        if job["kind"] == "replay":
+            summary = f"ticks={result.get('ticks', 0)} 入场={result.get('entries', 0)} 出场={result.get('exits', 0)}"
+        else:
+            summary = f"交易={result.get('total_trades', 0)}"
+        add_log(f"{job['kind']} 任务 {job_id} 完成: {summary}", "SUCCESS")
+
+
+def _public_job(job, include_result=False):
+    data = {k: v for k, v in job.items() if k not in ("future", "result")}
+    if include_result:
+        data["result"] = job.get("result")
+    return data
+
+
+@app.route("/api/backtest/jobs", methods=["GET", "POST"])
+def backtest_jobs():
+    if request.method == "GET":
+        with backtest_state["lock"]:
+            jobs = [_public_job(j) for j in backtest_state["jobs"].values()]
+        jobs.sort(key=lambda j: j["created_at"], reverse=True)
+        return jsonify({"jobs": jobs})
+
+    data = request.json or {}
+    csv_file = data.get("csv", "btcusdt_1m_300days.csv")
+    if not os.path.isabs(csv_file):
+        csv_file = os.path.join(BASE_DIR, csv_file)
+    if not os.path.exists(csv_file):
+        return jsonify({"error": f"CSV not found: {os.path.basename(csv_file)}"}), 400
+    params = {
+        "csv_file": csv_file,
+        "max_trades": int(data.get("max_trades", 500)),
+        "start_idx": int(data.get("start_idx", 200)),
+        "random_mode": bool(data.get("random_mode", False)),
+        "initial_balance": _safe_float(data.get("initial_balance"), 10000.0),
+        "leverage": int(data.get("leverage", 10)),
+        "data_dir": RL_DATA_DIR,
+    }
+    job = _submit_job("backtest", _run_backtest_job, params, balance=params["initial_balance"])
+    return jsonify(_public_job(job))
+
+
+def _submit_job(kind, target, params, balance=0.0):
+    """登记任务并提交到回测进程池；target(job_id, params, progress_queue, cancel_flags) 在子进程运行"""
+    executor = _ensure_backtest_executor()
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        "job_id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "params": {k: v for k, v in params.items() if k not in ("data_dir", "seed_dir", "session_dir")},
+        "progress": {"progress": 0.0, "trades": 0, "balance": balance, "pnl": 0.0},
+        "created_at": datetime.now().isoformat(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+        "seq": 0,
+    }
+    with backtest_state["lock"]:
+        backtest_state["jobs"][job_id] = job
+        # 登记和 future 在同一把锁内完成，取消请求不会看到没有 future 的任务
+        future = job["future"] = executor.submit(
+            target,
+            job_id,
+            params,
+            backtest_state["progress_queue"],
+            backtest_state["cancel_flags"],
+        )
+    # 已完成的 future 会在当前线程立即回调（回调要取锁），放在锁外
+    future.add_done_callback(lambda f, jid=job_id: _on_backtest_done(jid, f))
+    add_log(f"{kind} 任务 {job_id} 已提交", "INFO")
+    return job
+
+
+@app.route("/api/backtest/jobs/<job_id>")
+def backtest_job_detail(job_id):
+    with backtest_state["lock"]:
+        job = backtest_state["jobs"].get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(_public_job(job))
+
+
+@app.route("/api/backtest/jobs/<job_id>/cancel", methods=["POST"])
+def backtest_job_cancel(job_id):
+    with backtest_state["lock"]:
+        job = backtest_state["jobs"].get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        if job["status"] in BACKTEST_TERMINAL:
+            return jsonify({"error": f"Job already {job['status']}"}), 400
+        future = job.get("future")
+    if future is not None and future.cancel():
+        return jsonify({"success": True, "status": "cancelled"})
+    # 已在运行：通知子进程在下一次进度回调时退出
+    backtest_state["cancel_flags"][job_id] = True
+    with backtest_state["lock"]:
+        if job["status"] not in BACKTEST_TERMINAL:
+            job["status"] = "cancelling"
+            job["seq"] += 1
+    return jsonify({"success": True, "status": "cancelling"})
+
+
+@app.route("/api/backtest/jobs/<job_id>/result")
+def backtest_job_result(job_id):
+    with backtest_state["lock"]:
+        job = backtest_state["jobs"].get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        if job["status"] != "finished":
+            return jsonify({"error": f"Job is {job['status']}", "status": job["status"]}), 409
+        return jsonify(_public_job(job, include_result=True))
+
+
+def _run_replay_job(job_id, params, progress_queue, cancel_flags):
+    """在子进程中回放录制会话，进度按 tick 数回传（trades 为已平仓笔数）"""
+    if cancel_flags.get(job_id):
+        return {"cancelled": True}
+    from rl.core.replay import TickReplayer
+
+    progress_queue.put((job_id, {"progress": 0.0}))
+    replayer = TickReplayer(params["session_dir"], seed_dir=params.get("seed_dir"))
+    total = params.get("max_ticks") or replayer.recording.meta.get("ticks") or 0
+    state = {"ticks": 0, "exits": 0}
+
+    def _on_tick(decision):
+        state["ticks"] += 1
+        state["exits"] += len(decision.get("exits", []))
+        if state["ticks"] % 50:
+            return
+        if cancel_flags.get(job_id):
+            raise BacktestCancelled()
+        progress = min(99.0, state["ticks"] / total * 100) if total else 0.0
+        progress_queue.put((job_id, {"progress": progress, "trades": state["exits"]}))
+
+    try:
+        result = replayer.run(max_ticks=params.get("max_ticks"), on_tick=_on_tick)
+    except BacktestCancelled:
+        return {"cancelled": True}
+    finally:
+        replayer.close()
+    if not params.get("include_decisions", True):
+        result.pop("decisions", None)
+    return result
+
+
+@app.route("/api/startup")
+def startup_report():
+    """冷启动剖析：导入 / 构造 / 延迟构造耗时和里程碑"""
+    report = startup_profile.report()
+    agent = agent_state.get("agent")
+    report["pending_components"] = lazy_component.pending(agent) if agent else []
+    return jsonify(report)
+
+
+@app.route("/api/recordings")
+def recordings_list():
+    recorder = agent_state.get("recorder")
+    return jsonify({
+        "sessions": list_sessions(RECORDINGS_DIR),
+        "active": recorder.status() if recorder else None,
+    })
+
+
+@app.route("/api/recordings/<session>/replay", methods=["POST"])
+def recordings_replay(session):
+    names = {s["session"] for s in list_sessions(RECORDINGS_DIR)}
+    if session not in names:
+        return jsonify({"error": "Recording not found"}), 404
+    data = request.get_json(silent=True) or {}
+    max_ticks = data.get("max_ticks")
+    params = {
+        "session": session,
+        "session_dir": os.path.join(RECORDINGS_DIR, session),
+        "max_ticks": int(max_ticks) if max_ticks else None,
+        "seed_state": bool(data.get("seed_state")),
+        "seed_dir": RL_DATA_DIR if data.get("seed_state") else None,
+        "include_decisions": bool(data.get("include_decisions", True)),
+    }
+    # 与回测任务共用进程池和任务表：立即返回 job_id，进度 / 结果走 /api/backtest/jobs/<job_id>
+    job = _submit_job("replay", _run_replay_job, params)
+    return jsonify(_public_job(job))
+
+
+@app.route("/api/shadow")
+def shadow_summary():
+    shadow = agent_state.get("shadow")
+    if shadow is None:
+        return jsonify({"error": "Agent not running"}), 400
+    return jsonify(shadow.summary())
+
+
+@app.route("/api/shadow/variants", methods=["GET", "POST"])
+def shadow_variants():
+    shadow = agent_state.get("shadow")
+    if request.method == "GET":
+        if shadow is not None:
+            return jsonify({"variants": [v.config() for v in shadow.variants]})
+        variants = []
+        if os.path.exists(SHADOW_FILE):
+            with open(SHADOW_FILE, "r", encoding="utf-8") as f:
+                variants = json.load(f)
+        return jsonify({"variants": variants})
+    data = request.get_json(silent=True) or {}
+    variants = data.get("variants")
+    if not isinstance(variants, list) or any(not isinstance(v, dict) or not v.get("name") for v in variants):
+        return jsonify({"error": "variants must be a list of objects with a name"}), 400
+    if shadow is not None:
+        try:
+            shadow.set_variants(variants)
+        except (ValueError, TypeError, KeyError) as exc:
+            return jsonify({"error": str(exc)}), 400
+    tmp = SHADOW_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(variants, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, SHADOW_FILE)
+    add_log(f"影子变体已更新: {len(variants)} 个", "INFO")
+    return jsonify({"success": True, "variants": variants})
+
+
+@app.route("/api/shadow/variants/<name>")
+def shadow_variant_detail(name):
+    shadow = agent_state.get("shadow")
+    if shadow is None:
+        return jsonify({"error": "Agent not running"}), 400
+    detail = shadow.variant_detail(name)
+    if detail is None:
+        return jsonify({"error": "Variant not found"}), 404
+    return jsonify(detail)
+
+
+@app.route("/api/backtest/jobs/<job_id>/stream")
+def backtest_job_stream(job_id):
+    """Server-Sent Events：推送进度，任务结束后关闭"""
+    with backtest_state["lock"]:
+        if job_id not in backtest_state["jobs"]:
+            return jsonify({"error": "Job not found"}), 404
+
+    def _events():
+        last_seq = -1
+        while True:
+            with backtest_state["lock"]:
+                job = backtest_state["jobs"].get(job_id)
+                snapshot = _public_job(job) if job else None
+            if snapshot is None:
+                return
+            if snapshot["seq"] != last_seq:
+                last_seq = snapshot["seq"]
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if snapshot["status"] in BACKTEST_TERMINAL:
+                return
+            time.sleep(0.5)
+
+    return Response(
+        _events(),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/")
 def index():
     return render_template("index_v4.html")
@@ -351,6 +970,59 @@ def index_v3():
     return render_template("index.html")
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.route("/api/profiler/start", methods=["POST"])
+def profiler_start():
+    data = request.json or {}
+    try:
+        status = profiler.start(
+            mode=data.get("mode", "cprofile"),
+            ticks=int(data.get("ticks", 5)),
+            duration=_safe_float(data.get("duration"), 60.0),
+            interval=_safe_float(data.get("interval"), 0.005),
+        )
+    except (ValueError, RuntimeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    add_log(f"性能剖析开始: mode={status['session']['mode']}", "INFO")
+    return jsonify(status)
+
+
+@app.route("/api/profiler/stop", methods=["POST"])
+def profiler_stop():
+    return jsonify(profiler.stop("manual"))
+
+
+@app.route("/api/profiler/status")
+def profiler_status():
+    return jsonify(profiler.status())
+
+
+@app.route("/api/profiler/result")
+def profiler_result():
+    fmt = request.args.get("format", "collapsed")
+    if fmt == "pstats":
+        data = profiler.result_pstats()
+        if data is None:
+            return jsonify({"error": "No cProfile result available"}), 404
+        return Response(
+            data,
+            content_type="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=agent.pstats"},
+        )
+    data = profiler.result_collapsed()
+    if data is None:
+        return jsonify({"error": "No profiler result available"}), 404
+    return Response(
+        data,
+        content_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": "attachment; filename=agent.collapsed.txt"},
+    )
+
+
 @app.route("/api/settings", methods=["GET", "POST"])
 def settings():
     if request.method == "POST":
@@ -414,7 +1086,7 @@ def positions():
         ]
         ticker_price = None
         try:
-            ticker = client.get_ticker_price("BTCUSDT")
+            ticker = client.get_ticker_price(_request_symbol())
             ticker_price = _safe_float(ticker.get("price")) if ticker else None
         except Exception:
             ticker_price = None
@@ -424,14 +1096,10 @@ def positions():
         if agent and agent.positions:
             agent_positions = agent.positions
         else:
-            pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-            if os.path.exists(pos_file):
-                try:
-                    with open(pos_file, "r", encoding="utf-8") as f:
-                        file_data = json.load(f)
-                        agent_positions = file_data.get("positions", [])
-                except Exception:
-                    agent_positions = []
+            try:
+                agent_positions = load_positions(RL_DATA_DIR)
+            except Exception:
+                agent_positions = []
 
         def _sync_external_positions(active_positions, agent_positions_list, agent_obj):
             """
@@ -455,9 +1123,7 @@ def positions():
                             pass
                     else:
                         try:
-                            pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-                            with open(pos_file, "w", encoding="utf-8") as f:
-                                json.dump({"positions": []}, f, indent=2)
+                            save_positions(RL_DATA_DIR, [])
                         except Exception:
                             pass
                 return agent_positions_list
@@ -585,9 +1251,7 @@ def positions():
                         pass
                 else:
                     try:
-                        pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-                        with open(pos_file, "w", encoding="utf-8") as f:
-                            json.dump({"positions": agent_positions_list}, f, indent=2)
+                        save_positions(RL_DATA_DIR, agent_positions_list)
                     except Exception:
                         pass
             
@@ -784,10 +1448,43 @@ def klines_all(symbol):
         return jsonify({"error": str(exc)}), 400
 
 
+def _single_agent_active() -> bool:
+    """单 agent 循环是否在运行（停止后线程跑完当前 tick 前仍算运行）"""
+    thread = agent_state.get("thread")
+    return agent_state["running"] or (thread is not None and thread.is_alive())
+
+
+def _orchestrator_active() -> bool:
+    orchestrator = agent_state.get("orchestrator")
+    return bool(orchestrator and orchestrator.running)
+
+
 @app.route("/api/agent/start", methods=["POST"])
 def start_agent():
+    with agent_state["mode_lock"]:
+        return _start_agent()
+
+
+def _start_agent():
     if agent_state["running"]:
         return jsonify({"error": "Agent already running"}), 400
+    if _orchestrator_active():
+        return jsonify({"error": "Orchestrator running on the same account, stop it first"}), 400
+    data = request.get_json(silent=True) or {}
+    if data.get("symbol"):
+        agent_state["config"]["symbol"] = str(data["symbol"]).upper()
+    if "incremental" in data:
+        agent_state["config"]["incremental"] = bool(data["incremental"])
+    if "exit_watchdog" in data:
+        agent_state["config"]["exit_watchdog"] = bool(data["exit_watchdog"])
+    if "protective_orders" in data:
+        agent_state["config"]["protective_orders"] = bool(data["protective_orders"])
+    if "record_ticks" in data:
+        agent_state["config"]["record_ticks"] = bool(data["record_ticks"])
+    if "tick_deadline" in data:
+        agent_state["config"]["tick_deadline"] = _safe_float(data["tick_deadline"], 20.0)
+    if "warm_start" in data:
+        agent_state["config"]["warm_start"] = bool(data["warm_start"])
     agent_state["running"] = True
     agent_state["logs"].clear()
     agent_state["last_stop_reason"] = None
@@ -808,6 +1505,92 @@ def stop_agent():
     return jsonify({"success": True, "message": "Agent stopped"})
 
 
+def _fetch_feed_klines(symbol: str, interval: str, limit: int):
+    return convert_klines(get_mainnet_klines(symbol, interval, limit))
+
+
+def _fetch_feed_order_book(symbol: str):
+    depth = get_mainnet_order_book(symbol, 100)
+    return convert_order_book(depth) if isinstance(depth, dict) else None
+
+
+def _on_orchestrator_event(symbol, kind, payload):
+    if kind == "ready":
+        add_log(f"[{symbol}] Agent已就绪", "SUCCESS")
+    elif kind == "error" or payload.get("error"):
+        add_log(f"[{symbol}] 异常: {payload.get('error')}", "ERROR")
+    elif kind == "tick":
+        for trade in payload.get("exits", []):
+            add_log(
+                f"[{symbol}] 平仓 {trade['trade_id'][:8]} PnL={trade['pnl']:.2f} "
+                f"({trade['pnl_percent']:.2f}%) 原因={trade['exit_reason']}",
+                "SUCCESS" if trade["pnl"] >= 0 else "WARNING",
+            )
+        entry = payload.get("entry")
+        if entry and "error" not in entry:
+            add_log(
+                f"[{symbol}] 入场 {entry['direction']} 价={entry['entry_price']:.4f} 数量={entry['quantity']}",
+                "SUCCESS",
+            )
+
+
+@app.route("/api/orchestrator/start", methods=["POST"])
+def orchestrator_start():
+    with agent_state["mode_lock"]:
+        return _orchestrator_start()
+
+
+def _orchestrator_start():
+    if _orchestrator_active():
+        return jsonify({"error": "Orchestrator already running"}), 400
+    if _single_agent_active():
+        return jsonify({"error": "Agent running on the same account, stop it first"}), 400
+    keys = get_api_keys()
+    if not keys:
+        return jsonify({"error": "API keys not configured"}), 400
+    data = request.json or {}
+    symbols = data.get("symbols") or [DEFAULT_SYMBOL]
+    if isinstance(symbols, str):
+        symbols = [s.strip() for s in symbols.split(",") if s.strip()]
+    feed = MarketDataFeed(_fetch_feed_klines, _fetch_feed_order_book)
+    try:
+        orchestrator = AgentOrchestrator(
+            symbols,
+            feed,
+            make_client,
+            client_args=keys,
+            data_dir=os.path.join(RL_DATA_DIR, "symbols"),
+            leverage=int(data.get("leverage", agent_state["config"].get("leverage", 10))),
+            interval=_safe_float(data.get("interval"), 10.0),
+            max_workers=int(data["max_workers"]) if data.get("max_workers") else None,
+            on_event=_on_orchestrator_event,
+        )
+        orchestrator.start()
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 400
+    agent_state["orchestrator"] = orchestrator
+    add_log(f"多币种编排已启动: {', '.join(orchestrator.symbols)}", "SUCCESS")
+    return jsonify({"success": True, "status": orchestrator.status()})
+
+
+@app.route("/api/orchestrator/stop", methods=["POST"])
+def orchestrator_stop():
+    orchestrator = agent_state.get("orchestrator")
+    if not orchestrator or not orchestrator.running:
+        return jsonify({"error": "Orchestrator not running"}), 400
+    orchestrator.stop()
+    add_log("多币种编排已停止")
+    return jsonify({"success": True, "status": orchestrator.status()})
+
+
+@app.route("/api/orchestrator/status")
+def orchestrator_status():
+    orchestrator = agent_state.get("orchestrator")
+    if not orchestrator:
+        return jsonify({"running": False, "symbols": {}})
+    return jsonify(orchestrator.status())
+
+
 @app.route("/api/agent/status")
 def agent_status():
     agent = agent_state.get("agent")
@@ -832,6 +1615,25 @@ def agent_status():
                 "ai_logic": agent.get_ai_logic(),
             }
         )
+        status["analysis_cache"] = agent.get_cache_stats()
+        status["account_model"] = agent.account.status()
+        warm_start = agent_state.get("warm_start")
+        if warm_start:
+            status["warm_start"] = warm_start.status()
+        scheduler = agent_state.get("scheduler")
+        if scheduler:
+            status["scheduler"] = scheduler.status()
+        watchdog = agent_state.get("watchdog")
+        if watchdog:
+            status["exit_watchdog"] = watchdog.status()
+        if agent.protective is not None:
+            status["protective_orders"] = agent.protective.status(agent.positions)
+        recorder = agent_state.get("recorder")
+        if recorder:
+            status["recorder"] = recorder.status()
+        budget = agent_state.get("tick_budget")
+        if budget:
+            status["tick_budget"] = budget.status()
     else:
         try:
             from rl.market_analysis.level_finder import BestLevelFinder
@@ -905,18 +1707,14 @@ def agent_trades():
     if agent and agent.positions:
         active_ids = {p.get("trade_id") for p in agent.positions if p.get("trade_id")}
     else:
-        pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-        if os.path.exists(pos_file):
-            try:
-                with open(pos_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    active_ids = {
-                        p.get("trade_id")
-                        for p in data.get("positions", [])
-                        if p.get("trade_id")
-                    }
-            except Exception:
-                active_ids = set()
+        try:
+            active_ids = {
+                p.get("trade_id")
+                for p in load_positions(RL_DATA_DIR)
+                if p.get("trade_id")
+            }
+        except Exception:
+            active_ids = set()
 
     formatted = []
     for t in trades:
@@ -955,18 +1753,14 @@ def agent_trades():
         if agent.last_market:
             current_price = agent.last_market.get("current_price", 0) or 0
     else:
-        # Read from file when agent is stopped
-        pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-        if os.path.exists(pos_file):
-            try:
-                with open(pos_file, "r", encoding="utf-8") as f:
-                    file_data = json.load(f)
-                    active_positions = file_data.get("positions", [])
-            except Exception:
-                active_positions = []
+        # Read from the position journal when agent is stopped
+        try:
+            active_positions = load_positions(RL_DATA_DIR)
+        except Exception:
+            active_positions = []
         # Get current price from API
         try:
-            ticker = client.get_ticker_price("BTCUSDT") if client else None
+            ticker = client.get_ticker_price(_request_symbol()) if client else None
             if ticker:
                 current_price = _safe_float(ticker.get("price"))
         except Exception:
@@ -1012,10 +1806,11 @@ def close_position():
     if not client:
         return jsonify({"error": "API keys not configured"}), 400
     data = request.json or {}
+    symbol = _request_symbol()
     try:
         side = "SELL" if data.get("side") == "LONG" else "BUY"
         order = client.place_order(
-            symbol=data.get("symbol", "BTCUSDT"),
+            symbol=symbol,
             side=side,
             order_type="MARKET",
             quantity=_safe_float(data.get("quantity")),
@@ -1027,7 +1822,7 @@ def close_position():
         if agent and trade_id:
             price = None
             try:
-                price = _safe_float(client.get_ticker_price("BTCUSDT").get("price"))
+                price = _safe_float(client.get_ticker_price(symbol).get("price"))
             except Exception:
                 price = None
             for pos in list(agent.positions):
@@ -1080,7 +1875,7 @@ def close_all_positions():
         # Get current price for logging
         price = None
         try:
-            price = _safe_float(client.get_ticker_price("BTCUSDT").get("price"))
+            price = _safe_float(client.get_ticker_price(_request_symbol()).get("price"))
         except Exception:
             pass
         
@@ -1093,14 +1888,10 @@ def close_all_positions():
         if agent and agent.positions:
             agent_positions = list(agent.positions)
         else:
-            pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-            if os.path.exists(pos_file):
-                try:
-                    with open(pos_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        agent_positions = data.get("positions", [])
-                except Exception:
-                    agent_positions = []
+            try:
+                agent_positions = load_positions(RL_DATA_DIR)
+            except Exception:
+                agent_positions = []
         
         # Log and clear all AI positions
         for pos in agent_positions:
@@ -1127,11 +1918,9 @@ def close_all_positions():
             except Exception:
                 pass
         
-        # Clear file
-        pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
+        # Clear journal
         try:
-            with open(pos_file, "w", encoding="utf-8") as f:
-                json.dump({"positions": []}, f, indent=2)
+            save_positions(RL_DATA_DIR, [])
         except Exception:
             pass
         
@@ -1156,7 +1945,7 @@ def get_commission():
         return jsonify({"error": "API keys not configured"}), 400
     try:
         # Get recent trades with commission info
-        trades = client.get_account_trades("BTCUSDT", limit=50)
+        trades = client.get_account_trades(_request_symbol(), limit=50)
         if not isinstance(trades, list):
             trades = []
         
@@ -1220,14 +2009,10 @@ def sync_positions():
         if agent and agent.positions:
             agent_positions = list(agent.positions)
         else:
-            pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-            if os.path.exists(pos_file):
-                try:
-                    with open(pos_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        agent_positions = data.get("positions", [])
-                except Exception:
-                    agent_positions = []
+            try:
+                agent_positions = load_positions(RL_DATA_DIR)
+            except Exception:
+                agent_positions = []
         
         # Calculate before sync
         exchange_long = sum(
@@ -1360,9 +2145,7 @@ def sync_positions():
                         pass
                 else:
                     try:
-                        pos_file = os.path.join(RL_DATA_DIR, "active_positions.json")
-                        with open(pos_file, "w", encoding="utf-8") as f:
-                            json.dump({"positions": agent_positions_list}, f, indent=2)
+                        save_positions(RL_DATA_DIR, agent_positions_list)
                     except Exception:
                         pass
             